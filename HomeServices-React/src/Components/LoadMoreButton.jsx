@@ -0,0 +1,16 @@
+import LoaderButton from "./LoaderButton";
+
+// shown while a paginated list has a `next` cursor
+const LoadMoreButton = ({ next, isLoading, onClick }) => {
+  if (!next) return null;
+  return (
+    <div className="d-flex justify-content-center my-4">
+      <button className="my-btn" hidden={isLoading} onClick={onClick}>
+        عرض المزيد
+      </button>
+      <LoaderButton isSubmitting={isLoading} color="my-btn" />
+    </div>
+  );
+};
+
+export default LoadMoreButton;
@@ -3,9 +3,10 @@ import { handleRateStars } from "../../utils/constants";
 import "./rates.css";
 import { Link, useParams } from "react-router-dom";
 import LoaderContent from "../LoaderContent/LoaderContent";
+import LoadMoreButton from "../LoadMoreButton";
 import moment from "moment";
 import "moment/locale/ar";
-const Rates = ({ rates, type }) => {
+const Rates = ({ rates, type, next, isLoadingMore, onLoadMore }) => {
   const { username } = useParams();
   return (
     <Col className="rates" lg={type === "page" ? 9 : 7} md={12} xs={12}>
@@ -79,6 +80,11 @@ const Rates = ({ rates, type }) => {
       ) : (
         <LoaderContent />
       )}
+      <LoadMoreButton
+        next={next}
+        isLoading={isLoadingMore}
+        onClick={onLoadMore}
+      />
       {rates?.length === 0 ? (
         <Row className="d-flex justify-content-center align-items-center">
           <h5 className="w-max"> لا يوجد تقييمات بعد</h5>
@@ -2,7 +2,7 @@ import { Col, Container, Row } from "react-bootstrap";
 import "./services-list.css";
 import { useSelector } from "react-redux";
 import { useEffect, useState } from "react";
-import { fetchFromAPI } from "../../api/FetchFromAPI";
+import { fetchAllPages } from "../../api/FetchFromAPI";
 import { useNavigate, useParams } from "react-router-dom";
 import LoaderContent from "../LoaderContent/LoaderContent";
 
@@ -13,7 +13,7 @@ const ServicesList = ({ type }) => {
   const { username } = useParams();
   const getServiceList = async () => {
     try {
-      const serviceData = await fetchFromAPI(
+      const serviceData = await fetchAllPages(
         `services/list_home_services?username=${username}`
       );
       setServiceList(serviceData);
@@ -1,5 +1,5 @@
 import { useEffect, useState } from "react";
-import { fetchFromAPI } from "../../api/FetchFromAPI";
+import { fetchFromAPI, withCursor } from "../../api/FetchFromAPI";
 import { useDispatch, useSelector } from "react-redux";
 import { shortInfo } from "../../utils/constants";
 import { Col, Container, Row } from "react-bootstrap";
@@ -11,6 +11,7 @@ import {
 import "./filter-results.css";
 import SearchBar from "../../Components/SeachBar/SearchBar";
 import LoaderContent from "../../Components/LoaderContent/LoaderContent";
+import LoadMoreButton from "../../Components/LoadMoreButton";
 import Cookies from "js-cookie";
 const FilterResults = () => {
   const { selectedCategory, clearResults, userToken } = useSelector(
@@ -24,15 +25,18 @@ const FilterResults = () => {
   }
   const [servicesList, setServiceList] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   const getServicesByCategories = async () => {
     try {
       setIsLoading(true);
-      const res = await fetchFromAPI(
-        `services/list_home_services?category=${selectedCategory}`
-      );
+      setNextPage(null);
+      const url = `services/list_home_services?category=${selectedCategory}`;
+      const res = await fetchFromAPI(url);
       setIsLoading(false);
-      setServiceList(res);
+      setServiceList(res.results);
+      setNextPage({ url, cursor: res.next });
       console.log(res);
     } catch (err) {
       setIsLoading(false);
@@ -42,11 +46,12 @@ const FilterResults = () => {
   const getServicesByCategoriesAndSearch = async () => {
     try {
       setIsLoading(true);
-      const res = await fetchFromAPI(
-        `services/list_home_services?category=${selectedCategory}&title=${searchWord}`
-      );
+      setNextPage(null);
+      const url = `services/list_home_services?category=${selectedCategory}&title=${searchWord}`;
+      const res = await fetchFromAPI(url);
       setIsLoading(false);
-      setServiceList(res);
+      setServiceList(res.results);
+      setNextPage({ url, cursor: res.next });
       dispatch(setClearResults(false));
       console.log(res);
     } catch (err) {
@@ -59,22 +64,38 @@ const FilterResults = () => {
     let bearer = `token ${userToken}`;
     try {
       setIsLoading(true);
-      const res = await fetchFromAPI(
-        `services/list_home_services?category=${selectedCategory}`,
-        {
-          headers: {
-            Authorization: bearer,
-          },
-        }
-      );
+      setNextPage(null);
+      const url = `services/list_home_services?category=${selectedCategory}`;
+      // authenticated, the results are limited to the user's city
+      const headers = {
+        headers: {
+          Authorization: bearer,
+        },
+      };
+      const res = await fetchFromAPI(url, headers);
       setIsLoading(false);
-      setServiceList(res);
+      setServiceList(res.results);
+      setNextPage({ url, headers, cursor: res.next });
       console.log(res);
     } catch (err) {
       setIsLoading(false);
       console.log(err);
     }
   };
+  const loadMore = async () => {
+    try {
+      setIsLoadingMore(true);
+      const res = await fetchFromAPI(
+        withCursor(nextPage.url, nextPage.cursor),
+        nextPage.headers
+      );
+      setServiceList([...servicesList, ...res.results]);
+      setNextPage({ ...nextPage, cursor: res.next });
+    } catch (err) {
+      console.log(err);
+    }
+    setIsLoadingMore(false);
+  };
   useEffect(() => {
     setServiceList(null);
     getServicesByCategories();
@@ -116,6 +137,11 @@ const FilterResults = () => {
             </Col>
           ))}
         </Row>
+        <LoadMoreButton
+          next={nextPage?.cursor}
+          isLoading={isLoadingMore}
+          onClick={loadMore}
+        />
         {servicesList?.length === 0 && !isLoading ? (
           <Row className="justify-content-center align-items-center">
             <h2 className="w-max">لا يوجد نتائج مطابقة جرب كلمة أخرى</h2>
@@ -1,6 +1,6 @@
 import { Col, Container, Modal, Row } from "react-bootstrap";
 import { Fragment, memo, useEffect, useLayoutEffect, useState } from "react";
-import { fetchFromAPI, putToAPI } from "../../api/FetchFromAPI";
+import { fetchFromAPI, putToAPI, withCursor } from "../../api/FetchFromAPI";
 import { useDispatch, useSelector } from "react-redux";
 import "./my-recieve-orders.css";
 import {
@@ -11,6 +11,7 @@ import {
 import swal from "sweetalert";
 import { Toaster, toast } from "react-hot-toast";
 import LoaderContent from "../../Components/LoaderContent/LoaderContent";
+import LoadMoreButton from "../../Components/LoadMoreButton";
 import moment from "moment";
 import "moment/locale/ar";
 import { getBalance } from "../../utils/constants";
@@ -43,6 +44,15 @@ const MyRecieveOrders = () => {
   const [underwayRecieveData, setunderwayRecieveData] = useState([]);
   const [expireRecieveData, setexpireRecieveData] = useState([]);
   const [acceptOrderPrice, setAcceptOrderPrice] = useState("X");
+  // the next cursor of every status and the status loading its next page
+  const [nextCursors, setNextCursors] = useState({});
+  const [loadingMoreStatus, setLoadingMoreStatus] = useState(null);
+  const statusSetters = {
+    Pending: setPendingRecieveData,
+    "Under Review": setunderReviewRecieveData,
+    Underway: setunderwayRecieveData,
+    Expire: setexpireRecieveData,
+  };
 
   const formDetails = selectedform?.map((item, index) => (
     <div key={index} className="question">
@@ -51,29 +61,51 @@ const MyRecieveOrders = () => {
       {item.field.note.length > 0 ? <p>{item.field.note}</p> : null}
     </div>
   ));
-  const getMyRecieveOrderData = async () => {
-    try {
-      const data = await fetchFromAPI("services/received_orders", {
+  const getReceivedOrdersPage = (orderStatus, cursor) =>
+    fetchFromAPI(
+      withCursor(
+        `services/received_orders?status=${encodeURIComponent(orderStatus)}`,
+        cursor
+      ),
+      {
         headers: {
           Authorization: `token ${userToken}`,
         },
-      });
-      setMyRecieveOrderData(data.reverse());
-      setPendingRecieveData(
-        data.reverse().filter((item) => item.status === "Pending")
-      );
-      setunderwayRecieveData(
-        data.reverse().filter((item) => item.status === "Underway")
-      );
-      setunderReviewRecieveData(
-        data.reverse().filter((item) => item.status === "Under Review")
+      }
+    );
+  const getMyRecieveOrderData = async () => {
+    try {
+      // the inbox is paginated newest first, the first page of every status
+      // and the next ones on demand
+      const statuses = Object.keys(statusSetters);
+      const pages = await Promise.all(
+        statuses.map((orderStatus) => getReceivedOrdersPage(orderStatus))
       );
-      setexpireRecieveData(
-        data.reverse().filter((item) => item.status === "Expire")
+      const cursors = {};
+      pages.forEach((page, index) => {
+        statusSetters[statuses[index]](page.results);
+        cursors[statuses[index]] = page.next;
+      });
+      setNextCursors(cursors);
+      setMyRecieveOrderData(pages.flatMap((page) => page.results));
+    } catch (err) {
+      console.log(err);
+    }
+  };
+  const loadMoreOrders = async (orderStatus, orders) => {
+    try {
+      setLoadingMoreStatus(orderStatus);
+      const page = await getReceivedOrdersPage(
+        orderStatus,
+        nextCursors[orderStatus]
       );
+      statusSetters[orderStatus]([...orders, ...page.results]);
+      setMyRecieveOrderData([...myRecieveorderData, ...page.results]);
+      setNextCursors({ ...nextCursors, [orderStatus]: page.next });
     } catch (err) {
       console.log(err);
     }
+    setLoadingMoreStatus(null);
   };
   const getAcceptOrderPrice = async () => {
     try {
@@ -354,6 +386,11 @@ const MyRecieveOrders = () => {
             ) : (
               <h3 className="message">لا يوجد طلبات بحاجة لموافقة أو رفض</h3>
             )}
+            <LoadMoreButton
+              next={nextCursors.Pending}
+              isLoading={loadingMoreStatus === "Pending"}
+              onClick={() => loadMoreOrders("Pending", pendingRecieveData)}
+            />
             <h1 className="mt-5">طلبات قيد المراجعة</h1>
             {underReviewRecieveData?.length > 0 ? (
               <Row className="under-review d-flex justify-content-center gap-2">
@@ -430,6 +467,11 @@ const MyRecieveOrders = () => {
             ) : (
               <h3 className="message">لا يوجد طلبات قيد المراجعة</h3>
             )}
+            <LoadMoreButton
+              next={nextCursors["Under Review"]}
+              isLoading={loadingMoreStatus === "Under Review"}
+              onClick={() => loadMoreOrders("Under Review", underReviewRecieveData)}
+            />
             <h1 className="mt-5">طلبات قيد التنفيذ</h1>
             {underwayRecieveData?.length > 0 ? (
               <Row className="underway d-flex justify-content-center gap-2">
@@ -503,6 +545,11 @@ const MyRecieveOrders = () => {
             ) : (
               <h3 className="message">لا يوجد طلبات قيد التنفيذ</h3>
             )}
+            <LoadMoreButton
+              next={nextCursors.Underway}
+              isLoading={loadingMoreStatus === "Underway"}
+              onClick={() => loadMoreOrders("Underway", underwayRecieveData)}
+            />
             <h1 className="mt-5">طلبات تم الانتهاء منها</h1>
             {expireRecieveData?.length > 0 ? (
               <Row className="expire d-flex justify-content-center gap-2">
@@ -559,6 +606,11 @@ const MyRecieveOrders = () => {
             ) : (
               <h3 className="message">لا يوجد طلبات تم الانتهاء منها</h3>
             )}
+            <LoadMoreButton
+              next={nextCursors.Expire}
+              isLoading={loadingMoreStatus === "Expire"}
+              onClick={() => loadMoreOrders("Expire", expireRecieveData)}
+            />
           </Fragment>
         ) : null}
       </Container>
@@ -1,10 +1,11 @@
 import { useEffect, useState } from "react";
-import { fetchFromAPI } from "../../api/FetchFromAPI";
+import { fetchFromAPI, withCursor } from "../../api/FetchFromAPI";
 import { Col, Container, Row } from "react-bootstrap";
 import ServiceCard from "../../Components/ServiceCard/ServiceCard";
 import SearchBar from "../../Components/SeachBar/SearchBar";
 import "./search-results.css";
 import LoaderContent from "../../Components/LoaderContent/LoaderContent";
+import LoadMoreButton from "../../Components/LoadMoreButton";
 import { useDispatch, useSelector } from "react-redux";
 import { setClearResults } from "../../Store/homeServiceSlice";
 import Cookies from "js-cookie";
@@ -13,14 +14,17 @@ const SearchResults = () => {
   const searchWord = Cookies.get("searchWord");
   const [servicesList, setServiceList] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const dispatch = useDispatch();
   const getServicesBySearchWord = async () => {
     try {
       setIsLoading(true);
-      const res = await fetchFromAPI(
-        `services/list_home_services?title=${searchWord}`
-      );
-      setServiceList(res);
+      setNextPage(null);
+      const url = `services/list_home_services?title=${searchWord}`;
+      const res = await fetchFromAPI(url);
+      setServiceList(res.results);
+      setNextPage({ url, cursor: res.next });
       setIsLoading(false);
       dispatch(setClearResults(false));
       console.log(res);
@@ -29,6 +33,17 @@ const SearchResults = () => {
       setIsLoading(false);
     }
   };
+  const loadMore = async () => {
+    try {
+      setIsLoadingMore(true);
+      const res = await fetchFromAPI(withCursor(nextPage.url, nextPage.cursor));
+      setServiceList([...servicesList, ...res.results]);
+      setNextPage({ ...nextPage, cursor: res.next });
+    } catch (err) {
+      console.log(err);
+    }
+    setIsLoadingMore(false);
+  };
   useEffect(() => {
     getServicesBySearchWord();
   }, []);
@@ -55,6 +70,11 @@ const SearchResults = () => {
             </Col>
           ))}
         </Row>
+        <LoadMoreButton
+          next={nextPage?.cursor}
+          isLoading={isLoadingMore}
+          onClick={loadMore}
+        />
         {servicesList?.length === 0 && !isLoading ? (
           <Row className="justify-content-center align-items-center">
             <h2 className="w-max">لا يوجد نتائج مطابقة جرب كلمة أخرى</h2>
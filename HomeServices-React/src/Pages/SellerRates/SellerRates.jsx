@@ -5,11 +5,13 @@ import UserProfileLayout from "../../Components/UserProfileLayout";
 import { useEffect, useState } from "react";
 import { setIsSelected } from "../../Store/homeServiceSlice";
 import { useDispatch } from "react-redux";
-import { fetchFromAPI } from "../../api/FetchFromAPI";
+import { fetchFromAPI, withCursor } from "../../api/FetchFromAPI";
 import { useParams } from "react-router-dom";
 const SellerRates = () => {
   const dispatch = useDispatch();
   const [userRates, setUserRates] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const { username } = useParams();
   useEffect(() => {
     dispatch(setIsSelected(3));
@@ -18,18 +20,38 @@ const SellerRates = () => {
   const getUserRates = async () => {
     try {
       const data = await fetchFromAPI(`services/ratings/username/${username}`);
-      setUserRates(data);
+      setUserRates(data.results);
+      setNextCursor(data.next);
       console.log(data);
     } catch (err) {
       console.log(err);
     }
   };
+  const loadMoreRates = async () => {
+    try {
+      setIsLoadingMore(true);
+      const data = await fetchFromAPI(
+        withCursor(`services/ratings/username/${username}`, nextCursor)
+      );
+      setUserRates([...userRates, ...data.results]);
+      setNextCursor(data.next);
+    } catch (err) {
+      console.log(err);
+    }
+    setIsLoadingMore(false);
+  };
   return (
     <UserProfileLayout>
       <section className="seller-rates">
         <Container>
           <Row>
-            <Rates rates={userRates} type="page" />
+            <Rates
+              rates={userRates}
+              type="page"
+              next={nextCursor}
+              isLoadingMore={isLoadingMore}
+              onLoadMore={loadMoreRates}
+            />
           </Row>
         </Container>
       </section>
@@ -1,7 +1,7 @@
 import { Col, Container, Row } from "react-bootstrap";
 import { useDispatch, useSelector } from "react-redux";
 import { handleRateStars } from "../../utils/constants";
-import { fetchFromAPI } from "../../api/FetchFromAPI";
+import { fetchFromAPI, withCursor } from "../../api/FetchFromAPI";
 import { Fragment, useEffect, useState } from "react";
 import { useNavigate, useParams } from "react-router-dom";
 import "./service-details.css";
@@ -33,6 +33,8 @@ const ServiceDetails = () => {
   const [serviceDetails, setServiceDetails] = useState(null);
   const [serviceForm, setServiceForm] = useState(null);
   const [serviceRates, setServiceRates] = useState(null);
+  const [ratesCursor, setRatesCursor] = useState(null);
+  const [isLoadingMoreRates, setIsLoadingMoreRates] = useState(false);
   const { username, id } = useParams();
   const history = useNavigate();
   const getServiceDetails = async () => {
@@ -62,11 +64,25 @@ const ServiceDetails = () => {
   const getServiceRates = async () => {
     try {
       const data = await fetchFromAPI(`services/ratings/service/${id}`);
-      setServiceRates(data);
+      setServiceRates(data.results);
+      setRatesCursor(data.next);
     } catch (err) {
       console.log(err);
     }
   };
+  const loadMoreRates = async () => {
+    try {
+      setIsLoadingMoreRates(true);
+      const data = await fetchFromAPI(
+        withCursor(`services/ratings/service/${id}`, ratesCursor)
+      );
+      setServiceRates([...serviceRates, ...data.results]);
+      setRatesCursor(data.next);
+    } catch (err) {
+      console.log(err);
+    }
+    setIsLoadingMoreRates(false);
+  };
   const handelClickUpdate = () => {
     dispatch(
       setSelectedServiceToUpdate({ ...serviceDetails, form: serviceForm })
@@ -175,7 +191,13 @@ const ServiceDetails = () => {
                 </Row>
               </Col>
               {/* customer comments and rate */}
-              <Rates rates={serviceRates} type="comp" />
+              <Rates
+                rates={serviceRates}
+                type="comp"
+                next={ratesCursor}
+                isLoadingMore={isLoadingMoreRates}
+                onLoadMore={loadMoreRates}
+              />
             </Row>
           </Fragment>
         ) : (
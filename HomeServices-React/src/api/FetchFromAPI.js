@@ -20,3 +20,21 @@ export const deleteFromAPI = async (url, headers) => {
   const { data } = await axios.delete(`${BASE_API_URL}/${url}`, headers);
   return data;
 };
+
+export const withCursor = (url, cursor) => {
+  if (!cursor) return url;
+  const separator = url.includes("?") ? "&" : "?";
+  return `${url}${separator}cursor=${encodeURIComponent(cursor)}`;
+};
+
+// follows the `next` cursor of a paginated endpoint up to the last page
+export const fetchAllPages = async (url, headers) => {
+  let results = [];
+  let cursor = null;
+  do {
+    const page = await fetchFromAPI(withCursor(url, cursor), headers);
+    results = results.concat(page.results);
+    cursor = page.next;
+  } while (cursor);
+  return results;
+};
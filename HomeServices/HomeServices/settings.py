@@ -52,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its total covers the other middleware as well
+    "core.timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # Moved to correct position
@@ -83,6 +85,7 @@ TEMPLATES = [
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ["Server-Timing", "X-Query-Count"]
 
 WSGI_APPLICATION = "HomeServices.wsgi.application"
 
@@ -90,11 +93,60 @@ WSGI_APPLICATION = "HomeServices.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# how `manage.py serve` runs the site, asgi (uvicorn workers) or wsgi (threaded
+# gunicorn workers), the database connections below depend on it
+SERVER_INTERFACE = os.getenv("SERVER_INTERFACE", "asgi")
+
+# seconds a connection stays open for the next request. A WSGI worker thread
+# serves request after request and reuses its connection, which saves a connect
+# per request. Under ASGI sync code runs in a new thread for every request, a
+# kept connection is never used again and only piles up until the database
+# refuses more, so each request connects instead
+# (https://docs.djangoproject.com/en/5.0/ref/databases/#persistent-connections)
+DATABASE_CONN_MAX_AGE = int(
+    os.getenv("DATABASE_CONN_MAX_AGE", 0 if SERVER_INTERFACE == "asgi" else 600)
+)
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        # django's sqlite3 backend with BEGIN IMMEDIATE for atomic() blocks
+        "ENGINE": "core.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
+    }
+}
+
+# a database server instead of the SQLite file, e.g. DATABASE_ENGINE=mysql
+if os.getenv("DATABASE_ENGINE"):
+    if os.getenv("DATABASE_ENGINE") == "mysql":
+        import pymysql
+
+        pymysql.install_as_MySQLdb()
+    DATABASES["default"] = {
+        "ENGINE": f"django.db.backends.{os.getenv('DATABASE_ENGINE')}",
+        "NAME": os.getenv("DATABASE_NAME"),
+        "USER": os.getenv("DATABASE_USER"),
+        "PASSWORD": os.getenv("DATABASE_PASSWORD"),
+        "HOST": os.getenv("DATABASE_HOST"),
+        "PORT": os.getenv("DATABASE_PORT", ""),
+        # every worker thread keeps its own connection (a pool of one per
+        # thread), health checks replace the ones the server has closed
+        "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
     }
+
+# applied to every new SQLite connection (core.signals): readers no longer
+# wait for writers with WAL, NORMAL is durable enough with WAL, the rest are
+# memory for speed (negative cache_size is in KiB)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 20000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY",
 }
 
 
@@ -132,11 +184,21 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": ("knox.auth.TokenAuthentication",),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("core.auth.CachedTokenAuthentication",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
 REST_KNOX = {"TOKEN_TTL": None}
+AUTH_TOKEN_CACHE_TTL = 60
+AUTH_TOKEN_LOCAL_CACHE_TTL = 2
+# profile snapshot returned by login and user pages, dropped on every change
+USER_INFO_CACHE_TIMEOUT = 60 * 60
+# core.timing: the Server-Timing and X-Query-Count headers, and the budgets of
+# the views that don't declare latency_budget_ms / query_budget, requests over
+# them are logged by the core.timing logger
+SERVER_TIMING_HEADERS = DEBUG
+REQUEST_LATENCY_BUDGET_MS = 1000
+REQUEST_QUERY_BUDGET = 50
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -161,12 +223,18 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend"
+)
+# used when EMAIL_BACKEND is django.core.mail.backends.filebased.EmailBackend
+EMAIL_FILE_PATH = os.getenv("EMAIL_FILE_PATH", BASE_DIR / "sent_emails")
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_USE_TLS = True
 EMAIL_PORT = 587
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
 
 # STATICFILES_DIRS = [
 #     BASE_DIR / "static",]
@@ -51,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its total covers the other middleware as well
+    "core.timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # Moved to correct position
@@ -82,6 +84,7 @@ TEMPLATES = [
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ["Server-Timing", "X-Query-Count"]
 
 WSGI_APPLICATION = "HomeServices.wsgi.application"
 
@@ -91,11 +94,29 @@ WSGI_APPLICATION = "HomeServices.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "core.backends.sqlite3",
         "NAME": BASE_DIR / "testing.sqlite3",
+        # a file instead of the default in-memory database, so tests can write
+        # from several threads (in-memory tables fail with "table is locked")
+        "TEST": {"NAME": BASE_DIR / "test_testing.sqlite3"},
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
     }
 }
 
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 20000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY",
+}
+# testing.sqlite3 is in git, the test database made from these settings still
+# uses WAL
+SQLITE_KEEP_JOURNAL_MODE = [BASE_DIR / "testing.sqlite3"]
+
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.mysql',
@@ -130,11 +151,21 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": ("knox.auth.TokenAuthentication",),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("core.auth.CachedTokenAuthentication",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
 REST_KNOX = {"TOKEN_TTL": None}
+AUTH_TOKEN_CACHE_TTL = 60
+AUTH_TOKEN_LOCAL_CACHE_TTL = 2
+# profile snapshot returned by login and user pages, dropped on every change
+USER_INFO_CACHE_TIMEOUT = 60 * 60
+# core.timing: the Server-Timing and X-Query-Count headers, and the budgets of
+# the views that don't declare latency_budget_ms / query_budget, requests over
+# them are logged by the core.timing logger
+SERVER_TIMING_HEADERS = DEBUG
+REQUEST_LATENCY_BUDGET_MS = 1000
+REQUEST_QUERY_BUDGET = 50
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -159,12 +190,18 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend"
+)
+# used when EMAIL_BACKEND is django.core.mail.backends.filebased.EmailBackend
+EMAIL_FILE_PATH = os.getenv("EMAIL_FILE_PATH", BASE_DIR / "sent_emails")
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_USE_TLS = True
 EMAIL_PORT = 587
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
 
 # STATICFILES_DIRS = [
 #     BASE_DIR / "static",]
@@ -202,14 +239,10 @@ Q_CLUSTER = {
 #     }
 # }
 
+# tests run against an in-process cache instead of the shared redis instance
 CACHES = {
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": "redis://redis-18985.c302.asia-northeast1-1.gce.cloud.redislabs.com:18985/0",
-        "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient",
-            "PASSWORD": "O7U6j1qyVpMagE3uHBQtlZhIPq4qR5o5",
-        },
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     }
 }
 
@@ -0,0 +1,925 @@
+"""
+End-to-end benchmark of every route in core/urls.py and services/urls.py
+against a synthetic data set, reporting latency percentiles, query counts, SQL
+time and response size per route as JSON so runs can be compared.
+
+    python benchmarks/bench_api.py --users 400 --services 2000 --orders 20000 \\
+        --output before.json
+    python benchmarks/bench_api.py ... --output after.json --compare before.json
+
+Runs against a throwaway test database seeded with mixer and Faker (fixed
+--seed, so two runs see the same data), requests go through the whole stack
+(middleware, token authentication, the view, rendering) with the test client.
+Routes that write run inside a transaction that is rolled back after every
+request, so each request sees the same data and the commit itself is not part
+of the numbers. --compare exits with 1 when a route got slower than
+--threshold (and --min-delta) or runs more queries than in the other report.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict, namedtuple
+from contextlib import nullcontext
+from datetime import timedelta
+
+from bench_async import BASE_DIR, setup_django
+
+PASSWORD = "q111w222"
+TRANSACTION_STATEMENTS = ("BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK")
+
+# what a route needs to send, prepare(data, i) returns it for the i-th request
+Call = namedtuple("Call", "path body token status", defaults=(None, None, 200))
+Route = namedtuple("Route", "method pattern label prepare writes")
+
+ROUTES = []
+
+
+def route(method, pattern, label="", writes=False):
+    def register(prepare):
+        ROUTES.append(Route(method, pattern, label, prepare, writes))
+        return prepare
+
+    return register
+
+
+def get_name(route):
+    name = f"{route.method} {route.pattern}"
+    return f"{name} [{route.label}]" if route.label else name
+
+
+def pick(items, i):
+    return items[i % len(items)]
+
+
+# --- seeding ---------------------------------------------------------------
+
+
+class Data:
+    """Ids and tokens of the seeded rows the routes pick their requests from."""
+
+    def __init__(self):
+        self.tokens = {}
+        self.orders = defaultdict(list)
+
+
+def create_users(count, rng, areas, **fields):
+    from mixer.backend.django import mixer
+    from core.models import NormalUser
+
+    areas = itertools.cycle(areas)
+    return mixer.cycle(count).blend(
+        NormalUser,
+        user__is_active=True,
+        user__area=(next(areas) for _ in range(count)),
+        user__gender=(rng.choice(["Male", "Female"]) for _ in range(count)),
+        **fields,
+    )
+
+
+def seed(args):
+    from django.contrib.auth.hashers import make_password
+    from django.core.cache import cache
+    from django.utils import timezone
+    from faker import Faker
+    from knox.models import AuthToken
+    from mixer.backend.django import mixer
+    from core.models import Balance, BalanceEntry, User
+    from core.stats import backfill_answer_times, rebuild_seller_stats
+    from services.models import (
+        Area,
+        Beneficiary,
+        Category,
+        Earnings,
+        GeneralServicesPrice,
+        HomeService,
+        InputData,
+        InputField,
+        OrderService,
+        Rating,
+        RatingHistogram,
+        rating_dimensions,
+    )
+    from services.ratings import get_stars
+    from services.rollups import rebuild_earnings_rollups
+    from services.search import get_search_backend
+
+    rng = random.Random(args.seed)
+    fake = Faker()
+    Faker.seed(args.seed)
+    mixer.faker.seed_instance(args.seed)
+    now = timezone.now()
+    data = Data()
+
+    areas = Area.objects.bulk_create(Area(name=fake.city()) for _ in range(10))
+    categories = Category.objects.bulk_create(
+        Category(name=name) for name in fake.words(8, unique=True)
+    )
+
+    sellers = create_users(args.users // 2, rng, areas, user__mode="seller")
+    clients = create_users(args.users - len(sellers), rng, areas, user__mode="client")
+    # a client without orders can always order, a provider for login_provider and
+    # an unconfirmed user for the email confirmation routes
+    (data.idle_client,) = create_users(1, rng, areas, user__mode="client")
+    (data.provider,) = create_users(
+        1, rng, areas, user__mode="seller", user__is_provider=True
+    )
+    (data.inactive,) = create_users(1, rng, areas, user__mode="client")
+    User.objects.filter(pk=data.inactive.user_id).update(is_active=False)
+    normal_users = sellers + clients + [data.idle_client, data.provider, data.inactive]
+    User.objects.update(password=make_password(PASSWORD))
+
+    Balance.objects.bulk_create(
+        Balance(user=normal_user, total_balance=10**8) for normal_user in normal_users
+    )
+    BalanceEntry.objects.bulk_create(
+        BalanceEntry(user=normal_user, amount=10**8, reason="opening")
+        for normal_user in normal_users
+    )
+    for normal_user in normal_users:
+        data.tokens[normal_user.id] = AuthToken.objects.create(normal_user.user)[1]
+    admin = mixer.blend(User, is_staff=True, is_superuser=True, is_active=True)
+    data.admin_token = AuthToken.objects.create(admin)[1]
+    data.sellers, data.clients = sellers, clients
+
+    services = HomeService.objects.bulk_create(
+        HomeService(
+            title=fake.sentence(nb_words=4)[:100],
+            description=fake.text(max_nb_chars=400),
+            category=rng.choice(categories),
+            average_price_per_hour=rng.randint(5, 200),
+            seller=rng.choice(sellers),
+        )
+        for _ in range(args.services)
+    )
+    HomeService.service_area.through.objects.bulk_create(
+        HomeService.service_area.through(homeservice_id=service.id, area_id=area.id)
+        for service in services
+        for area in rng.sample(areas, rng.randint(1, 3))
+    )
+    fields = InputField.objects.bulk_create(
+        InputField(
+            title=fake.word(),
+            field_type=rng.choice(["text", "number"]),
+            home_service=service,
+            # every fourth service changed its form once
+            is_newest=version == 0,
+        )
+        for service in services
+        for version in range(1 + (service.id % 4 == 0))
+        for _ in range(3)
+    )
+    form = defaultdict(list)
+    for field in fields:
+        if field.is_newest:
+            form[field.home_service_id].append(field.id)
+    data.services = services
+
+    statuses = ["Pending", "Underway", "Under Review", "Rejected", "Expire"]
+    orders = []
+    for _ in range(args.orders):
+        create_date = now - timedelta(days=rng.uniform(0, 90))
+        order = OrderService(
+            client=rng.choice(clients),
+            home_service=rng.choice(services),
+            status=rng.choices(statuses, weights=[20, 20, 5, 15, 40])[0],
+            expected_time_by_day_to_finish=rng.randint(1, 30),
+        )
+        if order.status != "Pending":
+            order.answer_time = create_date + timedelta(hours=rng.uniform(1, 48))
+        if order.status == "Expire":
+            order.end_service = order.answer_time + timedelta(days=rng.randint(1, 5))
+            # a fifth of the finished orders still waits for its rating
+            order.is_rateable = rng.random() < 0.2
+        orders.append((order, create_date))
+    OrderService.objects.bulk_create(order for order, _ in orders)
+    for order, create_date in orders:
+        order.create_date = create_date
+    orders = [order for order, _ in orders]
+    OrderService.objects.bulk_update(orders, ["create_date"], batch_size=500)
+    InputData.objects.bulk_create(
+        (
+            InputData(field_id=field_id, order=order, content=fake.word())
+            for order in orders
+            for field_id in form[order.home_service_id]
+        ),
+        batch_size=1000,
+    )
+
+    rated = [o for o in orders if o.status == "Expire" and not o.is_rateable]
+    ratings = Rating.objects.bulk_create(
+        Rating(
+            order_service=order,
+            client_comment=fake.sentence(),
+            **{
+                dimension: round(rng.uniform(1, 5), 1)
+                for dimension in rating_dimensions
+            },
+        )
+        for order in rated
+    )
+    buckets = defaultdict(lambda: [0, 0.0])
+    served = defaultdict(list)
+    for rating, order in zip(ratings, rated):
+        rating.rating_time = order.end_service
+        values = [getattr(rating, dimension) for dimension in rating_dimensions]
+        served[order.home_service_id].append(sum(values) / len(values))
+        for dimension, value in zip(rating_dimensions, values):
+            bucket = buckets[(order.home_service_id, dimension, get_stars(value))]
+            bucket[0] += 1
+            bucket[1] += value
+    Rating.objects.bulk_update(ratings, ["rating_time"], batch_size=500)
+    RatingHistogram.objects.bulk_create(
+        RatingHistogram(
+            home_service_id=home_service_id,
+            dimension=dimension,
+            stars=stars,
+            count=count,
+            total=total,
+        )
+        for (home_service_id, dimension, stars), (count, total) in buckets.items()
+    )
+    for service in services:
+        averages = served.get(service.id, [])
+        service.number_of_served_clients = len(averages)
+        service.average_ratings = statistics.fmean(averages) if averages else 0
+    HomeService.objects.bulk_update(
+        services, ["number_of_served_clients", "average_ratings"], batch_size=500
+    )
+
+    prices = {
+        Beneficiary.objects.create(beneficiary_name=name): price
+        for name, price in (("platform", 100), ("insurance", 50))
+    }
+    for beneficiary, price in prices.items():
+        GeneralServicesPrice.objects.create(beneficiary=beneficiary, price=price)
+    accepted = [o for o in orders if o.status not in ("Pending", "Rejected")]
+    earnings = Earnings.objects.bulk_create(
+        (
+            Earnings(
+                order=order,
+                beneficiary=beneficiary,
+                category_id=order.home_service.category_id,
+                earnings=price,
+            )
+            for order in accepted
+            for beneficiary, price in prices.items()
+        ),
+        batch_size=1000,
+    )
+    for earning in earnings:
+        earning.created_date = earning.order.answer_time
+    Earnings.objects.bulk_update(earnings, ["created_date"], batch_size=500)
+
+    rebuild_earnings_rollups()
+    rebuild_seller_stats()
+    backfill_answer_times()
+    get_search_backend().rebuild()
+    cache.clear()
+
+    for order in orders:
+        data.orders[order.status].append(order)
+    data.orders["rateable"] = [o for o in orders if o.is_rateable]
+    data.ratings = ratings
+    return data
+
+
+# --- routes ----------------------------------------------------------------
+
+
+def seller_token(data, order):
+    return data.tokens[order.home_service.seller_id]
+
+
+@route("GET", "services/categories")
+def categories(data, i):
+    return Call("/services/categories")
+
+
+@route("GET", "services/list_all_area")
+def list_all_area(data, i):
+    return Call("/services/list_all_area")
+
+
+@route("GET", "services/my_orders")
+def my_orders(data, i):
+    return Call("/services/my_orders", token=data.tokens[pick(data.clients, i).id])
+
+
+@route("GET", "services/received_orders")
+def received_orders(data, i):
+    return Call(
+        "/services/received_orders", token=data.tokens[pick(data.sellers, i).id]
+    )
+
+
+@route("GET", "services/list_home_services")
+def list_home_services(data, i):
+    return Call("/services/list_home_services")
+
+
+@route("GET", "services/list_home_services", "category, logged in")
+def list_home_services_by_category(data, i):
+    service = pick(data.services, i)
+    return Call(
+        f"/services/list_home_services?category={service.category.name}",
+        token=data.tokens[pick(data.clients, i).id],
+    )
+
+
+@route("GET", "services/list_home_services", "search")
+def search_home_services(data, i):
+    word = pick(data.services, i).title.split()[0].strip(".")
+    return Call(f"/services/list_home_services?title={word}")
+
+
+@route("GET", "services/home_service/detail/<int:pk>")
+def home_service_detail(data, i):
+    return Call(f"/services/home_service/detail/{pick(data.services, i).id}")
+
+
+@route("POST", "services/create_service", writes=True)
+def create_service(data, i):
+    service = pick(data.services, i)
+    body = {
+        "form": [{"title": f"field {n}", "field_type": "text"} for n in range(4)],
+        "title": "benchmark service",
+        "description": "benchmark description",
+        "category": service.category_id,
+        "average_price_per_hour": 50,
+        "service_area": [area.id for area in service.service_area.all()],
+    }
+    return Call("/services/create_service", body, data.tokens[service.seller_id], 201)
+
+
+@route("GET", "services/retrieve_update_home_service/<int:home_service_id>")
+def retrieve_home_service(data, i):
+    service = pick(data.services, i)
+    return Call(
+        f"/services/retrieve_update_home_service/{service.id}",
+        token=data.tokens[service.seller_id],
+    )
+
+
+@route(
+    "PUT", "services/retrieve_update_home_service/<int:home_service_id>", writes=True
+)
+def update_home_service(data, i):
+    service = pick(data.services, i)
+    body = {
+        "title": "benchmark service",
+        "description": "benchmark description",
+        "average_price_per_hour": 60,
+        "service_area": [area.id for area in service.service_area.all()],
+    }
+    return Call(
+        f"/services/retrieve_update_home_service/{service.id}",
+        body,
+        data.tokens[service.seller_id],
+    )
+
+
+@route("DELETE", "services/delete_home_service/<int:home_service_id>", writes=True)
+def delete_home_service(data, i):
+    service = pick(data.services, i)
+    return Call(
+        f"/services/delete_home_service/{service.id}",
+        token=data.tokens[service.seller_id],
+        status=204,
+    )
+
+
+@route("GET", "services/update_form_home_service/<int:home_service_id>")
+def form_home_service(data, i):
+    service = pick(data.services, i)
+    return Call(
+        f"/services/update_form_home_service/{service.id}",
+        token=data.tokens[service.seller_id],
+    )
+
+
+@route("PUT", "services/update_form_home_service/<int:home_service_id>", writes=True)
+def update_form_home_service(data, i):
+    service = pick(data.services, i)
+    body = [{"title": f"field {n}", "field_type": "number"} for n in range(3)]
+    return Call(
+        f"/services/update_form_home_service/{service.id}",
+        body,
+        data.tokens[service.seller_id],
+    )
+
+
+@route("GET", "services/order_service/<int:service_id>")
+def order_form(data, i):
+    return Call(
+        f"/services/order_service/{pick(data.services, i).id}",
+        token=data.tokens[data.idle_client.id],
+    )
+
+
+@route("POST", "services/order_service/<int:service_id>", writes=True)
+def make_order(data, i):
+    service = pick(data.services, i)
+    body = {
+        "form_data": [
+            {"field": field.id, "content": "benchmark"}
+            for field in service.field.filter(is_newest=True)
+        ],
+        "expected_time_by_day_to_finish": 3,
+    }
+    return Call(
+        f"/services/order_service/{service.id}",
+        body,
+        data.tokens[data.idle_client.id],
+    )
+
+
+@route("DELETE", "services/cancel_order/<int:order_id>", writes=True)
+def cancel_order(data, i):
+    order = pick(data.orders["Pending"], i)
+    return Call(
+        f"/services/cancel_order/{order.id}",
+        token=data.tokens[order.client_id],
+        status=204,
+    )
+
+
+@route("PUT", "services/reject_order/<int:order_id>", writes=True)
+def reject_order(data, i):
+    order = pick(data.orders["Pending"], i)
+    return Call(
+        f"/services/reject_order/{order.id}",
+        token=seller_token(data, order),
+        status=204,
+    )
+
+
+@route("PUT", "services/accept_order/<int:order_id>", writes=True)
+def accept_order(data, i):
+    order = pick(data.orders["Pending"], i)
+    return Call(f"/services/accept_order/{order.id}", token=seller_token(data, order))
+
+
+@route("PUT", "services/accept_after_review/<int:order_id>", writes=True)
+def accept_after_review(data, i):
+    order = pick(data.orders["Under Review"], i)
+    return Call(
+        f"/services/accept_after_review/{order.id}", token=seller_token(data, order)
+    )
+
+
+@route("PUT", "services/reject_after_review/<int:order_id>", writes=True)
+def reject_after_review(data, i):
+    order = pick(data.orders["Under Review"], i)
+    return Call(
+        f"/services/reject_after_review/{order.id}", token=seller_token(data, order)
+    )
+
+
+@route("PUT", "services/finish_order/<int:order_id>", writes=True)
+def finish_order(data, i):
+    order = pick(data.orders["Underway"], i)
+    return Call(f"/services/finish_order/{order.id}", token=seller_token(data, order))
+
+
+@route("POST", "services/make_rating/<int:order_id>", writes=True)
+def make_rating(data, i):
+    order = pick(data.orders["rateable"], i)
+    body = {
+        "quality_of_service": 4,
+        "commitment_to_deadline": 5,
+        "work_ethics": 4.5,
+        "client_comment": "benchmark",
+    }
+    return Call(f"/services/make_rating/{order.id}", body, data.tokens[order.client_id])
+
+
+@route("POST", "services/make_seller_comment/<int:rating_id>", writes=True)
+def make_seller_comment(data, i):
+    rating = pick(data.ratings, i)
+    return Call(
+        f"/services/make_seller_comment/{rating.id}",
+        {"seller_comment": "benchmark"},
+        seller_token(data, rating.order_service),
+    )
+
+
+@route("GET", "services/ratings/service/<int:service_id>")
+def ratings_by_service(data, i):
+    return Call(f"/services/ratings/service/{pick(data.services, i).id}")
+
+
+@route("GET", "services/ratings/username/<str:username>")
+def ratings_by_username(data, i):
+    return Call(f"/services/ratings/username/{pick(data.sellers, i).user.username}")
+
+
+@route("GET", "services/earnings")
+def earnings(data, i):
+    return Call("/services/earnings", token=data.admin_token)
+
+
+@route("GET", "services/earnings/daily")
+def daily_earnings(data, i):
+    return Call("/services/earnings/daily?group_by=category", token=data.admin_token)
+
+
+@route("GET", "services/earnings/export/<str:file_format>")
+def export_earnings(data, i):
+    return Call("/services/earnings/export/csv", token=data.admin_token)
+
+
+@route("POST", "api/login/", writes=True)
+def login(data, i):
+    body = {"email": pick(data.clients, i).user.email, "password": PASSWORD}
+    return Call("/api/login/", body)
+
+
+@route("POST", "api/register/", writes=True)
+def register(data, i):
+    body = {
+        "username": "benchmark",
+        "password": "tEst1234*",
+        "password2": "tEst1234*",
+        "email": "benchmark@example.com",
+        "first_name": "bench",
+        "last_name": "mark",
+        "birth_date": "1990-01-01",
+        "gender": "Male",
+        "mode": "client",
+        "area": pick(data.clients, i).user.area_id,
+    }
+    return Call("/api/register/", body, status=201)
+
+
+@route("GET", "api/users/<str:mode>")
+def list_users(data, i):
+    return Call("/api/users/seller")
+
+
+@route("GET", "api/user/<str:username>")
+def retrieve_user(data, i):
+    return Call(f"/api/user/{pick(data.sellers, i).user.username}")
+
+
+@route("POST", "api/logout/", writes=True)
+def logout(data, i):
+    return Call("/api/logout/", token=data.tokens[pick(data.clients, i).id], status=204)
+
+
+@route("POST", "api/logoutall/", writes=True)
+def logout_all(data, i):
+    return Call(
+        "/api/logoutall/", token=data.tokens[pick(data.clients, i).id], status=204
+    )
+
+
+@route("POST", "api/password_reset/", writes=True)
+def password_reset(data, i):
+    body = {
+        "old_password": PASSWORD,
+        "new_password": "q1111w2222",
+        "new_password2": "q1111w2222",
+    }
+    return Call("/api/password_reset/", body, data.tokens[pick(data.clients, i).id])
+
+
+@route("PUT", "api/update_profile", writes=True)
+def update_profile(data, i):
+    client = pick(data.clients, i)
+    body = {
+        "bio": "benchmark",
+        "user": {
+            "first_name": "bench",
+            "last_name": "mark",
+            "birth_date": "1990-01-01",
+            "area": client.user.area_id,
+        },
+    }
+    return Call("/api/update_profile", body, data.tokens[client.id])
+
+
+@route("POST", "api/confirm_email", writes=True)
+def confirm_email(data, i):
+    from django.core.cache import cache
+    from core.codes import confirmation_code
+
+    cache.set(confirmation_code.get_key(data.inactive.user_id), "123456")
+    confirmation_code.attempts.reset(data.inactive.user_id)
+    body = {"email": data.inactive.user.email, "confirmation_code": "123456"}
+    return Call("/api/confirm_email", body)
+
+
+@route("POST", "api/resend_email_code", writes=True)
+def resend_email_code(data, i):
+    from core.codes import send_code_attempts
+
+    send_code_attempts.reset(data.inactive.user_id)
+    return Call("/api/resend_email_code", {"email": data.inactive.user.email})
+
+
+@route("GET", "api/my_balance")
+def my_balance(data, i):
+    return Call("/api/my_balance", token=data.tokens[pick(data.clients, i).id])
+
+
+@route("POST", "api/send_forget_password_code", writes=True)
+def send_forget_password_code(data, i):
+    from core.codes import send_code_attempts
+
+    client = pick(data.clients, i)
+    send_code_attempts.reset(client.user_id)
+    return Call("/api/send_forget_password_code", {"email": client.user.email})
+
+
+def issue_forget_password_code(client):
+    from django.core.cache import cache
+    from core.codes import forget_password_code
+
+    cache.set(forget_password_code.get_key(client.user_id), "123456")
+    forget_password_code.attempts.reset(client.user_id)
+
+
+@route("POST", "api/forget_password_reset", writes=True)
+def forget_password_reset(data, i):
+    client = pick(data.clients, i)
+    issue_forget_password_code(client)
+    body = {
+        "email": client.user.email,
+        "forget_password_code": "123456",
+        "new_password": "q1111w2222",
+        "new_password2": "q1111w2222",
+    }
+    return Call("/api/forget_password_reset", body)
+
+
+@route("POST", "api/check_forget_password_code")
+def check_forget_password_code(data, i):
+    client = pick(data.clients, i)
+    issue_forget_password_code(client)
+    body = {"email": client.user.email, "forget_password_code": "123456"}
+    return Call("/api/check_forget_password_code", body)
+
+
+@route("PUT", "api/update_user_photo", writes=True)
+def update_user_photo(data, i):
+    return Call("/api/update_user_photo", token=data.tokens[pick(data.clients, i).id])
+
+
+@route("POST", "api/login_provider", writes=True)
+def login_provider(data, i):
+    body = {"username": data.provider.user.username, "password": PASSWORD}
+    return Call("/api/login_provider", body)
+
+
+@route("POST", "api/charge_balance", writes=True)
+def charge_balance(data, i):
+    body = {"username": pick(data.sellers, i).user.username, "charged_balance": 10}
+    return Call("/api/charge_balance", body, data.tokens[pick(data.clients, i).id])
+
+
+# --- measuring -------------------------------------------------------------
+
+
+def get_route_patterns():
+    from django.urls import get_resolver
+
+    for resolver in get_resolver().url_patterns:
+        if getattr(resolver, "urlconf_name", None) in ("core.urls", "services.urls"):
+            for pattern in resolver.url_patterns:
+                yield f"{resolver.pattern}{pattern.pattern}"
+
+
+class QueryCounter:
+    """An execute wrapper counting the queries of a request and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not sql.startswith(TRANSACTION_STATEMENTS):
+                self.count += 1
+                self.time += time.perf_counter() - start
+
+
+def request(route, call, cold):
+    from django.core.cache import cache
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    if call.token:
+        client.credentials(HTTP_AUTHORIZATION=f"Token {call.token}")
+    if cold:
+        cache.clear()
+    send = getattr(client, route.method.lower())
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        start = time.perf_counter()
+        response = send(call.path, call.body, format="json")
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        elapsed = time.perf_counter() - start
+    return response, elapsed, queries, size
+
+
+def run_route(route, data, args):
+    from django.db import transaction
+
+    latencies, query_counts, sql_times, sizes, errors = [], [], [], [], []
+    for i in range(args.warmup + args.requests):
+        # a write is rolled back so the next request sees the same data
+        with transaction.atomic() if route.writes else nullcontext():
+            call = route.prepare(data, i)
+            response, elapsed, queries, size = request(route, call, args.cold)
+            if route.writes:
+                transaction.set_rollback(True)
+        if response.status_code != call.status:
+            errors.append(f"{call.path}: {response.status_code}")
+        if i < args.warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        query_counts.append(queries.count)
+        sql_times.append(queries.time * 1000)
+        sizes.append(size)
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": quantiles[49],
+        "p90_ms": quantiles[89],
+        "p99_ms": quantiles[98],
+        "max_ms": max(latencies),
+        "queries_median": statistics.median(query_counts),
+        "queries_max": max(query_counts),
+        "sql_ms_median": statistics.median(sql_times),
+        "bytes_median": statistics.median(sizes),
+    }
+
+
+def get_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    print(
+        f"{'route':<70} {'p50 ms':>8} {'p99 ms':>8} {'queries':>7} "
+        f"{'sql ms':>7} {'bytes':>8} {'errors':>6}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<70} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+            f"{result['queries_median']:>7g} {result['sql_ms_median']:>7.2f} "
+            f"{result['bytes_median']:>8.0f} {result['errors']:>6}"
+        )
+
+
+def compare(report, baseline, threshold, min_delta):
+    """Prints the routes that changed and returns how many got worse."""
+    regressions = 0
+    print(f"\ncompared with {baseline['meta'].get('revision')}")
+    print(f"{'route':<70} {'p50':>14} {'p99':>14} {'queries':>9}")
+    for name, result in report["routes"].items():
+        old = baseline["routes"].get(name)
+        if old is None:
+            continue
+        p50 = result["p50_ms"] / old["p50_ms"] - 1
+        p99 = result["p99_ms"] / old["p99_ms"] - 1
+        queries = result["queries_median"] - old["queries_median"]
+        # sub-millisecond routes move by more than the threshold on noise alone
+        slower = p50 > threshold and result["p50_ms"] - old["p50_ms"] > min_delta
+        worse = slower or queries > 0
+        regressions += worse
+        print(
+            f"{name:<70} {old['p50_ms']:>6.2f} {p50:>+7.0%} "
+            f"{old['p99_ms']:>6.2f} {p99:>+7.0%} {queries:>+9g}"
+            + ("  <- slower" if worse else "")
+        )
+    return regressions
+
+
+def main(args):
+    setup_django(None)
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    if args.fast_hasher:
+        settings.PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+    patterns = list(get_route_patterns())
+    covered = {route.pattern for route in ROUTES}
+    missing = [pattern for pattern in patterns if pattern not in covered]
+    if missing:
+        # a new url without a benchmark, add a @route for it
+        sys.exit(f"no benchmark for: {', '.join(missing)}")
+    routes = [
+        route
+        for route in ROUTES
+        if not args.routes or any(part in get_name(route) for part in args.routes)
+    ]
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        start = time.perf_counter()
+        data = seed(args)
+        print(f"seeded in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        results = {}
+        for route in routes:
+            results[get_name(route)] = run_route(route, data, args)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    import django
+
+    report = {
+        "meta": {
+            "revision": get_revision(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "users": args.users,
+            "services": args.services,
+            "orders": args.orders,
+            "seed": args.seed,
+            "requests": args.requests,
+            "cold": args.cold,
+            "fast_hasher": args.fast_hasher,
+        },
+        "routes": results,
+    }
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(
+                report, json.load(file), args.threshold, args.min_delta
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--services", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=50, help="Per route")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument(
+        "--cold", action="store_true", help="Clear the cache before every request"
+    )
+    parser.add_argument(
+        "--fast-hasher",
+        action="store_true",
+        help="MD5 instead of PBKDF2, so the login routes don't measure hashing",
+    )
+    parser.add_argument(
+        "--routes", nargs="+", help="Only the routes whose name contains one of these"
+    )
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="A previous JSON report to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="p50 growth that counts as slower, 0.2 is 20%%",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=1.0,
+        help="Milliseconds the p50 has to grow by as well to count as slower",
+    )
+    main(parser.parse_args())
@@ -0,0 +1,255 @@
+"""
+Serve the async read endpoints (home services list and detail, categories,
+areas, user profile) with a fixed number of requests in flight, once through
+the ASGI application on a single event loop and once through the WSGI
+application with one thread per in-flight request (what a threaded WSGI server
+does), and compare throughput, latency and peak memory.
+
+    python benchmarks/bench_async.py --concurrency 50 100 200 --requests 2000
+
+Each mode runs in its own process against a throwaway test database, memory
+is the growth of the process peak RSS over the baseline after warm-up.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "HomeServices.settings_duplicate")
+
+
+def get_memory_kb(field):
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field):
+                return int(line.split()[1])
+    return 0
+
+
+def setup_django(database):
+    import django
+    from django.conf import settings
+
+    django.setup()
+    # DEBUG would keep every query in memory and skew the numbers
+    settings.DEBUG = False
+    if database:
+        from django.db import connection
+
+        connection.settings_dict["NAME"] = database
+
+
+def seed(services):
+    from mixer.backend.django import mixer
+    from core.models import NormalUser
+    from services.models import Area, HomeService
+
+    area = mixer.blend(Area)
+    sellers = mixer.cycle(10).blend(NormalUser, user__mode="seller", user__area=area)
+    for i in range(services):
+        service = mixer.blend(
+            HomeService, seller=sellers[i % len(sellers)], average_ratings=i % 5
+        )
+        service.service_area.add(area)
+    return [
+        "/services/list_home_services",
+        f"/services/home_service/detail/{service.id}",
+        "/services/categories",
+        "/services/list_all_area",
+        f"/api/user/{sellers[0].user.username}",
+    ]
+
+
+def percentile(latencies, pct):
+    return statistics.quantiles(latencies, n=100)[pct - 1] * 1000
+
+
+def report(mode, concurrency, latencies, elapsed, baseline, threads):
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "peak_memory_mb": (get_memory_kb("VmHWM") - baseline) / 1024,
+        "threads": threads,
+    }
+
+
+def run_asgi(paths, concurrency, requests):
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+
+    async def call(path):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "headers": [(b"host", b"testserver")],
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 0),
+        }
+        disconnect = asyncio.Event()
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                assert message["status"] == 200, (path, message["status"])
+
+        start = time.perf_counter()
+        await application(scope, receive, send)
+        disconnect.set()
+        return time.perf_counter() - start
+
+    async def client(worker, latencies):
+        for i in range(worker, requests, concurrency):
+            latencies.append(await call(paths[i % len(paths)]))
+
+    async def run():
+        latencies = []
+        await asyncio.gather(*(client(w, latencies) for w in range(concurrency)))
+        # counted before the loop closes, sync_to_async threads included
+        return latencies, threading.active_count()
+
+    asyncio.run(run())
+    baseline = get_memory_kb("VmRSS")
+    start = time.perf_counter()
+    latencies, threads = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    return report("asgi", concurrency, latencies, elapsed, baseline, threads)
+
+
+def run_wsgi(paths, concurrency, requests):
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+
+    def call(path):
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": "",
+            "SERVER_NAME": "testserver",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": "testserver",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+
+        def start_response(status, headers):
+            assert status.startswith("200"), (path, status)
+
+        start = time.perf_counter()
+        response = application(environ, start_response)
+        b"".join(response)
+        response.close()
+        return time.perf_counter() - start
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    # start every worker thread before measuring, like a server's thread pool
+    list(executor.map(call, [paths[i % len(paths)] for i in range(concurrency)]))
+    baseline = get_memory_kb("VmRSS")
+    start = time.perf_counter()
+    latencies = list(
+        executor.map(call, [paths[i % len(paths)] for i in range(requests)])
+    )
+    elapsed = time.perf_counter() - start
+    threads = threading.active_count()
+    executor.shutdown()
+    return report("wsgi", concurrency, latencies, elapsed, baseline, threads)
+
+
+def worker(args):
+    setup_django(args.database)
+    paths = json.loads(args.paths)
+    run = run_asgi if args.worker == "asgi" else run_wsgi
+    print(json.dumps(run(paths, args.concurrency[0], args.requests)))
+
+
+def main(args):
+    setup_django(None)
+    from django.db import connection
+
+    old_name = connection.settings_dict["NAME"]
+    database = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        paths = seed(args.services)
+        connection.close()
+        print(
+            f"{'mode':>5} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+            f"{'peak MB':>8} {'threads':>7}"
+        )
+        for concurrency in args.concurrency:
+            for mode in ("asgi", "wsgi"):
+                process = subprocess.run(
+                    [
+                        sys.executable,
+                        os.path.abspath(__file__),
+                        "--worker",
+                        mode,
+                        "--database",
+                        str(database),
+                        "--paths",
+                        json.dumps(paths),
+                        "--concurrency",
+                        str(concurrency),
+                        "--requests",
+                        str(args.requests),
+                    ],
+                    capture_output=True,
+                    text=True,
+                )
+                if process.returncode:
+                    sys.exit(process.stderr)
+                result = json.loads(process.stdout.splitlines()[-1])
+                print(
+                    f"{mode:>5} {concurrency:>5} "
+                    f"{result['requests_per_second']:>8.1f} "
+                    f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                    f"{result['peak_memory_mb']:>8.1f} {result['threads']:>7}"
+                )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--services", type=int, default=200)
+    parser.add_argument("--worker", choices=["asgi", "wsgi"])
+    parser.add_argument("--database")
+    parser.add_argument("--paths")
+    args = parser.parse_args()
+    if args.worker:
+        worker(args)
+    else:
+        main(args)
@@ -0,0 +1,120 @@
+"""
+Compare login throughput of the old login path (email lookup, then
+AuthTokenSerializer authenticating by username, then an uncached profile) with
+the current login_api view.
+
+    python benchmarks/bench_login.py --users 200 --logins 500 --fast-hasher
+
+Runs against a throwaway test database, the real one is never touched.
+--fast-hasher swaps PBKDF2 for MD5 so the numbers show the database and
+serialization overhead instead of the password hashing cost.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "HomeServices.settings_duplicate")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from knox.auth import AuthToken  # noqa: E402
+from rest_framework.authtoken.serializers import AuthTokenSerializer  # noqa: E402
+from rest_framework.decorators import api_view  # noqa: E402
+from rest_framework.response import Response  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+PASSWORD = "q111w222"
+
+
+def seed(users):
+    from mixer.backend.django import mixer
+    from core.models import Balance, NormalUser
+
+    normal_users = mixer.cycle(users).blend(NormalUser, user__mode="seller")
+    for normal_user in normal_users:
+        normal_user.user.set_password(PASSWORD)
+        normal_user.user.save()
+        Balance.objects.create(user=normal_user)
+    return [normal_user.user.email for normal_user in normal_users]
+
+
+@api_view(["POST"])
+def legacy_login_api(request):
+    from core.models import User
+    from core.views import build_user_info
+
+    user = User.objects.get(email=request.data["email"])
+    data = {"username": user.username, "password": request.data["password"]}
+    serializer = AuthTokenSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    user = serializer.validated_data["user"]
+    _, token = AuthToken.objects.create(user)
+    host = "http://" + request.get_host()
+    user_info = build_user_info(user)
+    if user_info["photo"] is not None:
+        user_info["photo"] = host + user_info["photo"]
+    return Response({"user_info": user_info, "token": {token}})
+
+
+def as_login(view):
+    factory = APIRequestFactory()
+
+    def login(email):
+        request = factory.post(
+            "/api/login/", {"email": email, "password": PASSWORD}, format="json"
+        )
+        response = view(request)
+        assert response.status_code == 200, response.data
+        return response
+
+    return login
+
+
+def run(name, login, emails, logins):
+    # one round to warm up caches, the profile snapshots included
+    for email in emails:
+        login(email)
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for i in range(logins):
+            login(emails[i % len(emails)])
+        elapsed = time.perf_counter() - start
+    print(
+        f"{name:>8}: {logins / elapsed:8.1f} logins/s, "
+        f"{len(queries) / logins:.2f} queries/login"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--fast-hasher", action="store_true")
+    args = parser.parse_args()
+
+    if args.fast_hasher:
+        settings.PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        emails = seed(args.users)
+        cache.clear()
+        from core.views import login_api
+
+        run("legacy", as_login(legacy_login_api), emails, args.logins)
+        run("current", as_login(login_api), emails, args.logins)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
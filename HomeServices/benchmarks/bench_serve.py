@@ -0,0 +1,141 @@
+"""
+Requests per second through `manage.py runserver` compared with
+`manage.py serve` (gunicorn, ASGI and WSGI workers), over real sockets with
+keep-alive clients hitting the public read endpoints.
+
+    python benchmarks/bench_serve.py --clients 32 --duration 10
+
+The servers run against a throwaway copy of the test database.
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_async import BASE_DIR, seed, setup_django
+
+SETTINGS = """
+from HomeServices.settings_duplicate import *
+
+DEBUG = False
+DATABASES["default"]["NAME"] = {database!r}
+"""
+
+SERVERS = {
+    "runserver": ["runserver", "--noreload", "--nothreading"],
+    "runserver-threaded": ["runserver", "--noreload"],
+    "serve-asgi": ["serve", "--no-qcluster", "--interface", "asgi"],
+    "serve-wsgi": ["serve", "--no-qcluster", "--interface", "wsgi"],
+}
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def hammer(port, paths, duration):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    done = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            connection.request("GET", paths[done % len(paths)])
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # runserver closes the connection after every response
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        if response.status != 200:
+            raise RuntimeError(f"{paths[done % len(paths)]}: {response.status}")
+        if response.getheader("Connection", "").lower() == "close":
+            connection.close()
+        done += 1
+    connection.close()
+    return done
+
+
+def bench(name, arguments, settings_dir, paths, clients, duration):
+    port = get_free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([settings_dir, BASE_DIR]),
+        DJANGO_SETTINGS_MODULE="bench_settings",
+    )
+    if arguments[0] == "runserver":
+        arguments = arguments + [f"127.0.0.1:{port}"]
+    else:
+        arguments = arguments + ["--bind", f"127.0.0.1:{port}"]
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BASE_DIR, "manage.py"), *arguments],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for(port)
+        hammer(port, paths, 1)
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            done = sum(
+                executor.map(lambda _: hammer(port, paths, duration), range(clients))
+            )
+        print(f"{name:>20}: {done / duration:8.1f} requests/s")
+    finally:
+        server.terminate()
+        server.wait(30)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--services", type=int, default=200)
+    parser.add_argument("--servers", nargs="+", choices=SERVERS, default=list(SERVERS))
+    args = parser.parse_args()
+
+    setup_django(None)
+    from django.db import connection
+
+    old_name = connection.settings_dict["NAME"]
+    database = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        paths = seed(args.services)
+        connection.close()
+        with tempfile.TemporaryDirectory() as settings_dir:
+            with open(os.path.join(settings_dir, "bench_settings.py"), "w") as file:
+                file.write(SETTINGS.format(database=str(database)))
+            for name in args.servers:
+                bench(
+                    name,
+                    SERVERS[name],
+                    settings_dir,
+                    paths,
+                    args.clients,
+                    args.duration,
+                )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
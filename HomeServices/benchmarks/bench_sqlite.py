@@ -0,0 +1,196 @@
+"""
+Readers listing home services while a writer keeps committing large updates,
+once with Django's stock SQLite setup (rollback journal, a connection per
+request) and once with the project's tuning (WAL and the other PRAGMAs from
+settings.SQLITE_PRAGMAS, BEGIN IMMEDIATE, persistent connections).
+
+    python benchmarks/bench_sqlite.py --readers 8 --duration 10
+
+With the rollback journal a reader has to wait whenever the writer holds the
+exclusive lock (while it commits, or as soon as its changes no longer fit in
+the page cache), with WAL readers keep reading the last committed snapshot.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_async import BASE_DIR, seed, setup_django
+
+PROFILES = {
+    "stock": """
+from HomeServices.settings_duplicate import *
+
+DEBUG = False
+DATABASES["default"] = {{
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": {database!r},
+}}
+SQLITE_PRAGMAS = {{"journal_mode": "DELETE"}}
+""",
+    "tuned": """
+from HomeServices.settings_duplicate import *
+
+DEBUG = False
+DATABASES["default"]["NAME"] = {database!r}
+""",
+}
+
+
+def reader(stop, latencies, errors):
+    from django.db import OperationalError, close_old_connections
+    from services.models import HomeService
+
+    while not stop.is_set():
+        # what a request does: close_old_connections() on request started and
+        # finished, a connection per request unless CONN_MAX_AGE keeps it
+        close_old_connections()
+        start = time.perf_counter()
+        try:
+            list(
+                HomeService.objects.select_related("category", "seller__user")
+                .prefetch_related("service_area")
+                .order_by("-average_ratings", "-id")[:20]
+            )
+        except OperationalError:
+            # "database is locked"
+            errors.append(1)
+        else:
+            latencies.append(time.perf_counter() - start)
+        close_old_connections()
+
+
+def writer(stop, commits, errors, hold):
+    from django.db import OperationalError, close_old_connections, transaction
+    from django.db.models import F
+    from services.models import HomeService
+
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            with transaction.atomic():
+                # rewriting every description is more than the default page
+                # cache holds, so the rollback journal needs the exclusive lock
+                # before the commit
+                HomeService.objects.update(
+                    number_of_served_clients=F("number_of_served_clients") + 1,
+                    description=str(len(commits)) * 2000,
+                )
+                time.sleep(hold)
+        except OperationalError:
+            errors.append(1)
+        else:
+            commits.append(1)
+        close_old_connections()
+
+
+def worker(args):
+    setup_django(None)
+    from django.db import connection
+
+    stop = threading.Event()
+    latencies, read_errors, commits, write_errors = [], [], [], []
+    threads = [
+        threading.Thread(target=reader, args=(stop, latencies, read_errors))
+        for _ in range(args.readers)
+    ]
+    threads.append(
+        threading.Thread(target=writer, args=(stop, commits, write_errors, args.hold))
+    )
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    connection.close()
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        json.dumps(
+            {
+                "reads_per_second": len(latencies) / args.duration,
+                "p50_ms": quantiles[49] * 1000,
+                "p99_ms": quantiles[98] * 1000,
+                "max_ms": max(latencies) * 1000,
+                "read_errors": len(read_errors),
+                "commits": len(commits),
+                "write_errors": len(write_errors),
+            }
+        )
+    )
+
+
+def main(args):
+    setup_django(None)
+    from django.db import connection
+
+    old_name = connection.settings_dict["NAME"]
+    database = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        seed(args.services)
+        connection.close()
+        print(
+            f"{'profile':>8} {'reads/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+            f"{'max ms':>8} {'read err':>8} {'commits':>8} {'write err':>9}"
+        )
+        with tempfile.TemporaryDirectory() as settings_dir:
+            for profile, settings in PROFILES.items():
+                with open(os.path.join(settings_dir, f"bench_{profile}.py"), "w") as f:
+                    f.write(settings.format(database=str(database)))
+                process = subprocess.run(
+                    [
+                        sys.executable,
+                        os.path.abspath(__file__),
+                        "--worker",
+                        "--readers",
+                        str(args.readers),
+                        "--duration",
+                        str(args.duration),
+                        "--hold",
+                        str(args.hold),
+                    ],
+                    env=dict(
+                        os.environ,
+                        PYTHONPATH=os.pathsep.join([settings_dir, BASE_DIR]),
+                        DJANGO_SETTINGS_MODULE=f"bench_{profile}",
+                    ),
+                    capture_output=True,
+                    text=True,
+                )
+                if process.returncode:
+                    sys.exit(process.stderr)
+                result = json.loads(process.stdout.splitlines()[-1])
+                print(
+                    f"{profile:>8} {result['reads_per_second']:>8.1f} "
+                    f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                    f"{result['max_ms']:>8.1f} {result['read_errors']:>8} "
+                    f"{result['commits']:>8} {result['write_errors']:>9}"
+                )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument(
+        "--hold",
+        type=float,
+        default=0.05,
+        help="Seconds a write transaction stays open",
+    )
+    parser.add_argument("--services", type=int, default=2000)
+    parser.add_argument("--worker", action="store_true")
+    args = parser.parse_args()
+    if args.worker:
+        worker(args)
+    else:
+        main(args)
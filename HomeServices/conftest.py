@@ -0,0 +1,17 @@
+import pytest
+from django.core.cache import cache
+from mixer.main import TypeMixerMeta
+
+
+@pytest.fixture(autouse=True)
+def reset_mixer():
+    # mixer remembers every value it generated for unique fields (one-to-one
+    # users included) for the whole run, but each test rolls the database back
+    # and primary keys are reused, so start every test with a fresh memory
+    TypeMixerMeta.mixers.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # same for cached entries keyed by primary keys
+    cache.clear()
@@ -1,8 +1,11 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import User, NormalUser, Balance
+from .models import User, NormalUser, Balance, BalanceEntry, SellerStats, OutgoingEmail
 
 admin.site.register(User)
 admin.site.register(NormalUser)
 admin.site.register(Balance)
+admin.site.register(BalanceEntry)
+admin.site.register(SellerStats)
+admin.site.register(OutgoingEmail)
@@ -0,0 +1,146 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from knox.auth import TokenAuthentication
+from knox.models import AuthToken
+from knox.settings import knox_settings
+from rest_framework import exceptions
+from .models import User
+
+# how long a verified token is trusted without looking at the token table, the
+# entry is deleted as soon as the token is (logout, logout all, expiry ...)
+AUTH_TOKEN_CACHE_TTL = getattr(settings, "AUTH_TOKEN_CACHE_TTL", 60)
+# the in-process copy can't be reached from other processes on logout, so it is
+# only kept for a moment
+AUTH_TOKEN_LOCAL_CACHE_TTL = getattr(settings, "AUTH_TOKEN_LOCAL_CACHE_TTL", 2)
+AUTH_TOKEN_LOCAL_CACHE_SIZE = getattr(settings, "AUTH_TOKEN_LOCAL_CACHE_SIZE", 1024)
+
+
+class LocalTokenCache:
+    """A small thread safe LRU with a per entry time to live."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_token_cache = LocalTokenCache(
+    AUTH_TOKEN_LOCAL_CACHE_SIZE, AUTH_TOKEN_LOCAL_CACHE_TTL
+)
+
+
+def get_token_cache_key(token: bytes):
+    # a keyed blake2b instead of knox's sha512 digest: much cheaper, and the
+    # raw token never ends up in the shared cache
+    key = settings.SECRET_KEY.encode()[:64]
+    return "auth_token:" + hashlib.blake2b(token, digest_size=20, key=key).hexdigest()
+
+
+def get_digest_cache_key(digest: str):
+    return f"auth_token_digest:{digest}"
+
+
+def remember_token(key, auth_token: AuthToken):
+    entry = {
+        "digest": auth_token.digest,
+        "token_key": auth_token.token_key,
+        "user_id": auth_token.user_id,
+        "created": auth_token.created,
+        "expiry": auth_token.expiry,
+    }
+    ttl = AUTH_TOKEN_CACHE_TTL
+    if auth_token.expiry is not None:
+        ttl = min(ttl, (auth_token.expiry - timezone.now()).total_seconds())
+    if ttl <= 0:
+        return
+    # the digest is all a deleted token tells us, it leads to the cache key
+    cache.set_many(
+        {key: entry, get_digest_cache_key(auth_token.digest): key}, int(ttl) or 1
+    )
+    local_token_cache.set(key, entry)
+
+
+def forget_token(digest: str):
+    digest_key = get_digest_cache_key(digest)
+    key = cache.get(digest_key)
+    if key is not None:
+        cache.delete_many([key, digest_key])
+        local_token_cache.delete(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    knox's TokenAuthentication, but a token seen in the last
+    AUTH_TOKEN_CACHE_TTL seconds is looked up in the cache, skipping the
+    token table and the digest, only the user is loaded.
+    """
+
+    def authenticate_credentials(self, token):
+        if knox_settings.AUTO_REFRESH:
+            # every request has to push the expiry forward in the database
+            return super().authenticate_credentials(token)
+        key = get_token_cache_key(token)
+        entry = local_token_cache.get(key)
+        if entry is None:
+            entry = cache.get(key)
+            if entry is not None:
+                # not refreshed on local hits, a logout in another process
+                # must be seen after AUTH_TOKEN_LOCAL_CACHE_TTL at the latest
+                local_token_cache.set(key, entry)
+        if entry is not None and (
+            entry["expiry"] is None or entry["expiry"] > timezone.now()
+        ):
+            try:
+                user = User.objects.get(pk=entry["user_id"])
+            except User.DoesNotExist:
+                forget_token(entry["digest"])
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            auth_token = AuthToken(
+                digest=entry["digest"],
+                token_key=entry["token_key"],
+                user=user,
+                created=entry["created"],
+                expiry=entry["expiry"],
+            )
+            auth_token._state.adding = False
+            return self.validate_user(auth_token)
+
+        user, auth_token = super().authenticate_credentials(token)
+        remember_token(key, auth_token)
+        return user, auth_token
@@ -0,0 +1,31 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    The SQLite backend with the OPTIONS["transaction_mode"] of Django 5.1.
+
+    With the default DEFERRED mode a transaction only asks for the write lock
+    at its first write, two concurrent read-then-write transactions then fail
+    with "database is locked" instead of waiting for each other. IMMEDIATE
+    takes the lock at BEGIN so the busy timeout applies. Every atomic() block
+    in this project writes, so IMMEDIATE is what the settings use.
+    """
+
+    transaction_mode = "DEFERRED"
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        transaction_mode = params.pop("transaction_mode", None) or "DEFERRED"
+        if transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}"
+            )
+        self.transaction_mode = transaction_mode.upper()
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f"BEGIN {self.transaction_mode}")
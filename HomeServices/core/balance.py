@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from .models import Balance, BalanceEntry
+
+
+class InsufficientBalance(Exception):
+    pass
+
+
+class MissingBalance(Exception):
+    pass
+
+
+@transaction.atomic
+def debit(user_id: int, amount: int, reason: str, order=None):
+    # UPDATE ... SET total_balance = total_balance - amount
+    # WHERE total_balance >= amount, the check and the write can't be raced
+    debited = Balance.objects.filter(user_id=user_id, total_balance__gte=amount).update(
+        total_balance=F("total_balance") - amount
+    )
+    if not debited:
+        raise InsufficientBalance
+    BalanceEntry.objects.create(
+        user_id=user_id, amount=-amount, reason=reason, order=order
+    )
+
+
+@transaction.atomic
+def credit(user_id: int, amount: int, reason: str, order=None):
+    credited = Balance.objects.filter(user_id=user_id).update(
+        total_balance=F("total_balance") + amount
+    )
+    # an entry without a balance row would never show in get_unbalanced_accounts
+    if not credited:
+        raise MissingBalance
+    BalanceEntry.objects.create(
+        user_id=user_id, amount=amount, reason=reason, order=order
+    )
+
+
+@transaction.atomic
+def transfer(from_user_id: int, to_user_id: int, amount: int):
+    debit(from_user_id, amount, "transfer")
+    credit(to_user_id, amount, "transfer")
+
+
+def get_unbalanced_accounts():
+    """Balances whose total doesn't match the sum of their ledger entries."""
+    return Balance.objects.annotate(
+        ledger_total=Coalesce(Sum("user__balance_entries__amount"), 0)
+    ).exclude(total_balance=F("ledger_total"))
@@ -0,0 +1,90 @@
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+# confirmation and reset codes with their attempt counters live in the cache
+# (INCR/EXPIRE on redis) instead of the user row, a wrong guess costs no SQL write
+CODE_TIMEOUT = getattr(settings, "VERIFICATION_CODE_TIMEOUT", 60 * 60 * 24)
+ATTEMPTS_PERIOD = timedelta(hours=24)
+
+
+class AttemptCounter:
+    """
+    Allows `limit` attempts per `period`, the period starts with the first
+    attempt and the counter expires on its own when it is over.
+    """
+
+    def __init__(self, name: str, limit: int = 3, period: timedelta = ATTEMPTS_PERIOD):
+        self.name = name
+        self.limit = limit
+        self.period = period
+
+    def get_keys(self, user_id: int):
+        key = f"attempts:{self.name}:{user_id}"
+        return key, f"{key}:until"
+
+    def is_blocked(self, user_id: int):
+        key, _ = self.get_keys(user_id)
+        return (cache.get(key) or 0) >= self.limit
+
+    def hit(self, user_id: int):
+        """Counts an attempt and returns True if it was the last allowed one."""
+        key, until_key = self.get_keys(user_id)
+        timeout = self.period.total_seconds()
+        cache.add(until_key, timezone.now() + self.period, timeout)
+        cache.add(key, 0, timeout)
+        try:
+            attempts = cache.incr(key)
+        except ValueError:
+            # expired between add() and incr()
+            cache.set(key, 1, timeout)
+            attempts = 1
+        return attempts >= self.limit
+
+    def retry_after(self, user_id: int):
+        _, until_key = self.get_keys(user_id)
+        until = cache.get(until_key)
+        if until is None:
+            return timedelta(0)
+        return max(until - timezone.now(), timedelta(0))
+
+    def reset(self, user_id: int):
+        cache.delete_many(self.get_keys(user_id))
+
+
+class VerificationCode:
+    """A 6-digit code sent by email and the counter of wrong guesses against it."""
+
+    def __init__(self, name: str, attempts: AttemptCounter):
+        self.name = name
+        self.attempts = attempts
+
+    def get_key(self, user_id: int):
+        return f"code:{self.name}:{user_id}"
+
+    def issue(self, user_id: int):
+        code = str(random.randint(100000, 999999))
+        cache.set(self.get_key(user_id), code, CODE_TIMEOUT)
+        return code
+
+    def get(self, user_id: int):
+        return cache.get(self.get_key(user_id))
+
+    def matches(self, user_id: int, value):
+        code = self.get(user_id)
+        return code is not None and constant_time_compare(code, str(value))
+
+    def discard(self, user_id: int):
+        cache.delete(self.get_key(user_id))
+        self.attempts.reset(user_id)
+
+
+confirmation_code = VerificationCode("confirm_email", AttemptCounter("confirm_email"))
+forget_password_code = VerificationCode(
+    "forget_password", AttemptCounter("forget_password")
+)
+# one quota for every code email, confirmation and password reset alike
+send_code_attempts = AttemptCounter("send_code")
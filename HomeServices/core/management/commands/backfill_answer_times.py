@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.stats import backfill_answer_times
+
+
+class Command(BaseCommand):
+    help = "Recompute every seller's answer time aggregate and average_fast_answer"
+
+    def handle(self, *args, **options):
+        count = backfill_answer_times()
+        self.stdout.write(
+            self.style.SUCCESS(f"Backfilled answer times for {count} sellers")
+        )
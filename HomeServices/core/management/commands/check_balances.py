@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.balance import get_unbalanced_accounts
+
+
+class Command(BaseCommand):
+    help = "Check that every balance equals the sum of its ledger entries"
+
+    def handle(self, *args, **options):
+        unbalanced = get_unbalanced_accounts().select_related("user__user")
+        for balance in unbalanced:
+            self.stdout.write(
+                f"{balance}: balance {balance.total_balance}, "
+                f"ledger {balance.ledger_total}"
+            )
+        if unbalanced:
+            raise CommandError(f"{len(unbalanced)} balances don't match their ledger")
+        self.stdout.write(self.style.SUCCESS("All balances match their ledger"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.stats import rebuild_seller_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the statistics row of every seller from services and orders"
+
+    def handle(self, *args, **options):
+        count = rebuild_seller_stats()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} users"))
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from core.outbox import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the queued emails now, e.g. with "
+        "--backend django.core.mail.backends.filebased.EmailBackend "
+        "to measure the outbox throughput without a mail server"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--backend", default=None, help="Email backend, defaults to EMAIL_BACKEND"
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        sent = send_queued_emails(options["batch_size"], options["backend"])
+        elapsed = time.perf_counter() - start
+        rate = sent / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(f"Sent {sent} emails in {elapsed:.2f}s ({rate:.0f}/s)")
+        )
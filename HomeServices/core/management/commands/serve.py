@@ -0,0 +1,190 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def get_cpu_count():
+    # the CPUs this process may run on, a container limited with --cpuset-cpus
+    # reports fewer than os.cpu_count()
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def get_worker_count(interface: str, cpus: int):
+    if interface == "asgi":
+        # one event loop per core, the extra one covers a worker being recycled
+        return cpus + 1
+    # the usual (2 x cores) + 1, half of them are waiting on I/O at any time
+    return cpus * 2 + 1
+
+
+def get_thread_count(interface: str, cpus: int):
+    if interface == "asgi":
+        return 1
+    return min(4, max(2, cpus))
+
+
+def get_server_options(options: dict):
+    cpus = get_cpu_count()
+    interface = options["interface"]
+    workers = options["workers"] or int(
+        os.getenv("WEB_CONCURRENCY", get_worker_count(interface, cpus))
+    )
+    threads = options["threads"] or get_thread_count(interface, cpus)
+    server_options = {
+        "bind": options["bind"],
+        "workers": workers,
+        "preload_app": options["preload"],
+        # recycle workers now and then so a slow leak can't grow forever, the
+        # jitter keeps them from all restarting at the same moment
+        "max_requests": options["max_requests"],
+        "max_requests_jitter": max(1, options["max_requests"] // 10),
+        "timeout": options["timeout"],
+        "graceful_timeout": options["timeout"],
+        "keepalive": 5,
+        "accesslog": "-",
+        "errorlog": "-",
+    }
+    if interface == "asgi":
+        server_options["worker_class"] = "uvicorn.workers.UvicornWorker"
+    else:
+        server_options["worker_class"] = "gthread"
+        server_options["threads"] = threads
+    return server_options
+
+
+class QClusterSupervisor:
+    """Runs `manage.py qcluster` next to the web server and restarts it if it dies."""
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.process = None
+        self.stopping = threading.Event()
+
+    def spawn(self):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(settings.BASE_DIR, "manage.py"), "qcluster"]
+        )
+        self.stdout.write(f"Started qcluster (pid {self.process.pid})")
+
+    def watch(self):
+        backoff = 1
+        while not self.stopping.is_set():
+            started = time.monotonic()
+            returncode = self.process.wait()
+            if self.stopping.is_set():
+                return
+            # a cluster that keeps crashing right away is restarted less often
+            backoff = 1 if time.monotonic() - started > 60 else min(backoff * 2, 60)
+            self.stdout.write(
+                f"qcluster exited with {returncode}, restarting in {backoff}s"
+            )
+            if self.stopping.wait(backoff):
+                return
+            self.spawn()
+
+    def start(self):
+        self.spawn()
+        threading.Thread(target=self.watch, daemon=True).start()
+
+    def stop(self, timeout=30):
+        self.stopping.set()
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the site with a pre-forking gunicorn server (uvicorn workers for "
+        "ASGI, threaded workers for WSGI) and keep a django-q cluster running "
+        "next to it. Send SIGHUP for a graceful reload of the workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bind", default=f"0.0.0.0:{os.getenv('PORT', '8000')}")
+        parser.add_argument(
+            "--interface",
+            choices=["asgi", "wsgi"],
+            default=getattr(settings, "SERVER_INTERFACE", "asgi"),
+            help="Defaults to the SERVER_INTERFACE setting",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Defaults to WEB_CONCURRENCY or a count derived from the CPUs",
+        )
+        parser.add_argument("--threads", type=int, default=None)
+        parser.add_argument("--max-requests", type=int, default=1000)
+        parser.add_argument("--timeout", type=int, default=30)
+        parser.add_argument(
+            "--no-preload",
+            dest="preload",
+            action="store_false",
+            help="Import the app in every worker instead of once before forking",
+        )
+        parser.add_argument("--no-qcluster", dest="qcluster", action="store_false")
+
+    def handle(self, *args, **options):
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            raise CommandError("gunicorn is required, pip install gunicorn uvicorn")
+
+        interface = options["interface"]
+        if interface != getattr(settings, "SERVER_INTERFACE", "asgi"):
+            # the database settings were chosen for the other interface
+            raise CommandError(
+                f"Set SERVER_INTERFACE={interface} instead of --interface {interface}"
+            )
+        server_options = get_server_options(options)
+        supervisor = QClusterSupervisor(self.stdout) if options["qcluster"] else None
+
+        def when_ready(server):
+            if supervisor is not None:
+                supervisor.start()
+
+        def on_exit(server):
+            if supervisor is not None:
+                supervisor.stop(options["timeout"])
+
+        def post_fork(server, worker):
+            # connections opened while preloading must not be shared with children
+            from django.db import connections
+
+            connections.close_all()
+
+        server_options.update(
+            when_ready=when_ready, on_exit=on_exit, post_fork=post_fork
+        )
+
+        class Application(BaseApplication):
+            def load_config(self):
+                for key, value in server_options.items():
+                    self.cfg.set(key, value)
+
+            def load(self):
+                if interface == "asgi":
+                    from HomeServices.asgi import application
+                else:
+                    from HomeServices.wsgi import application
+                return application
+
+        self.stdout.write(
+            f"Serving {interface} on {server_options['bind']} with "
+            f"{server_options['workers']} workers "
+            f"({server_options.get('threads', 1)} threads each)"
+        )
+        Application().run()
@@ -0,0 +1,88 @@
+# Generated by Django 5.0.2 on 2026-10-17 10:15
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DurationField, F, Q, Sum
+
+
+def fill_seller_stats(apps, schema_editor):
+    NormalUser = apps.get_model("core", "NormalUser")
+    SellerStats = apps.get_model("core", "SellerStats")
+    HomeService = apps.get_model("services", "HomeService")
+    OrderService = apps.get_model("services", "OrderService")
+
+    stats = {
+        seller_id: SellerStats(user_id=seller_id)
+        for seller_id in NormalUser.objects.values_list("id", flat=True)
+    }
+    rated = ~Q(average_ratings=0)
+    for row in HomeService.objects.values("seller").annotate(
+        services_count=Count("id"),
+        served_clients=Sum("number_of_served_clients"),
+        rating_sum=Sum("average_ratings", filter=rated),
+        rating_count=Count("id", filter=rated),
+    ):
+        seller_stats = stats[row["seller"]]
+        seller_stats.services_count = row["services_count"]
+        seller_stats.served_clients = row["served_clients"] or 0
+        seller_stats.rating_sum = row["rating_sum"] or 0
+        seller_stats.rating_count = row["rating_count"]
+    for row in (
+        OrderService.objects.exclude(status="Pending")
+        .exclude(answer_time=None)
+        .values("home_service__seller")
+        .annotate(
+            answer_time_sum=Sum(
+                F("answer_time") - F("create_date"), output_field=DurationField()
+            ),
+            answer_count=Count("id"),
+        )
+    ):
+        seller_stats = stats[row["home_service__seller"]]
+        seller_stats.answer_time_sum = row["answer_time_sum"] or datetime.timedelta(0)
+        seller_stats.answer_count = row["answer_count"]
+    SellerStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0037_user_is_provider"),
+        ("services", "0049_homeservice_home_service_rating_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SellerStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("served_clients", models.PositiveIntegerField(default=0)),
+                ("services_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.FloatField(default=0)),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                (
+                    "answer_time_sum",
+                    models.DurationField(default=datetime.timedelta(0)),
+                ),
+                ("answer_count", models.PositiveIntegerField(default=0)),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stats",
+                        to="core.normaluser",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(fill_seller_stats, migrations.RunPython.noop),
+    ]
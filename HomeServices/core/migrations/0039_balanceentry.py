@@ -0,0 +1,73 @@
+# Generated by Django 5.0.2 on 2026-10-17 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    Balance = apps.get_model("core", "Balance")
+    BalanceEntry = apps.get_model("core", "BalanceEntry")
+    BalanceEntry.objects.bulk_create(
+        BalanceEntry(user_id=user_id, amount=total_balance, reason="opening")
+        for user_id, total_balance in Balance.objects.exclude(
+            total_balance=0
+        ).values_list("user_id", "total_balance")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0038_sellerstats"),
+        ("services", "0049_homeservice_home_service_rating_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BalanceEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("amount", models.IntegerField()),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("opening", "opening"),
+                            ("charge", "charge"),
+                            ("transfer", "transfer"),
+                            ("fees", "fees"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("create_date", models.DateTimeField(auto_now_add=True)),
+                (
+                    "order",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="balance_entries",
+                        to="services.orderservice",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="balance_entries",
+                        to="core.normaluser",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
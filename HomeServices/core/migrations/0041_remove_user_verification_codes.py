@@ -0,0 +1,67 @@
+# Generated by Django 5.0.2 on 2026-10-17 16:20
+
+from django.core.cache import cache
+from django.db import migrations
+from django.db.models import Q
+
+
+def move_pending_codes(apps, schema_editor):
+    # codes sent before the deploy would go with their columns, the users
+    # waiting on them can still confirm or reset with the code they have
+    from core.codes import CODE_TIMEOUT, confirmation_code, forget_password_code
+
+    User = apps.get_model("core", "User")
+    codes = {}
+    pending = User.objects.filter(
+        Q(is_active=False, confirmation_code__isnull=False)
+        | Q(forget_password_code__isnull=False)
+    ).values_list("id", "is_active", "confirmation_code", "forget_password_code")
+    for user_id, is_active, confirm_code, forget_code in pending.iterator():
+        if confirm_code and not is_active:
+            codes[confirmation_code.get_key(user_id)] = confirm_code
+        if forget_code:
+            codes[forget_password_code.get_key(user_id)] = forget_code
+    cache.set_many(codes, CODE_TIMEOUT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0040_outgoingemail"),
+    ]
+
+    operations = [
+        migrations.RunPython(move_pending_codes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="user",
+            name="confirmation_tries",
+        ),
+        migrations.RemoveField(
+            model_name="user",
+            name="next_confirm_try",
+        ),
+        migrations.RemoveField(
+            model_name="user",
+            name="confirmation_code",
+        ),
+        migrations.RemoveField(
+            model_name="user",
+            name="resend_tries",
+        ),
+        migrations.RemoveField(
+            model_name="user",
+            name="next_confirmation_code_sent",
+        ),
+        migrations.RemoveField(
+            model_name="user",
+            name="forget_confirmation_tries",
+        ),
+        migrations.RemoveField(
+            model_name="user",
+            name="forget_next_confirm_try",
+        ),
+        migrations.RemoveField(
+            model_name="user",
+            name="forget_password_code",
+        ),
+    ]
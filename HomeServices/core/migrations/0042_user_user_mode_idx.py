@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0041_remove_user_verification_codes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(fields=["mode"], name="user_mode_idx"),
+        ),
+    ]
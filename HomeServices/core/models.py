@@ -1,4 +1,6 @@
+from datetime import timedelta
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
 gender_choices = [
@@ -9,6 +11,20 @@ mode_choices = [
     ("client", "buyer"),
     ("seller", "seller_buyer"),
 ]
+email_status_choices = [
+    ("queued", "queued"),
+    ("sent", "sent"),
+    ("failed", "failed"),
+]
+balance_entry_choices = [
+    ("opening", "opening"),
+    ("charge", "charge"),
+    ("transfer", "transfer"),
+    ("fees", "fees"),
+]
+# what the users directory shows of a user, saves that change none of it keep
+# the directory cache
+directory_fields = ("username", "first_name", "last_name", "photo", "mode")
 
 
 class User(AbstractUser):
@@ -22,18 +38,24 @@ class User(AbstractUser):
         "services.Area", on_delete=models.SET_NULL, null=True, related_name="user_area"
     )
 
-    confirmation_tries = models.IntegerField(default=3, blank=True)
-    next_confirm_try = models.DateTimeField(blank=True, null=True)
-    confirmation_code = models.CharField(null=True, blank=True, max_length=6)
+    is_provider = models.BooleanField(default=False)
 
-    resend_tries = models.IntegerField(default=3, blank=True)
-    next_confirmation_code_sent = models.DateTimeField(blank=True, null=True)
+    class Meta(AbstractUser.Meta):
+        indexes = [models.Index(fields=["mode"], name="user_mode_idx")]
 
-    forget_confirmation_tries = models.IntegerField(default=3, blank=True)
-    forget_next_confirm_try = models.DateTimeField(blank=True, null=True)
-    forget_password_code = models.CharField(blank=True, null=True, max_length=6)
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._directory_values = instance.get_directory_values()
+        return instance
 
-    is_provider = models.BooleanField(default=False)
+    def get_directory_values(self):
+        deferred = self.get_deferred_fields()
+        return {
+            field: str(getattr(self, field))
+            for field in directory_fields
+            if field not in deferred
+        }
 
     def to_dict(self, host):
         return {
@@ -73,3 +95,78 @@ class Balance(models.Model):
 
     def __str__(self):
         return self.user.user.username
+
+
+class BalanceEntry(models.Model):
+    """
+    Append-only ledger, every change of Balance.total_balance is recorded here
+    so the running balance always equals the sum of its entries.
+    """
+
+    user = models.ForeignKey(
+        "NormalUser", on_delete=models.CASCADE, related_name="balance_entries"
+    )
+    amount = models.IntegerField()
+    reason = models.CharField(choices=balance_entry_choices, max_length=20)
+    order = models.ForeignKey(
+        "services.OrderService",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="balance_entries",
+    )
+    create_date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user} {self.amount:+d} ({self.reason})"
+
+
+class SellerStats(models.Model):
+    user = models.OneToOneField(
+        "NormalUser", on_delete=models.CASCADE, related_name="stats"
+    )
+    served_clients = models.PositiveIntegerField(default=0)
+    services_count = models.PositiveIntegerField(default=0)
+    # sum and count of the average ratings of the seller's rated services
+    rating_sum = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    # sum and count of the time the seller took to accept or reject orders
+    answer_time_sum = models.DurationField(default=timedelta(0))
+    answer_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.user.user.username
+
+    @property
+    def average_rating(self):
+        if self.rating_count == 0:
+            return 0
+        return self.rating_sum / self.rating_count
+
+
+class OutgoingEmail(models.Model):
+    """Emails waiting to be sent by core.outbox.send_queued_emails"""
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default="")
+    from_email = models.CharField(max_length=255, blank=True, null=True)
+    to = models.EmailField()
+    status = models.CharField(
+        choices=email_status_choices, max_length=10, default="queued"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    create_date = models.DateTimeField(auto_now_add=True)
+    sent_date = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt"], name="outgoing_email_queue_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.status})"
@@ -0,0 +1,112 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+EMAIL_OUTBOX_BATCH_SIZE = getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 50)
+EMAIL_OUTBOX_MAX_ATTEMPTS = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+# a drain that runs longer than this is considered dead and the lock is released
+EMAIL_OUTBOX_LOCK_TIMEOUT = getattr(settings, "EMAIL_OUTBOX_LOCK_TIMEOUT", 60 * 5)
+EMAIL_OUTBOX_LOCK_KEY = "email_outbox_lock"
+
+
+def queue_email(subject, message, recipient_list, html_message=None, from_email=None):
+    """
+    Same arguments as django.core.mail.send_mail, but the emails are only stored
+    and sent later by the django-q cluster, so the request never waits on SMTP.
+    """
+    OutgoingEmail.objects.bulk_create(
+        OutgoingEmail(
+            subject=subject,
+            body=message,
+            html_body=html_message or "",
+            from_email=from_email or settings.EMAIL_HOST_USER,
+            to=to,
+        )
+        for to in recipient_list
+    )
+
+
+def get_retry_delay(attempts: int):
+    # 1, 2, 4, 8 ... minutes
+    return timedelta(minutes=2 ** (attempts - 1))
+
+
+def build_message(email: OutgoingEmail, connection):
+    message = EmailMultiAlternatives(
+        email.subject, email.body, email.from_email, [email.to], connection=connection
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, "text/html")
+    return message
+
+
+def send_batch(emails, connection):
+    now = timezone.now()
+    sent_ids = []
+    failed = []
+    for email in emails:
+        try:
+            connection.send_messages([build_message(email, connection)])
+        except Exception as error:
+            logger.warning("Sending email %s failed: %s", email.id, error)
+            # start over with a fresh connection for the next message, a closed
+            # one would make the SMTP backend connect again for every message
+            connection.close()
+            try:
+                connection.open()
+            except Exception as error:
+                logger.warning("Reopening the email connection failed: %s", error)
+            email.attempts += 1
+            email.last_error = str(error)
+            email.next_attempt = now + get_retry_delay(email.attempts)
+            if email.attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+                email.status = "failed"
+            failed.append(email)
+        else:
+            sent_ids.append(email.id)
+
+    with transaction.atomic():
+        OutgoingEmail.objects.filter(id__in=sent_ids).update(
+            status="sent", sent_date=now
+        )
+        OutgoingEmail.objects.bulk_update(
+            failed, ["attempts", "last_error", "next_attempt", "status"]
+        )
+    return len(sent_ids)
+
+
+def send_queued_emails(batch_size=None, backend=None):
+    """
+    Send every due email of the outbox in batches over a single connection,
+    returns how many were sent. Runs every minute from the django-q cluster.
+    """
+    batch_size = batch_size or EMAIL_OUTBOX_BATCH_SIZE
+    # only one drain at a time, otherwise two workers could send the same email
+    if not cache.add(EMAIL_OUTBOX_LOCK_KEY, True, EMAIL_OUTBOX_LOCK_TIMEOUT):
+        return 0
+    sent = 0
+    last_id = 0
+    try:
+        with get_connection(backend) as connection:
+            while True:
+                emails = list(
+                    OutgoingEmail.objects.filter(
+                        status="queued",
+                        next_attempt__lte=timezone.now(),
+                        id__gt=last_id,
+                    ).order_by("id")[:batch_size]
+                )
+                if not emails:
+                    break
+                sent += send_batch(emails, connection)
+                last_id = emails[-1].id
+    finally:
+        cache.delete(EMAIL_OUTBOX_LOCK_KEY)
+    return sent
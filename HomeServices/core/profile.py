@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+USER_INFO_CACHE_TIMEOUT = getattr(settings, "USER_INFO_CACHE_TIMEOUT", 60 * 60)
+
+
+def get_user_info_cache_key(normal_user_id: int):
+    return f"user_info:{normal_user_id}"
+
+
+def get_cached_user_info(normal_user_id: int):
+    return cache.get(get_user_info_cache_key(normal_user_id))
+
+
+def cache_user_info(normal_user_id: int, user_info: dict):
+    cache.set(
+        get_user_info_cache_key(normal_user_id), user_info, USER_INFO_CACHE_TIMEOUT
+    )
+
+
+async def aget_cached_user_info(normal_user_id: int):
+    return await cache.aget(get_user_info_cache_key(normal_user_id))
+
+
+async def acache_user_info(normal_user_id: int, user_info: dict):
+    await cache.aset(
+        get_user_info_cache_key(normal_user_id), user_info, USER_INFO_CACHE_TIMEOUT
+    )
+
+
+def invalidate_user_info(*normal_user_ids):
+    """Drop the profile snapshots once the change that made them stale commits."""
+    keys = [
+        get_user_info_cache_key(normal_user_id) for normal_user_id in normal_user_ids
+    ]
+    transaction.on_commit(lambda: cache.delete_many(keys))
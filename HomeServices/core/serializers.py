@@ -5,12 +5,11 @@ from django.contrib.auth.password_validation import validate_password
 from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth.tokens import default_token_generator
 from django.utils import timezone
-from django.core.mail import send_mail
+from .outbox import queue_email
+from .codes import confirmation_code, forget_password_code
 from django.conf import settings
 from rest_framework.validators import ValidationError
 from services.serializers import CategorySerializer
-import random
-from datetime import timedelta
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 
@@ -163,7 +162,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        user = User.objects.create(
+        user = User(
             username=validated_data["username"],
             email=validated_data["email"],
             first_name=validated_data["first_name"],
@@ -172,23 +171,19 @@ class RegisterSerializer(serializers.ModelSerializer):
             gender=validated_data["gender"],
             mode=validated_data["mode"],
             area=validated_data["area"],
+            is_active=False,
         )
         user.set_password(validated_data["password"])
-        user.is_active = False
-        user.confirmation_tries = 3
-        user.resend_tries = 2
-        user.confirmation_code = str(random.randint(100000, 999999))
         user.save()
+        code = confirmation_code.issue(user.id)
 
         subject = "Confirm your email"
-        html_message = render_to_string(
-            "core/email_confirmation.html", {"code": user.confirmation_code}
-        )
+        html_message = render_to_string("core/email_confirmation.html", {"code": code})
         plain_message = strip_tags(html_message)
         from_email = settings.EMAIL_HOST_USER
         to = user.email
 
-        send_mail(subject, plain_message, from_email, [to], html_message=html_message)
+        queue_email(subject, plain_message, [to], html_message, from_email)
 
         return user
 
@@ -242,6 +237,21 @@ class UpdateUserPhotoSerializer(serializers.ModelSerializer):
         return instance
 
 
+def validate_forget_password_code(user, value):
+    attempts = forget_password_code.attempts
+    if attempts.is_blocked(user.id):
+        raise serializers.ValidationError(
+            f"Try again after {attempts.retry_after(user.id)}"
+        )
+    if forget_password_code.matches(user.id, value):
+        return value
+    if attempts.hit(user.id):
+        raise serializers.ValidationError(
+            f"Try again after {attempts.retry_after(user.id)}"
+        )
+    raise serializers.ValidationError("Wrong code please try again 🙃")
+
+
 class ForgetPasswordResetSerializer(serializers.Serializer):
     forget_password_code = serializers.CharField(required=True)
     new_password = serializers.CharField(required=True)
@@ -256,35 +266,7 @@ class ForgetPasswordResetSerializer(serializers.Serializer):
         return value
 
     def validate_forget_password_code(self, value):
-        user = self.context["user"]
-        if (
-            user.forget_next_confirm_try is None
-            or user.forget_next_confirm_try <= timezone.now()
-        ):
-            user.forget_confirmation_tries = 3
-            user.forget_next_confirm_try = timezone.now() + timedelta(hours=24)
-            user.save()
-
-        if user.forget_confirmation_tries == 0:
-            raise serializers.ValidationError(
-                f"Try again after {user.forget_next_confirm_try - timezone.now()}"
-            )
-
-        else:
-            if (
-                user.forget_password_code is not None
-                and user.forget_password_code == value
-            ):
-                return value
-            user.forget_confirmation_tries -= 1
-            user.save()
-            if user.forget_confirmation_tries == 0:
-                user.forget_next_confirm_try = timezone.now() + timedelta(hours=24)
-                user.save()
-                raise serializers.ValidationError(
-                    f"Try again after {user.forget_next_confirm_try - timezone.now()}"
-                )
-            raise serializers.ValidationError("Wrong code please try again 🙃")
+        return validate_forget_password_code(self.context["user"], value)
 
     def validate(self, attrs):
         if (
@@ -302,35 +284,7 @@ class CheckForgetPasswordSerializer(serializers.Serializer):
     forget_password_code = serializers.CharField(required=True)
 
     def validate_forget_password_code(self, value):
-        user = self.context["user"]
-        if (
-            user.forget_next_confirm_try is None
-            or user.forget_next_confirm_try <= timezone.now()
-        ):
-            user.forget_confirmation_tries = 3
-            user.forget_next_confirm_try = timezone.now() + timedelta(hours=24)
-            user.save()
-
-        if user.forget_confirmation_tries == 0:
-            raise serializers.ValidationError(
-                f"Try again after {user.forget_next_confirm_try - timezone.now()}"
-            )
-
-        else:
-            if (
-                user.forget_password_code is not None
-                and user.forget_password_code == value
-            ):
-                return value
-            user.forget_confirmation_tries -= 1
-            user.save()
-            if user.forget_confirmation_tries == 0:
-                user.forget_next_confirm_try = timezone.now() + timedelta(hours=24)
-                user.save()
-                raise serializers.ValidationError(
-                    f"Try again after {user.forget_next_confirm_try - timezone.now()}"
-                )
-            raise serializers.ValidationError("Wrong code please try again 🙃")
+        return validate_forget_password_code(self.context["user"], value)
 
 
 class ChargeBalanceSerializer(serializers.Serializer):
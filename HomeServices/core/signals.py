@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from knox.models import AuthToken
+from .models import NormalUser, SellerStats, User, directory_fields
+from .auth import forget_token
+from .profile import invalidate_user_info
+from .timing import time_query
+from services.cache import bump_reference_data_version
+
+
+@receiver(post_save, sender=NormalUser)
+def create_seller_stats(sender, instance, created, **kwargs):
+    if created:
+        SellerStats.objects.create(user=instance)
+
+
+@receiver(post_save, sender=NormalUser)
+def invalidate_normal_user_info(sender, instance, **kwargs):
+    invalidate_user_info(instance.id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_users_directory(sender, instance, created, update_fields, **kwargs):
+    # last_login, is_active, password ... saves don't show in the directory
+    if update_fields is not None and not set(update_fields) & set(directory_fields):
+        return
+    values = instance.get_directory_values()
+    if created or getattr(instance, "_directory_values", None) != values:
+        bump_reference_data_version("users_directory")
+    instance._directory_values = values
+
+
+@receiver(post_save, sender=NormalUser)
+def invalidate_users_directory_on_signup(sender, created, **kwargs):
+    # the directory lists normal users, created right after their User
+    if created:
+        bump_reference_data_version("users_directory")
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=NormalUser)
+def invalidate_users_directory_on_delete(sender, **kwargs):
+    bump_reference_data_version("users_directory")
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_profile_info(sender, instance, created, **kwargs):
+    if created:
+        return
+    normal_user_ids = NormalUser.objects.filter(user=instance).values_list(
+        "id", flat=True
+    )
+    invalidate_user_info(*normal_user_ids)
+
+
+@receiver(post_delete, sender=AuthToken)
+def invalidate_cached_token(sender, instance, **kwargs):
+    # logout, logout all, expired tokens and deleted users all end up here
+    forget_token(instance.digest)
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = dict(getattr(settings, "SQLITE_PRAGMAS", {}))
+    # journal_mode is written into the database file, files kept in git must
+    # not change when a command runs against them
+    keep_journal_mode = getattr(settings, "SQLITE_KEEP_JOURNAL_MODE", [])
+    if str(connection.settings_dict["NAME"]) in map(str, keep_journal_mode):
+        pragmas.pop("journal_mode", None)
+    with connection.cursor() as cursor:
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    # the wrappers belong to the connection handler and outlive reconnects
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
@@ -0,0 +1,151 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, DurationField, F, Q, Sum
+from .models import NormalUser, SellerStats
+from .profile import invalidate_user_info
+
+
+def get_seller_stats(seller: NormalUser):
+    try:
+        return seller.stats
+    except SellerStats.DoesNotExist:
+        return SellerStats(user=seller)
+
+
+def update_seller_stats(seller_id: int, **deltas):
+    # a single UPDATE ... SET field = field + delta, safe under concurrent writes
+    SellerStats.objects.filter(user_id=seller_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    invalidate_user_info(seller_id)
+
+
+def record_service_created(home_service):
+    update_seller_stats(home_service.seller_id, services_count=1)
+
+
+def record_service_deleted(home_service):
+    deltas = {
+        "services_count": -1,
+        "served_clients": -home_service.number_of_served_clients,
+    }
+    if home_service.average_ratings != 0:
+        deltas["rating_sum"] = -home_service.average_ratings
+        deltas["rating_count"] = -1
+    update_seller_stats(home_service.seller_id, **deltas)
+
+
+def record_rating(home_service, previous_average_rating: float):
+    deltas = {
+        "served_clients": 1,
+        "rating_sum": home_service.average_ratings - previous_average_rating,
+    }
+    if previous_average_rating == 0:
+        deltas["rating_count"] = 1
+    update_seller_stats(home_service.seller_id, **deltas)
+
+
+@transaction.atomic
+def record_answer(order):
+    seller_id = order.home_service.seller_id
+    update_seller_stats(
+        seller_id,
+        answer_time_sum=order.answer_time - order.create_date,
+        answer_count=1,
+    )
+    # the UPDATE above holds the row lock until commit, so this read sees the
+    # totals including this answer even with concurrent accepts and rejects
+    answer_time_sum, answer_count = SellerStats.objects.filter(
+        user_id=seller_id
+    ).values_list("answer_time_sum", "answer_count").first() or (None, 0)
+    if answer_count:
+        NormalUser.objects.filter(pk=seller_id).update(
+            average_fast_answer=answer_time_sum / answer_count
+        )
+
+
+def get_answer_times():
+    from services.models import OrderService
+
+    return (
+        OrderService.objects.exclude(status="Pending")
+        .exclude(answer_time=None)
+        .values("home_service__seller")
+        .annotate(
+            answer_time_sum=Sum(
+                F("answer_time") - F("create_date"), output_field=DurationField()
+            ),
+            answer_count=Count("id"),
+        )
+    )
+
+
+@transaction.atomic
+def backfill_answer_times():
+    answers = {row["home_service__seller"]: row for row in get_answer_times()}
+
+    stats = list(SellerStats.objects.all())
+    for seller_stats in stats:
+        row = answers.get(seller_stats.user_id)
+        seller_stats.answer_time_sum = row["answer_time_sum"] if row else timedelta(0)
+        seller_stats.answer_count = row["answer_count"] if row else 0
+    SellerStats.objects.bulk_update(
+        stats, ["answer_time_sum", "answer_count"], batch_size=500
+    )
+
+    users = list(NormalUser.objects.only("id", "average_fast_answer"))
+    for user in users:
+        row = answers.get(user.id)
+        if row and row["answer_count"]:
+            user.average_fast_answer = row["answer_time_sum"] / row["answer_count"]
+        else:
+            user.average_fast_answer = None
+    NormalUser.objects.bulk_update(users, ["average_fast_answer"], batch_size=500)
+    invalidate_user_info(*(user.id for user in users))
+    return len(answers)
+
+
+@transaction.atomic
+def rebuild_seller_stats():
+    from services.models import HomeService
+
+    rated = ~Q(average_ratings=0)
+    services = HomeService.objects.values("seller").annotate(
+        services_count=Count("id"),
+        served_clients=Sum("number_of_served_clients"),
+        rating_sum=Sum("average_ratings", filter=rated),
+        rating_count=Count("id", filter=rated),
+    )
+    answers = get_answer_times()
+
+    stats = {
+        seller_id: SellerStats(user_id=seller_id)
+        for seller_id in NormalUser.objects.values_list("id", flat=True)
+    }
+    for row in services:
+        seller_stats = stats[row["seller"]]
+        seller_stats.services_count = row["services_count"]
+        seller_stats.served_clients = row["served_clients"] or 0
+        seller_stats.rating_sum = row["rating_sum"] or 0
+        seller_stats.rating_count = row["rating_count"]
+    for row in answers:
+        seller_stats = stats[row["home_service__seller"]]
+        seller_stats.answer_time_sum = row["answer_time_sum"] or timedelta(0)
+        seller_stats.answer_count = row["answer_count"]
+
+    SellerStats.objects.bulk_create(
+        stats.values(),
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=[
+            "served_clients",
+            "services_count",
+            "rating_sum",
+            "rating_count",
+            "answer_time_sum",
+            "answer_count",
+        ],
+    )
+    invalidate_user_info(*stats)
+    return len(stats)
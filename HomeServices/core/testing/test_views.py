@@ -4,11 +4,31 @@ from hypothesis.extra.django import TestCase
 from rest_framework.test import APIClient
 from rest_framework.reverse import reverse, reverse_lazy
 from core.views import User, NormalUser, Balance
-from services.models import Area
+from services.models import Area, Category, HomeService, OrderService
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from core.models import SellerStats, OutgoingEmail, BalanceEntry
+from core.outbox import send_queued_emails
+from django.core import mail
+from django.contrib.auth.signals import user_login_failed
+from unittest import mock
+from core.stats import rebuild_seller_stats
+from core.balance import credit, transfer, InsufficientBalance, MissingBalance
+from core.balance import get_unbalanced_accounts
 from knox.auth import AuthToken
+from core.auth import local_token_cache
+from core.codes import confirmation_code, forget_password_code
+from core.management.commands.serve import get_server_options
+from django.core.cache import cache
 from hypothesis import strategies, given
-from datetime import timedelta
 from django.utils import timezone
+from django.test import TransactionTestCase, override_settings
+from django.db import transaction
+from concurrent.futures import ThreadPoolExecutor
+from services.views import MyOrders
+import json
+import os
+import tempfile
 
 pytest_mark = pytest.mark.django_db
 
@@ -83,16 +103,75 @@ class TestCoreAPIViews(TestCase):
         assert response.status_code == 201
         assert query.user.username == "test"
 
+    def test_register_queues_confirmation_email(self):
+        self.test_register_success()
+        user = User.objects.get(username="test")
+        assert mail.outbox == []
+        email = OutgoingEmail.objects.get(to="user@example.com")
+        assert email.status == "queued"
+
+        assert send_queued_emails() == 1
+        assert mail.outbox[0].to == ["user@example.com"]
+        assert confirmation_code.get(user.id) in mail.outbox[0].alternatives[0][0]
+        email.refresh_from_db()
+        assert email.status == "sent"
+        assert send_queued_emails() == 0
+
+    def test_outbox_retries_with_backoff(self):
+        for to in ("first@example.com", "second@example.com"):
+            OutgoingEmail.objects.create(subject="hi", body="hi", to=to)
+
+        send_messages = mock.Mock(side_effect=[OSError("connection reset"), 1])
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            send_messages,
+        ):
+            assert send_queued_emails(batch_size=1) == 1
+
+        failed = OutgoingEmail.objects.get(to="first@example.com")
+        assert failed.status == "queued"
+        assert failed.attempts == 1
+        assert failed.next_attempt > timezone.now()
+        # not due yet
+        assert send_queued_emails() == 0
+
+        OutgoingEmail.objects.filter(pk=failed.pk).update(next_attempt=timezone.now())
+        assert send_queued_emails() == 1
+        assert not OutgoingEmail.objects.filter(status="queued").exists()
+
+    def test_outbox_reopens_the_connection_after_a_failure(self):
+        for to in ("first@example.com", "second@example.com", "third@example.com"):
+            OutgoingEmail.objects.create(subject="hi", body="hi", to=to)
+
+        backend = "django.core.mail.backends.locmem.EmailBackend"
+        calls = mock.Mock()
+        calls.send_messages.side_effect = [OSError("connection reset"), 1, 1]
+        with mock.patch(f"{backend}.open", calls.open), mock.patch(
+            f"{backend}.close", calls.close
+        ), mock.patch(f"{backend}.send_messages", calls.send_messages):
+            assert send_queued_emails() == 2
+
+        # one connection for the batch, one more after the failure
+        assert [name for name, _, _ in calls.mock_calls] == [
+            "open",
+            "send_messages",
+            "close",
+            "open",
+            "send_messages",
+            "send_messages",
+            "close",
+        ]
+
     def test_list_users(self):
 
         user1 = mixer.blend(NormalUser, user__mode="seller")
         user2 = mixer.blend(NormalUser, user__mode="seller")
 
-        url = reverse("list_users")
+        url = reverse("list_users", kwargs={"mode": "seller"})
 
         response = self.client.get(url)
         assert response.status_code == 200
-        assert len(response.json()) == 3
+        assert len(response.json()["results"]) == 3
 
     def test_retrieve_user(self):
         user1 = mixer.blend(NormalUser)
@@ -199,10 +278,8 @@ class TestCoreAPIViews(TestCase):
     def test_confirm_email_success(self):
         user = mixer.blend(User)
         user.is_active = False
-        user.confirmation_code = 123456
-        user.confirmation_tries = 1
-        user.next_confirm_try = timezone.now() + timedelta(hours=1)
         user.save()
+        cache.set(confirmation_code.get_key(user.id), "123456")
         url = reverse("confirm_email")
         response = self.client.post(
             url, data={"email": user.email, "confirmation_code": 123456}
@@ -212,7 +289,7 @@ class TestCoreAPIViews(TestCase):
 
         assert response.status_code == 200
         assert confirmed_user.is_active == True
-        assert confirmed_user.confirmation_code is None
+        assert confirmation_code.get(user.id) is None
 
     def test_confirm_email_errors_class(self):
         url = reverse("confirm_email")
@@ -243,10 +320,10 @@ class TestCoreAPIViews(TestCase):
         )
 
         user.is_active = False
-        user.confirmation_code = 123456
-        user.confirmation_tries = 0
-        user.next_confirm_try = timezone.now() + timedelta(hours=1)
         user.save()
+        cache.set(confirmation_code.get_key(user.id), "123456")
+        for _ in range(3):
+            confirmation_code.attempts.hit(user.id)
 
         response2 = self.client.post(
             url, data={"email": user.email, "confirmation_code": 123456}
@@ -272,8 +349,7 @@ class TestCoreAPIViews(TestCase):
 
     def test_forget_password_reset_success(self):
         url = reverse("forget_password_reset")
-        self.global_user.user.forget_password_code = 123456
-        self.global_user.user.save()
+        cache.set(forget_password_code.get_key(self.global_user.user.id), "123456")
 
         response = self.client.post(
             url,
@@ -291,8 +367,7 @@ class TestCoreAPIViews(TestCase):
 
     def test_forget_password_reset_wrong_code(self):
         url = reverse("forget_password_reset")
-        self.global_user.user.forget_password_code = 123456
-        self.global_user.user.save()
+        cache.set(forget_password_code.get_key(self.global_user.user.id), "123456")
 
         response = self.client.post(
             url,
@@ -354,3 +429,461 @@ class TestCoreAPIViews(TestCase):
         balance = Balance.objects.get(pk=user.id)
         assert response.status_code == 200
         assert balance.total_balance == 100
+
+    def rate_order(self, seller, rating):
+        service = HomeService.objects.filter(seller=seller).first()
+        order = mixer.blend(
+            OrderService,
+            client=self.global_user,
+            home_service=service,
+            status="Underway",
+            is_rateable=True,
+        )
+        response = self.client.post(
+            reverse("make_rating", kwargs={"order_id": order.id}),
+            {
+                "quality_of_service": rating,
+                "commitment_to_deadline": rating,
+                "work_ethics": rating,
+                "client_comment": "comment",
+            },
+        )
+        assert response.status_code == 200
+
+    def test_seller_stats_follow_services_and_ratings(self):
+        seller = mixer.blend(NormalUser)
+        services = mixer.cycle(3).blend(HomeService, seller=seller, average_ratings=0)
+        services[2].delete()
+        self.rate_order(seller, 4)
+        self.rate_order(seller, 2)
+
+        url = reverse("retrieve_user", kwargs={"username": seller.user.username})
+        response = self.client.get(url)
+        assert response.json()["services_number"] == 2
+        assert response.json()["clients_number"] == 2
+        assert response.json()["average_rating"] == 3
+
+        incremental = SellerStats.objects.get(user=seller)
+        rebuild_seller_stats()
+        rebuilt = SellerStats.objects.get(user=seller)
+        for field in ("served_clients", "services_count", "rating_count"):
+            assert getattr(rebuilt, field) == getattr(incremental, field)
+        assert rebuilt.rating_sum == incremental.rating_sum
+
+    def test_list_users_directory(self):
+        url = reverse("list_users", kwargs={"mode": "seller"})
+        client = APIClient()
+        category = mixer.blend(Category)
+        sellers = mixer.cycle(4).blend(NormalUser, user__mode="seller")
+        for seller in sellers:
+            mixer.cycle(2).blend(
+                HomeService, seller=seller, category=category, average_ratings=3
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, {"page_size": 2})
+        first_page = response.json()
+        assert len(first_page["results"]) == 2
+        assert len(queries) == 2
+
+        response = client.get(url, {"page_size": 10, "cursor": first_page["next"]})
+        last_user = response.json()["results"][-1]
+        assert last_user["username"] == sellers[-1].user.username
+        assert last_user["average_rating"] == 3
+        assert [c["id"] for c in last_user["categories"]] == [category.id]
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = client.get(url, {"page_size": 2})
+        assert cached.json() == first_page
+        assert len(queries) == 0
+
+        HomeService.objects.filter(seller=sellers[-1]).update(average_ratings=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            HomeService.objects.filter(seller=sellers[-1]).first().save()
+        response = client.get(url, {"page_size": 10, "cursor": first_page["next"]})
+        assert response.json()["results"][-1]["average_rating"] == 5
+
+    def test_list_users_directory_invalidation(self):
+        url = reverse("list_users", kwargs={"mode": "seller"})
+        client = APIClient()
+        seller = mixer.blend(NormalUser, user__mode="seller").user
+        first_page = client.get(url).json()
+
+        # a login or an email confirmation keep the cached directory
+        user = User.objects.get(id=seller.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.last_login = timezone.now()
+            user.save(update_fields=["last_login"])
+            user.is_active = True
+            user.save()
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(url).json() == first_page
+        assert len(queries) == 0
+
+        user.first_name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        assert client.get(url).json()["results"][-1]["first_name"] == "Renamed"
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
+        usernames = [item["username"] for item in client.get(url).json()["results"]]
+        assert seller.username not in usernames
+
+
+class TestBalanceLedger(TransactionTestCase):
+    def test_parallel_transfers_lose_no_updates(self):
+        payer, payee = mixer.cycle(2).blend(NormalUser)
+        for user in (payer, payee):
+            Balance.objects.create(user=user)
+        credit(payer.id, 1000, "charge")
+
+        def pay(_):
+            try:
+                transfer(payer.id, payee.id, 7)
+            except InsufficientBalance:
+                return 0
+            finally:
+                connection.close()
+            return 7
+
+        # more is asked for than the payer has, some transfers must be refused
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            paid = sum(executor.map(pay, range(200)))
+
+        payer.balance.refresh_from_db()
+        payee.balance.refresh_from_db()
+        assert paid == 1000 // 7 * 7
+        assert payee.balance.total_balance == paid
+        assert payer.balance.total_balance == 1000 - paid
+        assert not get_unbalanced_accounts().exists()
+
+    def test_credit_without_balance_writes_no_entry(self):
+        payer, payee = mixer.cycle(2).blend(NormalUser)
+        Balance.objects.create(user=payer, total_balance=100)
+        with pytest.raises(MissingBalance):
+            credit(payee.id, 10, "charge")
+        with pytest.raises(MissingBalance):
+            transfer(payer.id, payee.id, 10)
+
+        payer.balance.refresh_from_db()
+        assert payer.balance.total_balance == 100
+        assert not BalanceEntry.objects.filter(user__in=[payer, payee]).exists()
+
+
+class TestCachedTokenAuthentication(TestCase):
+    def setUp(self):
+        self.user = mixer.blend(NormalUser)
+        self.client = APIClient()
+
+    def login(self):
+        _, token = AuthToken.objects.create(self.user.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="token " + token)
+        return client
+
+    def get_balance(self, client):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse("my_balance"))
+        return response.status_code, [query["sql"] for query in queries]
+
+    def test_cached_token_skips_token_table(self):
+        Balance.objects.create(user=self.user)
+        client = self.login()
+        status_code, first = self.get_balance(client)
+        assert status_code == 200
+        assert any("knox_authtoken" in sql for sql in first)
+
+        # neither the in-process nor the shared copy needs the token table
+        for clear in (lambda: None, local_token_cache.clear):
+            clear()
+            status_code, cached = self.get_balance(client)
+            assert status_code == 200
+            assert not any("knox_authtoken" in sql for sql in cached)
+            assert len(cached) < len(first)
+
+    def test_logout_invalidates_cached_token(self):
+        Balance.objects.create(user=self.user)
+        client = self.login()
+        assert self.get_balance(client)[0] == 200
+        assert client.post(reverse("logout")).status_code == 204
+        assert self.get_balance(client)[0] == 401
+
+    def test_logout_all_invalidates_every_cached_token(self):
+        Balance.objects.create(user=self.user)
+        clients = [self.login(), self.login()]
+        for client in clients:
+            assert self.get_balance(client)[0] == 200
+        assert clients[0].post(reverse("logout_all")).status_code == 204
+        for client in clients:
+            assert self.get_balance(client)[0] == 401
+
+
+class TestLoginPipeline(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.password = "q111w222"
+        self.user = mixer.blend(NormalUser, user__mode="seller")
+        self.user.user.set_password(self.password)
+        self.user.user.save()
+        Balance.objects.create(user=self.user)
+
+    def login(self, **data):
+        data.setdefault("password", self.password)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("login_api"), data=data)
+        return response, len(queries)
+
+    def test_login_fetches_the_user_once(self):
+        response, first = self.login(username=self.user.user.username)
+        assert response.status_code == 200
+        # user with area, profile and stats + token insert
+        assert first <= 3
+
+        # the profile snapshot is cached, only the user rows and the token remain
+        response, cached = self.login(email=self.user.user.email)
+        assert response.status_code == 200
+        assert cached <= 2
+        assert response.json()["user_info"]["username"] == self.user.user.username
+
+    def test_snapshot_refreshed_on_profile_and_stat_changes(self):
+        self.login(username=self.user.user.username)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.bio = "new bio"
+            self.user.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user.first_name = "new name"
+            self.user.user.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            SellerStats.objects.filter(user=self.user).update(services_count=3)
+            rebuild_seller_stats()
+
+        user_info = self.login(username=self.user.user.username)[0].json()["user_info"]
+        assert user_info["bio"] == "new bio"
+        assert user_info["first_name"] == "new name"
+        assert user_info["services_number"] == 0
+
+    def test_login_goes_through_the_auth_backends(self):
+        failed = mock.Mock()
+        user_login_failed.connect(failed)
+        try:
+            response, _ = self.login(username=self.user.user.username, password="wrong")
+        finally:
+            user_login_failed.disconnect(failed)
+        assert response.status_code == 400
+        assert failed.call_count == 1
+
+        with mock.patch(
+            "django.contrib.auth.backends.ModelBackend.user_can_authenticate",
+            return_value=False,
+        ):
+            response, _ = self.login(username=self.user.user.username)
+        assert response.status_code == 400
+
+    def test_login_errors_are_preserved(self):
+        response, _ = self.login(username=self.user.user.username, password="wrong")
+        assert response.status_code == 400
+        assert response.json()["detail"] == {
+            "non_field_errors": ["Unable to log in with provided credentials."]
+        }
+
+        response, _ = self.login(username=self.user.user.username, password="")
+        assert response.status_code == 400
+        assert "password" in response.json()["detail"]
+
+        response, _ = self.login(email="nobody@example.com")
+        assert response.json() == {"email": ["Email does not exist"]}
+
+        response, _ = self.login(username="nobody")
+        assert response.json() == {"username": ["Username does not exist"]}
+
+        response, _ = self.login()
+        assert response.status_code == 400
+        assert "username" in response.json()["detail"]
+
+
+class TestVerificationCodes(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = mixer.blend(User, is_active=False)
+        self.code = confirmation_code.issue(self.user.id)
+
+    def confirm(self, code):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("confirm_email"),
+                data={"email": self.user.email, "confirmation_code": code},
+            )
+        writes = [
+            query["sql"] for query in queries if not query["sql"].startswith("SELECT")
+        ]
+        return response, writes
+
+    def wrong_code(self):
+        return "000000" if self.code != "000000" else "111111"
+
+    def test_wrong_codes_cost_no_writes_and_lock(self):
+        for _ in range(2):
+            response, writes = self.confirm(self.wrong_code())
+            assert response.json() == {"detail": "Wrong code please try again"}
+            assert writes == []
+
+        response, writes = self.confirm(self.wrong_code())
+        assert response.json()["detail"].startswith("Try again after")
+        assert writes == []
+
+        # even the right code is refused while locked
+        response, _ = self.confirm(self.code)
+        assert response.status_code == 400
+        assert response.json()["detail"].startswith("Try again after")
+
+        confirmation_code.attempts.reset(self.user.id)
+        response, writes = self.confirm(self.code)
+        assert response.status_code == 200
+        assert len(writes) == 1
+        self.user.refresh_from_db()
+        assert self.user.is_active
+
+    def test_resend_quota(self):
+        url = reverse("resend_email_code")
+        for _ in range(3):
+            response = self.client.post(url, data={"email": self.user.email})
+            assert response.status_code == 200
+        response = self.client.post(url, data={"email": self.user.email})
+        assert response.status_code == 400
+        assert response.json()["detail"].startswith("Can't send")
+        self.user.refresh_from_db()
+        assert not self.user.is_active
+
+    def test_forget_password_code_lockout(self):
+        code = forget_password_code.issue(self.user.id)
+        wrong = "000000" if code != "000000" else "111111"
+        url = reverse("check_forget_password_code")
+        for _ in range(3):
+            response = self.client.post(
+                url, data={"email": self.user.email, "forget_password_code": wrong}
+            )
+            assert response.status_code == 400
+        response = self.client.post(
+            url, data={"email": self.user.email, "forget_password_code": code}
+        )
+        assert response.json()["forget_password_code"][0].startswith("Try again after")
+
+
+class TestServeCommand(TestCase):
+    def get_options(self, **options):
+        defaults = {
+            "bind": "127.0.0.1:8000",
+            "interface": "asgi",
+            "workers": None,
+            "threads": None,
+            "max_requests": 1000,
+            "timeout": 30,
+            "preload": True,
+        }
+        return get_server_options({**defaults, **options})
+
+    def test_workers_follow_cpu_count(self):
+        with mock.patch("core.management.commands.serve.get_cpu_count", return_value=4):
+            asgi = self.get_options()
+            wsgi = self.get_options(interface="wsgi")
+            with mock.patch.dict("os.environ", {"WEB_CONCURRENCY": "3"}):
+                assert self.get_options()["workers"] == 3
+        assert asgi["workers"] == 5
+        assert asgi["worker_class"] == "uvicorn.workers.UvicornWorker"
+        assert wsgi["workers"] == 9
+        assert wsgi["worker_class"] == "gthread"
+        assert wsgi["threads"] == 4
+        assert asgi["preload_app"]
+        assert 0 < asgi["max_requests_jitter"] < asgi["max_requests"]
+        assert self.get_options(workers=2)["workers"] == 2
+
+
+class TestSQLiteTuning(TransactionTestCase):
+    def test_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            assert cursor.fetchone()[0] == "wal"
+            cursor.execute("PRAGMA busy_timeout")
+            assert cursor.fetchone()[0] == 20000
+
+    def test_tracked_databases_keep_their_journal_mode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            name = os.path.join(directory, "tracked.sqlite3")
+            tracked = type(connections["default"])(
+                {**connection.settings_dict, "NAME": name}
+            )
+            with override_settings(SQLITE_KEEP_JOURNAL_MODE=[name]):
+                with tracked.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    assert cursor.fetchone()[0] == "delete"
+                    cursor.execute("PRAGMA busy_timeout")
+                    assert cursor.fetchone()[0] == 20000
+            tracked.close()
+
+    def test_atomic_blocks_take_the_write_lock_at_begin(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                Area.objects.create(name="area")
+        assert queries[0]["sql"] == "BEGIN IMMEDIATE"
+
+
+class TestServerTiming(TestCase):
+    def setUp(self):
+        self.user = mixer.blend(NormalUser, user__mode="client")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user.user)
+
+    def get_timings(self, response):
+        return {
+            metric.split(";")[0]: metric
+            for metric in response.headers["Server-Timing"].split(", ")
+        }
+
+    def test_timing_and_query_count_headers(self):
+        mixer.cycle(3).blend(OrderService, client=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("my_orders"))
+        assert response.status_code == 200
+        assert int(response.headers["X-Query-Count"]) == len(queries)
+        timings = self.get_timings(response)
+        assert set(timings) == {"db", "view", "serialize", "total"}
+        assert f'desc="{len(queries)} queries"' in timings["db"]
+
+    async def test_async_views_are_timed(self):
+        response = await self.async_client.get(reverse("categories"))
+        assert response.status_code == 200
+        assert response.headers["X-Query-Count"] == "1"
+        assert "serialize;dur=" in response.headers["Server-Timing"]
+
+    @override_settings(SERVER_TIMING_HEADERS=False)
+    def test_headers_are_off_outside_debug(self):
+        response = self.client.get(reverse("my_orders"))
+        assert response.status_code == 200
+        assert "Server-Timing" not in response.headers
+        assert "X-Query-Count" not in response.headers
+
+    def test_requests_over_budget_are_logged(self):
+        with self.assertNoLogs("core.timing"):
+            self.client.get(reverse("my_orders"))
+
+        with mock.patch.object(MyOrders, "query_budget", 0):
+            with self.assertLogs("core.timing", "WARNING") as logs:
+                response = self.client.get(reverse("my_orders"))
+        line = json.loads(logs.records[0].getMessage())
+        assert line["event"] == "request_over_budget"
+        assert line["over"] == ["queries"]
+        assert line["view"] == "MyOrders"
+        assert line["route"] == "services/my_orders"
+        assert line["queries"] == int(response.headers["X-Query-Count"])
+        assert line["query_budget"] == 0
+
+    def test_default_budgets_follow_the_settings(self):
+        url = reverse("retrieve_user", kwargs={"username": self.user.user.username})
+        with override_settings(REQUEST_QUERY_BUDGET=0, SERVER_TIMING_HEADERS=False):
+            with self.assertLogs("core.timing", "WARNING") as logs:
+                self.client.get(url)
+        line = json.loads(logs.records[0].getMessage())
+        assert line["over"] == ["queries"]
+        assert line["query_budget"] == 0
@@ -0,0 +1,207 @@
+import json
+import logging
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# a context variable and not a thread local, sync_to_async copies it into the
+# thread the ORM runs in when an async view queries the database
+current_metrics = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start = None
+        self.view_end = None
+        self.end = None
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+
+    def finish(self):
+        self.end = time.perf_counter()
+        if self.view_start is None:
+            # answered by a middleware before any view ran
+            self.view_start = self.view_end = self.end
+        elif self.view_end is None:
+            # a plain HttpResponse, nothing left to render
+            self.view_end = self.end
+
+    def as_dict(self):
+        return {
+            "total_ms": round((self.end - self.start) * 1000, 2),
+            "view_ms": round((self.view_end - self.view_start) * 1000, 2),
+            "db_ms": round(self.db * 1000, 2),
+            "serialize_ms": round(self.serialize * 1000, 2),
+            "queries": self.queries,
+        }
+
+    def server_timing(self):
+        metrics = self.as_dict()
+        return ", ".join(
+            [
+                f'db;dur={metrics["db_ms"]};desc="{self.queries} queries"',
+                f'view;dur={metrics["view_ms"]}',
+                f'serialize;dur={metrics["serialize_ms"]}',
+                f'total;dur={metrics["total_ms"]}',
+            ]
+        )
+
+
+def time_query(execute, sql, params, many, context):
+    # installed on every connection (core.signals), only counts inside a request
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db += time.perf_counter() - start
+
+
+def time_render(response, metrics: RequestMetrics):
+    render = response.render
+
+    def timed_render():
+        start = time.perf_counter()
+        try:
+            return render()
+        finally:
+            metrics.serialize += time.perf_counter() - start
+            del response.render
+
+    response.render = timed_render
+
+
+def start_view():
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.view_start = time.perf_counter()
+
+
+def end_view(response):
+    # DRF responses are rendered after the view returned
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.view_end = time.perf_counter()
+        time_render(response, metrics)
+    return response
+
+
+def get_view_class(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None
+    return getattr(match.func, "view_class", None)
+
+
+def get_budgets(view_class):
+    # the views that don't set latency_budget_ms / query_budget get the defaults
+    # from the settings, None is no budget
+    default_latency = getattr(settings, "REQUEST_LATENCY_BUDGET_MS", None)
+    default_queries = getattr(settings, "REQUEST_QUERY_BUDGET", None)
+    return (
+        getattr(view_class, "latency_budget_ms", default_latency),
+        getattr(view_class, "query_budget", default_queries),
+    )
+
+
+def check_budgets(request, response, metrics: RequestMetrics):
+    view_class = get_view_class(request)
+    latency_budget_ms, query_budget = get_budgets(view_class)
+    measured = metrics.as_dict()
+    over = []
+    if latency_budget_ms is not None and measured["total_ms"] > latency_budget_ms:
+        over.append("latency")
+    if query_budget is not None and metrics.queries > query_budget:
+        over.append("queries")
+    if not over:
+        return
+    match = getattr(request, "resolver_match", None)
+    logger.warning(
+        json.dumps(
+            {
+                "event": "request_over_budget",
+                "over": over,
+                "method": request.method,
+                "path": request.path,
+                "route": match.route if match else None,
+                "view": view_class.__name__ if view_class else None,
+                "status": response.status_code,
+                **measured,
+                "latency_budget_ms": latency_budget_ms,
+                "query_budget": query_budget,
+            }
+        )
+    )
+
+
+class ServerTimingMiddleware:
+    """
+    When SERVER_TIMING_HEADERS is set, adds a Server-Timing header with the time
+    spent in the database (and the number of queries), in the view, rendering
+    the response and in total, and an X-Query-Count header. Requests over the
+    budgets of their view (`latency_budget_ms` and `query_budget` class
+    attributes) are logged as a JSON line either way.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Django would run sync hooks in a thread for every ASGI request
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        start_view()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        start_view()
+
+    def process_template_response(self, request, response):
+        return end_view(response)
+
+    async def aprocess_template_response(self, request, response):
+        return end_view(response)
+
+    def finish(self, request, response, metrics: RequestMetrics):
+        # queries run while a streaming response is consumed come after this
+        metrics.finish()
+        # the headers tell any client how the server spends its time, off in
+        # production
+        if getattr(settings, "SERVER_TIMING_HEADERS", False):
+            response["Server-Timing"] = metrics.server_timing()
+            response["X-Query-Count"] = str(metrics.queries)
+        check_budgets(request, response, metrics)
+        return response
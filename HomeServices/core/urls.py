@@ -1,7 +1,6 @@
 from django.urls import path
 from . import views
 
-
 urlpatterns = [
     path(
         "login/",
@@ -28,6 +27,11 @@ urlpatterns = [
         views.CustomLogoutView.as_view(),
         name="logout",
     ),
+    path(
+        "logoutall/",
+        views.CustomLogoutAllView.as_view(),
+        name="logout_all",
+    ),
     path(
         "password_reset/",
         views.PasswordResetAPIView.as_view(),
@@ -26,35 +26,90 @@ from .spectacular_serializers import (
     CheckForgetPasswordSpectacular,
 )
 from .models import NormalUser, User
+from .stats import get_seller_stats
+from .profile import (
+    get_cached_user_info,
+    cache_user_info,
+    aget_cached_user_info,
+    acache_user_info,
+)
+from .async_api import AsyncAPIView
+from .balance import credit, transfer, InsufficientBalance, MissingBalance
+from .auth import CachedTokenAuthentication
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_login_failed
 from django.contrib.auth.hashers import make_password
-from django.utils import timezone
-from datetime import timedelta
-from django.core.mail import send_mail
+from .outbox import queue_email
+from .codes import confirmation_code, forget_password_code, send_code_attempts
 from django.conf import settings
-import random
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+from django.core.validators import validate_email
+from django.core.exceptions import ValidationError
 from knox.views import LogoutView as KnoxLogoutView
+from knox.views import LogoutAllView as KnoxLogoutAllView
+from django.core.cache import cache
+from django.db.models import Avg, F
+from django.db.models.functions import Coalesce
+from collections import defaultdict
+from services.models import Category
+from services.cache import get_reference_data_version
+from services.pagination import UsersPagination
+
+LOGIN_QUERYSET = User.objects.select_related(
+    "area", "normal_user__stats", "normal_user__balance"
+)
+
+USERS_DIRECTORY_CACHE_TIMEOUT = getattr(
+    settings, "USERS_DIRECTORY_CACHE_TIMEOUT", 60 * 10
+)
 
 
 @extend_schema(exclude=True)
 class CustomLogoutView(KnoxLogoutView):
-    pass
+    authentication_classes = (CachedTokenAuthentication,)
+
+
+@extend_schema(exclude=True)
+class CustomLogoutAllView(KnoxLogoutAllView):
+    authentication_classes = (CachedTokenAuthentication,)
 
 
 def get_user_info(user: User, host: str):
+    user_info = get_cached_user_info(user.normal_user.id)
+    if user_info is None:
+        user_info = build_user_info(user)
+        cache_user_info(user.normal_user.id, user_info)
+    return add_photo_host(user_info, host)
+
+
+async def aget_user_info(user: User, host: str):
+    # `user` comes with normal_user, its stats and area already selected
+    user_info = await aget_cached_user_info(user.normal_user.id)
+    if user_info is None:
+        user_info = build_user_info(user)
+        await acache_user_info(user.normal_user.id, user_info)
+    return add_photo_host(user_info, host)
+
+
+def add_photo_host(user_info: dict, host: str):
+    if user_info["photo"] is None:
+        return user_info
+    # the snapshot keeps the relative url, the host depends on the request
+    return {**user_info, "photo": host + user_info["photo"]}
+
+
+def build_user_info(user: User):
     if not user.photo:
         photo = None
     else:
-        photo = host + user.photo.url
+        photo = user.photo.url
     if user.normal_user.average_fast_answer:
         average_fast_answer = user.normal_user.average_fast_answer
     else:
         average_fast_answer = None
 
-    clients_number = 0
-    for service in user.normal_user.home_services_seller.all():
-        clients_number += service.number_of_served_clients
+    stats = get_seller_stats(user.normal_user)
 
     # Decided to send the average_fast_answer as a Duration object to handle it in the frontend.
 
@@ -67,16 +122,6 @@ def get_user_info(user: User, host: str):
     #     days_string = f"{delta.days} days , " if delta.days else ""
     #     average_fast_answer = f"{days_string}{time_string}"
 
-    average_rating = 0
-    number_of_rated_services = 0
-    if user.normal_user.home_services_seller.count() > 0:
-        for service in user.normal_user.home_services_seller.all():
-            if service.average_ratings != 0:
-                average_rating += service.average_ratings
-                number_of_rated_services += 1
-        if number_of_rated_services > 0:
-            average_rating /= number_of_rated_services
-
     return {
         "id": user.id,
         "username": user.username,
@@ -89,66 +134,88 @@ def get_user_info(user: User, host: str):
         "date_joined": user.date_joined,
         "gender": user.gender,
         "bio": user.normal_user.bio,
-        "clients_number": clients_number,
-        "services_number": user.normal_user.home_services_seller.count(),
+        "clients_number": stats.served_clients,
+        "services_number": stats.services_count,
         "average_fast_answer": average_fast_answer,
-        "average_rating": average_rating,
+        "average_rating": stats.average_rating,
         "area_id": user.area.id,
         "area_name": user.area.name,
     }
 
 
-@extend_schema(
-    request=AuthTokenSerializer, responses={200: LoginSpectacular, 400: None}
-)
-@api_view(["POST"])
-def login_api(request: Request):
+def authenticate_login(request: Request):
+    """
+    Returns (user, None) or (None, error response). The user is fetched once
+    together with everything the login responses need and the password and
+    ModelBackend's user_can_authenticate are checked on that row, so there is
+    no second lookup of the user.
+    """
     data = dict()
     data["username"] = request.data.get("username", "")
     data["password"] = request.data.get("password", "")
     if "username" not in request.data and "email" in request.data:
-        from django.core.validators import validate_email
-        from django.core.exceptions import ValidationError
-
         try:
             validate_email(request.data["email"])
         except ValidationError:
-            return Response(
+            return None, Response(
                 {"email": ["Please input a valid email"]},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        try:
-            username = User.objects.get(email=request.data["email"])
-        except User.DoesNotExist:
-            return Response(
-                {"email": ["Email does not exist"]}, status=status.HTTP_400_BAD_REQUEST
-            )
-        data["username"] = username.username
-        if not username.is_active:
-            return Response(
-                {"email": ["Email must be confirmed"]},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        lookup = {"email": request.data["email"]}
+        missing = {"email": ["Email does not exist"]}
     elif "username" in request.data:
+        lookup = {"username": request.data["username"]}
+        missing = {"username": ["Username does not exist"]}
+    else:
+        lookup = None
+
+    if lookup is not None:
         try:
-            current_user = User.objects.get(username=request.data["username"])
+            user = LOGIN_QUERYSET.get(**lookup)
         except User.DoesNotExist:
-            return Response(
-                {"username": ["Username does not exist"]},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        if not current_user.is_active:
-            return Response(
+            return None, Response(missing, status=status.HTTP_400_BAD_REQUEST)
+        data["username"] = user.username
+        if not user.is_active:
+            return None, Response(
                 {"email": ["Email must be confirmed"]},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-    serializer = AuthTokenSerializer(data=data)
-    if not serializer.is_valid():
-        return Response(
+
+    if lookup is None or not data["username"] or not data["password"]:
+        # let the serializer build the usual "This field may not be blank." errors
+        serializer = AuthTokenSerializer(data=data)
+        serializer.is_valid()
+        return None, Response(
             {"detail": serializer.errors, "data": data},
             status=status.HTTP_400_BAD_REQUEST,
         )
-    user = serializer.validated_data["user"]
+    # what authenticate() would do with ModelBackend, without fetching the user
+    # again
+    authenticated = user.check_password(data["password"])
+    if not authenticated or not ModelBackend().user_can_authenticate(user):
+        user_login_failed.send(
+            sender=__name__, credentials={"username": data["username"]}, request=request
+        )
+        return None, Response(
+            {
+                "detail": {
+                    "non_field_errors": ["Unable to log in with provided credentials."]
+                },
+                "data": data,
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return user, None
+
+
+@extend_schema(
+    request=AuthTokenSerializer, responses={200: LoginSpectacular, 400: None}
+)
+@api_view(["POST"])
+def login_api(request: Request):
+    user, error = authenticate_login(request)
+    if error is not None:
+        return error
     _, token = AuthToken.objects.create(user)
     host = "http://" + request.get_host()
     return Response({"user_info": get_user_info(user, host), "token": {token}})
@@ -176,53 +243,81 @@ class RegisterUser(APIView):
 
 class ListUsers(APIView):
     @extend_schema(responses={200: ListUsersSerializer(many=True)})
-    def get(self, request: Request, mode:str):
-        queryset = NormalUser.objects.filter(user__mode=mode)
-        data = []
-        for user in queryset:
-            result = dict()
-            result["username"] = user.user.username
-            result["first_name"] = user.user.first_name
-            result["last_name"] = user.user.last_name
-            result["photo"] = "http://" + request.get_host() + user.user.photo.url
-            result["average_rating"] = 0
-            for service in user.home_services_seller.all():
-                result["average_rating"] += service.average_ratings
-            if user.home_services_seller.count():
-                result["average_rating"] /= user.home_services_seller.count()
-            result["categories"] = []
-            if user.home_services_seller:
-                for home_service in user.home_services_seller.all():
-                    if home_service.category:
-                        category = dict()
-                        category["id"] = home_service.category.id
-                        category["name"] = home_service.category.name
-                        if home_service.category.photo:
-                            category["photo"] = (
-                                "http://"
-                                + request.get_host()
-                                + home_service.category.photo.url
-                            )
-                        else:
-                            category["photo"] = None
-                        result["categories"].append(category)
-
-            data.append(result)
+    def get(self, request: Request, mode: str):
+        host = "http://" + request.get_host()
+        version = get_reference_data_version("users_directory")
+        cache_key = "users_directory:{}:{}:{}:{}:{}".format(
+            version,
+            host,
+            mode,
+            request.GET.get("cursor", ""),
+            request.GET.get("page_size", ""),
+        )
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data, status=status.HTTP_200_OK)
+
+        queryset = (
+            NormalUser.objects.filter(user__mode=mode)
+            .select_related("user")
+            .annotate(
+                average_rating=Coalesce(
+                    Avg("home_services_seller__average_ratings"), 0.0
+                )
+            )
+        )
+        paginator = UsersPagination()
+        users = paginator.paginate_queryset(queryset, request, view=self)
+
+        # the categories of the whole page in one query
+        user_categories = defaultdict(list)
+        categories = (
+            Category.objects.filter(home_services_categories__seller__in=users)
+            .annotate(seller_id=F("home_services_categories__seller"))
+            .distinct()
+            .order_by("id")
+        )
+        for category in categories:
+            user_categories[category.seller_id].append(
+                {
+                    "id": category.id,
+                    "name": category.name,
+                    "photo": host + category.photo.url if category.photo else None,
+                }
+            )
+
+        results = []
+        for user in users:
+            results.append(
+                {
+                    "username": user.user.username,
+                    "first_name": user.user.first_name,
+                    "last_name": user.user.last_name,
+                    "photo": host + user.user.photo.url,
+                    "average_rating": user.average_rating,
+                    "categories": user_categories[user.id],
+                }
+            )
+
+        data = paginator.get_paginated_response(results).data
+        cache.set(cache_key, data, USERS_DIRECTORY_CACHE_TIMEOUT)
         return Response(data, status=status.HTTP_200_OK)
 
 
-class RetrieveUser(APIView):
+class RetrieveUser(AsyncAPIView):
     @extend_schema(responses={200: LoginSpectacular, 404: None})
-    def get(self, request, username):
+    async def get(self, request, username):
         try:
-            user = User.objects.get(username=username)
+            user = await User.objects.select_related("area", "normal_user__stats").aget(
+                username=username
+            )
         except User.DoesNotExist:
             return Response("Error 404 Not Found", status=status.HTTP_404_NOT_FOUND)
 
         if user.is_superuser:
             return Response("Error 404 Not Found", status=status.HTTP_404_NOT_FOUND)
         host = "http://" + request.get_host()
-        return Response(get_user_info(user, host), status=status.HTTP_200_OK)
+        return Response(await aget_user_info(user, host), status=status.HTTP_200_OK)
 
 
 @extend_schema(exclude=True)
@@ -285,39 +380,25 @@ def confirm_process(request):
             {"detail": "Email already verified"}, status=status.HTTP_400_BAD_REQUEST
         )
 
-    if (
-        request.user.next_confirm_try is None
-        or request.user.next_confirm_try <= timezone.now()
-    ):
-        request.user.confirmation_tries = 3
-        request.user.next_confirm_try = timezone.now() + timedelta(hours=24)
-        request.user.save()
-
-    if request.user.confirmation_tries == 0:
+    user_id = request.user.id
+    attempts = confirmation_code.attempts
+    if attempts.is_blocked(user_id):
         return Response(
-            {
-                "detail": f"Try again after {request.user.next_confirm_try - timezone.now()}"
-            },
+            {"detail": f"Try again after {attempts.retry_after(user_id)}"},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    if request.user.confirmation_code == request.data.get("confirmation_code", None):
+    if confirmation_code.matches(user_id, request.data.get("confirmation_code")):
         request.user.is_active = True
-        request.user.confirmation_code = None
-        request.user.save()
+        request.user.save(update_fields=["is_active"])
+        confirmation_code.discard(user_id)
         return Response(
             {"detail": "Email verified successfully"}, status=status.HTTP_200_OK
         )
     else:
-        request.user.confirmation_tries -= 1
-        request.user.save()
-        if request.user.confirmation_tries == 0:
-            request.user.next_confirm_try = timezone.now() + timedelta(hours=24)
-            request.user.save()
+        if attempts.hit(user_id):
             return Response(
-                {
-                    "detail": f"Try again after{request.user.next_confirm_try - timezone.now()}"
-                },
+                {"detail": f"Try again after{attempts.retry_after(user_id)}"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
         return Response(
@@ -364,36 +445,24 @@ def send_process_verify_email(user):
         return Response(
             {"detail": "Email already verified"}, status=status.HTTP_400_BAD_REQUEST
         )
-    if (
-        user.next_confirmation_code_sent is None
-        or user.next_confirmation_code_sent <= timezone.now()
-    ):
-        user.resend_tries = 3
-        user.next_confirmation_code_sent = timezone.now() + timedelta(hours=24)
-        user.save()
-
-    if user.resend_tries == 0:
+    if send_code_attempts.is_blocked(user.id):
         return Response(
             {
-                "detail": f"Can't send , try again after {user.next_confirmation_code_sent - timezone.now()}"
+                "detail": f"Can't send , try again after {send_code_attempts.retry_after(user.id)}"
             },
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    user.resend_tries -= 1
-    user.confirmation_code = str(random.randint(100000, 999999))
-    user.next_confirmation_code_sent = timezone.now() + timedelta(hours=24)
-    user.save()
+    send_code_attempts.hit(user.id)
+    code = confirmation_code.issue(user.id)
 
     subject = "Confirm your email"
-    html_message = render_to_string(
-        "core/email_confirmation.html", {"code": user.confirmation_code}
-    )
+    html_message = render_to_string("core/email_confirmation.html", {"code": code})
     plain_message = strip_tags(html_message)
     from_email = settings.EMAIL_HOST_USER
     to = user.email
 
-    send_mail(subject, plain_message, from_email, [to], html_message=html_message)
+    queue_email(subject, plain_message, [to], html_message, from_email)
 
     return Response(
         {"detail": "Code sent successfully , Please check your email inbox"},
@@ -470,33 +539,23 @@ class SendForgetPasswordCode(APIView):
 
 def send_process_forget_password(user):
 
-    if (
-        user.next_confirmation_code_sent is None
-        or user.next_confirmation_code_sent <= timezone.now()
-    ):
-        user.resend_tries = 3
-        user.next_confirmation_code_sent = timezone.now() + timedelta(hours=24)
-        user.save()
-
-    if user.resend_tries == 0:
+    if send_code_attempts.is_blocked(user.id):
         return Response(
             {
-                "detail": f"Can't send , try again after {user.next_confirmation_code_sent - timezone.now()}"
+                "detail": f"Can't send , try again after {send_code_attempts.retry_after(user.id)}"
             },
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    user.resend_tries -= 1
-    user.forget_password_code = str(random.randint(100000, 999999))
-    user.next_confirmation_code_sent = timezone.now() + timedelta(hours=24)
-    user.save()
+    send_code_attempts.hit(user.id)
+    code = forget_password_code.issue(user.id)
     subject = "Reset your password"
-    message = f"Please use the following 6-digit code to reset your password: {user.forget_password_code}"
+    message = f"Please use the following 6-digit code to reset your password: {code}"
     email_from = settings.EMAIL_HOST_USER
     recipient_list = [
         user.email,
     ]
-    send_mail(subject, message, email_from, recipient_list)
+    queue_email(subject, message, recipient_list, from_email=email_from)
     return Response(
         {"detail": "Code sent successfully , Please check your email inbox"},
         status=status.HTTP_200_OK,
@@ -534,8 +593,8 @@ class ForgetPasswordReset(APIView):
         serializer = self.serializer_class(data=request.data, context={"user": user})
         serializer.is_valid(raise_exception=True)
         user.password = make_password(serializer.validated_data["new_password"])
-        user.forget_password_code = None
-        user.save()
+        user.save(update_fields=["password"])
+        forget_password_code.discard(user.id)
         return Response(
             {"message": "Password updated successfully."}, status=status.HTTP_200_OK
         )
@@ -580,52 +639,9 @@ class CheckForgetPasswordCode(APIView):
 )
 @api_view(["POST"])
 def login_provider(request):
-    data = dict()
-    data["username"] = request.data.get("username", "")
-    data["password"] = request.data.get("password", "")
-    if "username" not in request.data and "email" in request.data:
-        from django.core.validators import validate_email
-        from django.core.exceptions import ValidationError
-
-        try:
-            validate_email(request.data["email"])
-        except ValidationError:
-            return Response(
-                {"email": ["Please input a valid email"]},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        try:
-            username = User.objects.get(email=request.data["email"])
-        except User.DoesNotExist:
-            return Response(
-                {"email": ["Email does not exist"]}, status=status.HTTP_400_BAD_REQUEST
-            )
-        data["username"] = username.username
-        if not username.is_active:
-            return Response(
-                {"email": ["Email must be confirmed"]},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-    elif "username" in request.data:
-        try:
-            current_user = User.objects.get(username=request.data["username"])
-        except User.DoesNotExist:
-            return Response(
-                {"username": ["Username does not exist"]},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        if not current_user.is_active:
-            return Response(
-                {"email": ["Email must be confirmed"]},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-    serializer = AuthTokenSerializer(data=data)
-    if not serializer.is_valid():
-        return Response(
-            {"detail": serializer.errors, "data": data},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-    user = serializer.validated_data["user"]
+    user, error = authenticate_login(request)
+    if error is not None:
+        return error
     if not user.is_provider:
         return Response(
             {"detail": "Your account does not support this feature"},
@@ -658,21 +674,21 @@ class ChargeBalance(APIView):
             return Response(
                 {"detail": "User dose not exist"}, status=status.HTTP_404_NOT_FOUND
             )
-        if not request.user.is_staff:
-            if (
-                request.user.normal_user.balance.total_balance
-                < serializer.validated_data["charged_balance"]
-            ):
-                return Response(
-                    {"detail": "You don't have enough balance"},
-                    status=status.HTTP_400_BAD_REQUEST,
+        charged_balance = serializer.validated_data["charged_balance"]
+        try:
+            if request.user.is_staff:
+                credit(user.normal_user.id, charged_balance, "charge")
+            else:
+                transfer(
+                    request.user.normal_user.id, user.normal_user.id, charged_balance
                 )
-            request.user.normal_user.balance.total_balance -= serializer.validated_data[
-                "charged_balance"
-            ]
-            request.user.normal_user.balance.save()
-        user.normal_user.balance.total_balance += serializer.validated_data[
-            "charged_balance"
-        ]
-        user.normal_user.balance.save()
+        except InsufficientBalance:
+            return Response(
+                {"detail": "You don't have enough balance"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except MissingBalance:
+            return Response(
+                {"detail": "User has no balance"}, status=status.HTTP_404_NOT_FOUND
+            )
         return Response("Success")
@@ -7,6 +7,8 @@ class ServicesConfig(AppConfig):
     verbose_name = "الخدمات"
 
     def ready(self):
+        from . import signals  # noqa: F401
+
         # Connect signal after migrations
         post_migrate.connect(self.init_syrian_governorates, sender=self)
         post_migrate.connect(self.init_service_categories, sender=self)
@@ -0,0 +1,70 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+REFERENCE_DATA_TIMEOUT = getattr(settings, "REFERENCE_DATA_CACHE_TIMEOUT", 60 * 60 * 24)
+REFERENCE_DATA_MAX_AGE = getattr(settings, "REFERENCE_DATA_MAX_AGE", 60)
+
+
+def get_reference_data_version(name: str):
+    key = f"reference_data:{name}:version"
+    version = cache.get(key)
+    if version is None:
+        # a random version (not a counter) so a version lost with an evicted
+        # cache never matches an ETag a client got before
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_reference_data_version(name: str):
+    # after the commit, or a request reading the old rows meanwhile would cache
+    # them under the new version
+    transaction.on_commit(
+        lambda: cache.set(f"reference_data:{name}:version", uuid4().hex, None)
+    )
+
+
+def get_reference_data_headers(name: str, version: str):
+    return {
+        "ETag": f'"{name}-{version}"',
+        "Cache-Control": f"public, max-age={REFERENCE_DATA_MAX_AGE}",
+    }
+
+
+def is_not_modified(request, headers):
+    return headers["ETag"] in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+
+
+async def aget_reference_data_version(name: str):
+    key = f"reference_data:{name}:version"
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid4().hex, None)
+        version = await cache.aget(key)
+    return version
+
+
+async def areference_data_response(request, name: str, build_data):
+    """
+    Serve rarely changing data (categories, areas ...) from the cache, the cached
+    payload and the ETag are tied to a version that is bumped when an admin
+    edits the data, so clients revalidating with If-None-Match get a 304.
+    `build_data` is a coroutine function.
+    """
+    version = await aget_reference_data_version(name)
+    headers = get_reference_data_headers(name, version)
+    if is_not_modified(request, headers):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    key = f"reference_data:{name}:{version}"
+    data = await cache.aget(key)
+    if data is None:
+        data = list(await build_data())
+        await cache.aset(key, data, REFERENCE_DATA_TIMEOUT)
+    return Response(data, status=status.HTTP_200_OK, headers=headers)
@@ -0,0 +1,28 @@
+from django.core.cache import cache
+from django.db import transaction
+from .models import GeneralServicesPrice
+
+FEE_SCHEDULE_CACHE_KEY = "fee_schedule"
+
+
+def get_fee_schedule():
+    """
+    The fees taken from a seller when accepting an order, cached until an admin
+    edits the prices or beneficiaries:
+    {"total": 150, "fees": [(beneficiary_id, price), ...]}
+    """
+    fee_schedule = cache.get(FEE_SCHEDULE_CACHE_KEY)
+    if fee_schedule is None:
+        fees = list(
+            GeneralServicesPrice.objects.order_by("id").values_list(
+                "beneficiary_id", "price"
+            )
+        )
+        fee_schedule = {"total": sum(price for _, price in fees), "fees": fees}
+        cache.set(FEE_SCHEDULE_CACHE_KEY, fee_schedule, None)
+    return fee_schedule
+
+
+def invalidate_fee_schedule():
+    # after commit, otherwise a concurrent request could cache the old prices again
+    transaction.on_commit(lambda: cache.delete(FEE_SCHEDULE_CACHE_KEY))
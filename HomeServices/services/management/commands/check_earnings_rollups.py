@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from services.rollups import find_rollup_mismatches, rebuild_earnings_rollups
+
+
+class Command(BaseCommand):
+    help = "Compare the daily earnings rollups with the raw earnings rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true", help="Rebuild the rollups from the raw rows"
+        )
+
+    def handle(self, *args, **options):
+        mismatches = find_rollup_mismatches()
+        for day, beneficiary, category, raw, rollup in mismatches:
+            self.stdout.write(
+                f"{day} beneficiary={beneficiary} category={category}: "
+                f"raw (total, count)={raw} rollup={rollup}"
+            )
+        if mismatches and options["fix"]:
+            rebuild_earnings_rollups()
+            self.stdout.write(self.style.SUCCESS("Rollups rebuilt"))
+        elif mismatches:
+            raise CommandError(f"{len(mismatches)} rollups don't match the earnings")
+        else:
+            self.stdout.write(self.style.SUCCESS("Rollups match the earnings"))
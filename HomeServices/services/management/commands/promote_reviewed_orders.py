@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from services.tasks import promote_reviewed_orders
+
+
+class Command(BaseCommand):
+    help = "Move the orders whose review period is over to Underway"
+
+    def handle(self, *args, **options):
+        promoted = promote_reviewed_orders()
+        self.stdout.write(self.style.SUCCESS(f"Promoted {promoted} orders"))
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.2 on 2026-10-17 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0046_inputfield_is_newest'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderservice',
+            index=models.Index(
+                fields=['home_service', 'status', 'create_date'],
+                name='order_inbox_idx',
+            ),
+        ),
+    ]
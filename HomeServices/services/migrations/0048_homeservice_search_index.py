@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-17 10:45
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS services_homeservice_fts "
+        "USING fts5(title, description)"
+    )
+    schema_editor.execute(
+        "INSERT INTO services_homeservice_fts (rowid, title, description) "
+        "SELECT id, title, description FROM services_homeservice"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS services_homeservice_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0047_orderservice_order_inbox_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
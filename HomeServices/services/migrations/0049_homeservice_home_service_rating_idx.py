@@ -0,0 +1,19 @@
+# Generated by Django 5.0.2 on 2026-10-17 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0048_homeservice_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='homeservice',
+            index=models.Index(
+                fields=['-average_ratings', '-id'], name='home_service_rating_idx'
+            ),
+        ),
+    ]
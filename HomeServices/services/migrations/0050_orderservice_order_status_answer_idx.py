@@ -0,0 +1,41 @@
+# Generated by Django 5.0.2 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+def schedule_sweeper(apps, schema_editor):
+    Schedule = apps.get_model('django_q', 'Schedule')
+    # the sweeper covers the orders these one-off schedules were waiting for
+    Schedule.objects.filter(func='services.tasks.update_status_to_underway').delete()
+    Schedule.objects.get_or_create(
+        name='promote_reviewed_orders',
+        defaults={
+            'func': 'services.tasks.promote_reviewed_orders',
+            'schedule_type': 'I',
+            'minutes': 1,
+            'repeats': -1,
+        },
+    )
+
+
+def unschedule_sweeper(apps, schema_editor):
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.filter(name='promote_reviewed_orders').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0049_homeservice_home_service_rating_idx'),
+        ('django_q', '0014_schedule_cluster'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderservice',
+            index=models.Index(
+                fields=['status', 'answer_time'], name='order_status_answer_idx'
+            ),
+        ),
+        migrations.RunPython(schedule_sweeper, unschedule_sweeper),
+    ]
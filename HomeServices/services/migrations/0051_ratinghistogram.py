@@ -0,0 +1,60 @@
+# Generated by Django 5.0.2 on 2026-10-17 16:00
+
+import django.db.models.deletion
+from collections import defaultdict
+from django.db import migrations, models
+
+DIMENSIONS = ['quality_of_service', 'commitment_to_deadline', 'work_ethics']
+
+
+def fill_rating_histograms(apps, schema_editor):
+    Rating = apps.get_model('services', 'Rating')
+    RatingHistogram = apps.get_model('services', 'RatingHistogram')
+    buckets = defaultdict(lambda: [0, 0.0])
+    ratings = Rating.objects.values_list(
+        'order_service__home_service_id', *DIMENSIONS
+    ).iterator(chunk_size=2000)
+    for home_service_id, *values in ratings:
+        for dimension, value in zip(DIMENSIONS, values):
+            stars = min(max(round(value), 1), 5)
+            bucket = buckets[(home_service_id, dimension, stars)]
+            bucket[0] += 1
+            bucket[1] += value
+    RatingHistogram.objects.bulk_create(
+        (
+            RatingHistogram(
+                home_service_id=home_service_id,
+                dimension=dimension,
+                stars=stars,
+                count=count,
+                total=total,
+            )
+            for (home_service_id, dimension, stars), (count, total) in buckets.items()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0050_orderservice_order_status_answer_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingHistogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=50)),
+                ('stars', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('home_service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_histogram', to='services.homeservice')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('home_service', 'dimension', 'stars'), name='unique_rating_histogram_bucket')],
+            },
+        ),
+        migrations.RunPython(fill_rating_histograms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.2 on 2026-10-17 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_earnings_rollups(apps, schema_editor):
+    Earnings = apps.get_model('services', 'Earnings')
+    EarningsRollup = apps.get_model('services', 'EarningsRollup')
+    rows = (
+        Earnings.objects.annotate(
+            day=TruncDate('created_date'),
+            category=F('order__home_service__category'),
+        )
+        .values('day', 'beneficiary', 'category')
+        .annotate(total=Sum('earnings'), count=Count('id'))
+    )
+    EarningsRollup.objects.bulk_create(
+        (
+            EarningsRollup(
+                day=row['day'],
+                beneficiary_id=row['beneficiary'],
+                category_id=row['category'],
+                total=row['total'],
+                count=row['count'],
+            )
+            for row in rows
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0051_ratinghistogram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarningsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('total', models.BigIntegerField(default=0)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('beneficiary', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='earnings_rollups', to='services.beneficiary')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='earnings_rollups', to='services.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'beneficiary', 'category'), name='unique_earnings_rollup')],
+            },
+        ),
+        migrations.RunPython(fill_earnings_rollups, migrations.RunPython.noop),
+    ]
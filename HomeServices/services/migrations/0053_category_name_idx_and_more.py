@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0052_earningsrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['name'], name='category_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homeservice',
+            index=models.Index(fields=['category', '-average_ratings', '-id'], name='home_service_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inputfield',
+            index=models.Index(condition=models.Q(('is_newest', True)), fields=['home_service'], name='input_field_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderservice',
+            index=models.Index(fields=['client', 'home_service', 'status'], name='order_client_service_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderservice',
+            index=models.Index(condition=models.Q(('is_rateable', True)), fields=['client'], name='order_rateable_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_earnings_category(apps, schema_editor):
+    Earnings = apps.get_model('services', 'Earnings')
+    OrderService = apps.get_model('services', 'OrderService')
+    Earnings.objects.exclude(order=None).update(
+        category=Subquery(
+            OrderService.objects.filter(pk=OuterRef('order')).values(
+                'home_service__category'
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0053_category_name_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='earnings',
+            name='category',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='earnings', to='services.category'),
+        ),
+        migrations.RunPython(fill_earnings_category, migrations.RunPython.noop),
+    ]
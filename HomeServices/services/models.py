@@ -10,6 +10,9 @@ class Category(models.Model):
         upload_to="categories", max_length=50, null=True, blank=True
     )
 
+    class Meta:
+        indexes = [models.Index(fields=["name"], name="category_name_idx")]
+
     def __str__(self):
         return self.name
 
@@ -35,6 +38,18 @@ class HomeService(models.Model):
     number_of_served_clients = models.PositiveIntegerField(default=0)
     average_ratings = models.FloatField(default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-average_ratings", "-id"], name="home_service_rating_idx"
+            ),
+            # services of a category, best rated first
+            models.Index(
+                fields=["category", "-average_ratings", "-id"],
+                name="home_service_category_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -72,6 +87,29 @@ class OrderService(models.Model):
     is_rateable = models.BooleanField(default=False)
     expected_time_by_day_to_finish = models.PositiveIntegerField(null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["home_service", "status", "create_date"],
+                name="order_inbox_idx",
+            ),
+            models.Index(
+                fields=["status", "answer_time"], name="order_status_answer_idx"
+            ),
+            # a client's orders, and whether one of them still waits on a
+            # pending order for the same service
+            models.Index(
+                fields=["client", "home_service", "status"],
+                name="order_client_service_idx",
+            ),
+            # only the few orders still waiting for a rating
+            models.Index(
+                fields=["client"],
+                condition=models.Q(is_rateable=True),
+                name="order_rateable_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{str(self.client)} ordered {str(self.home_service)}"
 
@@ -91,6 +129,35 @@ class Rating(models.Model):
         return f"{str(self.order_service)}, Rating"
 
 
+rating_dimensions = ["quality_of_service", "commitment_to_deadline", "work_ethics"]
+
+
+class RatingHistogram(models.Model):
+    """
+    How many ratings of a service gave `stars` (the rounded value) in one
+    dimension, and the sum of their exact values for the averages.
+    """
+
+    home_service = models.ForeignKey(
+        "HomeService", on_delete=models.CASCADE, related_name="rating_histogram"
+    )
+    dimension = models.CharField(max_length=50)
+    stars = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    total = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["home_service", "dimension", "stars"],
+                name="unique_rating_histogram_bucket",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.home_service_id} {self.dimension} {self.stars}: {self.count}"
+
+
 class Beneficiary(models.Model):
     beneficiary_name = models.CharField(max_length=100)
 
@@ -121,6 +188,13 @@ class Earnings(models.Model):
         null=True,
         related_name="earnings_beneficiary",
     )
+    # copied from the order's service, the order goes away with a deleted service
+    category = models.ForeignKey(
+        "Category",
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="earnings",
+    )
     earnings = models.IntegerField()
     created_date = models.DateTimeField(auto_now_add=True)
 
@@ -128,6 +202,37 @@ class Earnings(models.Model):
         return f"{str(self.beneficiary)} {str(self.earnings)}"
 
 
+class EarningsRollup(models.Model):
+    """Sum of the earnings of one day, kept per beneficiary and category."""
+
+    day = models.DateField()
+    beneficiary = models.ForeignKey(
+        "Beneficiary",
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="earnings_rollups",
+    )
+    category = models.ForeignKey(
+        "Category",
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="earnings_rollups",
+    )
+    total = models.BigIntegerField(default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "beneficiary", "category"],
+                name="unique_earnings_rollup",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.beneficiary} {self.category}: {self.total}"
+
+
 input_choices = [("text", "text"), ("number", "number")]
 
 
@@ -140,6 +245,17 @@ class InputField(models.Model):
     )
     is_newest = models.BooleanField(default=True)
 
+    class Meta:
+        # the current form of a service, older versions are kept for the data
+        # already submitted with them
+        indexes = [
+            models.Index(
+                fields=["home_service"],
+                condition=models.Q(is_newest=True),
+                name="input_field_newest_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.title}: {self.field_type}"
 
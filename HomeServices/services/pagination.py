@@ -0,0 +1,150 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError as BadRequest
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks straight to the next page with a
+    (field_1, field_2, ...) > (value_1, value_2, ...) filter instead of an OFFSET,
+    so page 1000 costs the same as page 1 when `ordering` is backed by an index.
+    The last field of `ordering` must be unique (usually "id"), a view can
+    override it per request with a `keyset_ordering` attribute.
+    """
+
+    ordering = ("-id",)
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, view):
+        return getattr(view, "keyset_ordering", None) or self.ordering
+
+    def encode_cursor(self, item):
+        position = []
+        for field in self.ordering:
+            value = getattr(item, field.lstrip("-"))
+            if hasattr(value, "isoformat"):
+                value = value.isoformat()
+            position.append(value)
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, request, queryset):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            values = []
+            for field, value in zip(self.ordering, position):
+                # to_python() lets None through and the ORM raises on it
+                if value is None or isinstance(value, (list, dict)):
+                    raise ValueError
+                try:
+                    model_field = queryset.model._meta.get_field(field.lstrip("-"))
+                except FieldDoesNotExist:
+                    # annotations are scores (search_score), never sent unchecked
+                    values.append(float(value))
+                else:
+                    values.append(model_field.to_python(value))
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            raise BadRequest({self.cursor_query_param: ["Invalid cursor"]})
+        return values
+
+    def get_keyset_filter(self, values):
+        keyset_filter = Q()
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition = Q(**{f"{name}__{lookup}": values[i]})
+            for previous, value in zip(self.ordering[:i], values[:i]):
+                condition &= Q(**{previous.lstrip("-"): value})
+            keyset_filter |= condition
+        return keyset_filter
+
+    def get_page_queryset(self, queryset, request, view=None):
+        self.ordering = self.get_ordering(view)
+        self.current_page_size = self.get_page_size(request)
+        values = self.decode_cursor(request, queryset)
+        queryset = queryset.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(self.get_keyset_filter(values))
+        # one extra row tells whether there is a next page
+        return queryset[: self.current_page_size + 1]
+
+    def get_page(self, rows):
+        if len(rows) > self.current_page_size:
+            rows = rows[: self.current_page_size]
+            self.next_cursor = self.encode_cursor(rows[-1])
+        else:
+            self.next_cursor = None
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.get_page(list(self.get_page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.get_page([item async for item in queryset])
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.next_cursor, "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "schema": {"type": "integer", "maximum": self.max_page_size},
+            },
+        ]
+
+
+class ReceivedOrdersPagination(KeysetPagination):
+    ordering = ("-create_date", "-id")
+
+
+class HomeServicesPagination(KeysetPagination):
+    ordering = ("-average_ratings", "-id")
+
+
+class UsersPagination(KeysetPagination):
+    ordering = ("id",)
+
+
+class RatingsPagination(KeysetPagination):
+    ordering = ("-rating_time", "-id")
@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from .models import Rating, RatingHistogram, rating_dimensions
+
+RATING_SUMMARY_CACHE_KEY = "rating_summary:{scope}:{id}"
+
+
+def get_stars(value: float):
+    return min(max(round(value), 1), 5)
+
+
+def add_to_bucket(home_service_id, dimension, value):
+    bucket = RatingHistogram.objects.filter(
+        home_service_id=home_service_id, dimension=dimension, stars=get_stars(value)
+    )
+    if bucket.update(count=F("count") + 1, total=F("total") + value):
+        return
+    try:
+        with transaction.atomic():
+            RatingHistogram.objects.create(
+                home_service_id=home_service_id,
+                dimension=dimension,
+                stars=get_stars(value),
+                count=1,
+                total=value,
+            )
+    except IntegrityError:
+        # created by a concurrent rating in between
+        bucket.update(count=F("count") + 1, total=F("total") + value)
+
+
+def invalidate_rating_summary(home_service):
+    keys = [
+        RATING_SUMMARY_CACHE_KEY.format(scope="service", id=home_service.id),
+        RATING_SUMMARY_CACHE_KEY.format(scope="seller", id=home_service.seller_id),
+    ]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def record_rating_histogram(rating: Rating, home_service):
+    for dimension in rating_dimensions:
+        add_to_bucket(home_service.id, dimension, getattr(rating, dimension))
+    invalidate_rating_summary(home_service)
+
+
+def build_summary(buckets):
+    summary = {"count": 0}
+    for dimension in rating_dimensions:
+        summary[dimension] = {
+            "average": 0.0,
+            "histogram": {stars: 0 for stars in range(1, 6)},
+        }
+    totals = dict.fromkeys(rating_dimensions, 0.0)
+    for bucket in buckets:
+        summary[bucket["dimension"]]["histogram"][bucket["stars"]] += bucket["ratings"]
+        totals[bucket["dimension"]] += bucket["ratings_total"]
+    # every rating fills exactly one bucket of every dimension
+    summary["count"] = sum(summary[rating_dimensions[0]]["histogram"].values())
+    if summary["count"]:
+        for dimension in rating_dimensions:
+            summary[dimension]["average"] = totals[dimension] / summary["count"]
+    return summary
+
+
+def get_rating_summary(home_service_id=None, seller_id=None):
+    """
+    Number of ratings, and per dimension the average and the histogram of
+    stars, of one service or of all the services of a seller.
+    """
+    if home_service_id is not None:
+        key = RATING_SUMMARY_CACHE_KEY.format(scope="service", id=home_service_id)
+        buckets = RatingHistogram.objects.filter(home_service_id=home_service_id)
+    else:
+        key = RATING_SUMMARY_CACHE_KEY.format(scope="seller", id=seller_id)
+        buckets = RatingHistogram.objects.filter(home_service__seller_id=seller_id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_summary(
+            buckets.values("dimension", "stars").annotate(
+                ratings=Sum("count"), ratings_total=Sum("total")
+            )
+        )
+        cache.set(key, summary, None)
+    return summary
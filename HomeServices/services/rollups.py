@@ -0,0 +1,128 @@
+from collections import defaultdict
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Earnings, EarningsRollup
+
+
+def add_to_rollup(day, beneficiary_id, category_id, amount, count=1):
+    # the unique constraint can't stop duplicates when beneficiary or category
+    # is NULL, which is fine because the rollups are always read with SUM
+    rollup = EarningsRollup.objects.filter(
+        day=day, beneficiary_id=beneficiary_id, category_id=category_id
+    )
+    if rollup.update(total=F("total") + amount, count=F("count") + count):
+        return
+    try:
+        with transaction.atomic():
+            EarningsRollup.objects.create(
+                day=day,
+                beneficiary_id=beneficiary_id,
+                category_id=category_id,
+                total=amount,
+                count=count,
+            )
+    except IntegrityError:
+        rollup.update(total=F("total") + amount, count=F("count") + count)
+
+
+def get_upsert_sql(rows_count):
+    table = EarningsRollup._meta.db_table
+    quote = connection.ops.quote_name
+    total, count = quote("total"), quote("count")
+    values = ", ".join(["(%s, %s, %s, %s, %s)"] * rows_count)
+    sql = (
+        f"INSERT INTO {quote(table)} (day, beneficiary_id, category_id, {total}, "
+        f"{count}) VALUES {values} "
+    )
+    # bulk_create(update_conflicts=True) can only overwrite the row it conflicts
+    # with, the rollups have to be added to
+    if connection.vendor == "mysql":
+        return sql + (
+            f"ON DUPLICATE KEY UPDATE {total} = {total} + VALUES({total}), "
+            f"{count} = {count} + VALUES({count})"
+        )
+    return sql + (
+        "ON CONFLICT (day, beneficiary_id, category_id) DO UPDATE SET "
+        f"{total} = {quote(table)}.{total} + excluded.{total}, "
+        f"{count} = {quote(table)}.{count} + excluded.{count}"
+    )
+
+
+def record_earnings(earnings, category_id):
+    """Add new earnings of an order to today's rollups, call it in the same transaction."""
+    day = timezone.localdate()
+    # one row per beneficiary, an upsert can't touch the same row twice
+    totals = defaultdict(lambda: [0, 0])
+    for earning in earnings:
+        totals[earning.beneficiary_id][0] += earning.earnings
+        totals[earning.beneficiary_id][1] += 1
+    if not totals:
+        return
+    if connection.vendor not in ("sqlite", "postgresql", "mysql"):
+        for beneficiary_id, (total, count) in totals.items():
+            add_to_rollup(day, beneficiary_id, category_id, total, count)
+        return
+    params = []
+    for beneficiary_id, (total, count) in totals.items():
+        params += [
+            connection.ops.adapt_datefield_value(day),
+            beneficiary_id,
+            category_id,
+            total,
+            count,
+        ]
+    with connection.cursor() as cursor:
+        cursor.execute(get_upsert_sql(len(totals)), params)
+
+
+def to_daily_totals(rows):
+    return {
+        (row["day"], row["beneficiary"], row["category"]): (row["sum"], row["rows"])
+        for row in rows
+    }
+
+
+def get_raw_daily_earnings():
+    return to_daily_totals(
+        Earnings.objects.annotate(day=TruncDate("created_date"))
+        .values("day", "beneficiary", "category")
+        .annotate(sum=Sum("earnings"), rows=Count("id"))
+    )
+
+
+def get_rollup_daily_earnings():
+    return to_daily_totals(
+        EarningsRollup.objects.values("day", "beneficiary", "category").annotate(
+            sum=Sum("total"), rows=Sum("count")
+        )
+    )
+
+
+def find_rollup_mismatches():
+    """(day, beneficiary, category, raw (total, count), rollup (total, count))"""
+    raw = get_raw_daily_earnings()
+    rollups = get_rollup_daily_earnings()
+    return [
+        (*key, raw.get(key, (0, 0)), rollups.get(key, (0, 0)))
+        for key in sorted(raw.keys() | rollups.keys(), key=str)
+        if raw.get(key, (0, 0)) != rollups.get(key, (0, 0))
+    ]
+
+
+@transaction.atomic
+def rebuild_earnings_rollups():
+    EarningsRollup.objects.all().delete()
+    EarningsRollup.objects.bulk_create(
+        EarningsRollup(
+            day=day,
+            beneficiary_id=beneficiary_id,
+            category_id=category_id,
+            total=total,
+            count=count,
+        )
+        for (day, beneficiary_id, category_id), (total, count) in (
+            get_raw_daily_earnings().items()
+        )
+    )
@@ -0,0 +1,130 @@
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+FTS_TABLE = "services_homeservice_fts"
+
+# how much one rating star counts compared to the text relevance of a service
+RATING_WEIGHT = getattr(settings, "SEARCH_RATING_WEIGHT", 1.0)
+
+
+def get_search_terms(text: str):
+    return re.findall(r"\w+", text or "")
+
+
+class BaseSearchBackend(ABC):
+    """
+    A search backend filters a HomeService queryset by a free text query and
+    annotates every match with a `search_score` (higher is better) that combines
+    text relevance with `average_ratings`.
+    """
+
+    def index(self, home_service):
+        pass
+
+    def remove(self, home_service_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    @abstractmethod
+    def search(self, queryset, text):
+        pass
+
+    def no_results(self, queryset):
+        return queryset.annotate(
+            search_score=Value(0.0, output_field=FloatField())
+        ).none()
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Fallback for databases without a full text index, every term must match."""
+
+    def search(self, queryset, text):
+        terms = get_search_terms(text)
+        if not terms:
+            return self.no_results(queryset)
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term)
+            )
+        return queryset.annotate(
+            search_score=ExpressionWrapper(
+                F("average_ratings") * RATING_WEIGHT, output_field=FloatField()
+            )
+        )
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    Keeps title and description in an FTS5 table (rowid = HomeService.id), so a
+    search is an inverted index lookup instead of a LIKE scan over the catalogue.
+    """
+
+    def get_match_query(self, text):
+        # quote every term so user input can't inject FTS5 syntax, and make it a
+        # prefix query to keep the "title contains" feel while typing
+        return " ".join(f'"{term}"*' for term in get_search_terms(text))
+
+    def index(self, home_service):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [home_service.id]
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)",
+                [home_service.id, home_service.title, home_service.description],
+            )
+
+    def remove(self, home_service_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [home_service_id]
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description) "
+                "SELECT id, title, description FROM services_homeservice"
+            )
+
+    def search(self, queryset, text):
+        match = self.get_match_query(text)
+        if not match:
+            return self.no_results(queryset)
+        # bm25() is negative, the more negative the better the match
+        relevance = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = services_homeservice.id",
+            [match],
+            output_field=FloatField(),
+        )
+        return queryset.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+            )
+        ).annotate(
+            search_score=ExpressionWrapper(
+                relevance + F("average_ratings") * RATING_WEIGHT,
+                output_field=FloatField(),
+            )
+        )
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    backend = getattr(settings, "SEARCH_BACKEND", None)
+    if backend:
+        return import_string(backend)()
+    if connection.vendor == "sqlite":
+        return SQLiteFTSBackend()
+    return DatabaseSearchBackend()
@@ -194,6 +194,10 @@ class InputFieldSerializerAll(serializers.ModelSerializer):
 
 
 class InputDataSerializer(serializers.ModelSerializer):
+    # a plain id, MakeOrderService checks it against the service form itself
+    # instead of one lookup per submitted field
+    field = serializers.IntegerField()
+
     class Meta:
         model = InputData
         fields = ["field", "content"]
@@ -0,0 +1,62 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import HomeService, Category, Area, GeneralServicesPrice, Beneficiary
+from .search import get_search_backend
+from .cache import bump_reference_data_version
+from .fees import invalidate_fee_schedule
+from .ratings import invalidate_rating_summary
+from core.stats import record_service_created, record_service_deleted
+
+
+@receiver(post_save, sender=HomeService)
+def index_home_service(sender, instance, **kwargs):
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=HomeService)
+def remove_home_service_from_index(sender, instance, **kwargs):
+    get_search_backend().remove(instance.id)
+
+
+@receiver(post_save, sender=HomeService)
+def count_created_service(sender, instance, created, **kwargs):
+    if created:
+        record_service_created(instance)
+
+
+@receiver(post_delete, sender=HomeService)
+def count_deleted_service(sender, instance, **kwargs):
+    record_service_deleted(instance)
+
+
+@receiver(post_delete, sender=HomeService)
+def forget_rating_summary(sender, instance, **kwargs):
+    # the seller summary still counts the ratings of the deleted service
+    invalidate_rating_summary(instance)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories(sender, **kwargs):
+    bump_reference_data_version("categories")
+
+
+@receiver(post_save, sender=Area)
+@receiver(post_delete, sender=Area)
+def invalidate_areas(sender, **kwargs):
+    bump_reference_data_version("areas")
+
+
+@receiver(post_save, sender=HomeService)
+@receiver(post_delete, sender=HomeService)
+def invalidate_users_directory(sender, **kwargs):
+    # the directory shows each seller's categories and average rating
+    bump_reference_data_version("users_directory")
+
+
+@receiver(post_save, sender=GeneralServicesPrice)
+@receiver(post_delete, sender=GeneralServicesPrice)
+@receiver(post_save, sender=Beneficiary)
+@receiver(post_delete, sender=Beneficiary)
+def invalidate_fees(sender, **kwargs):
+    invalidate_fee_schedule()
@@ -75,3 +75,27 @@ class RetrieveRatingsSpectacularForUsername(serializers.Serializer):
     rating_time = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
     client = ClientSpectacular()
     home_service = HomeServiceSimpleSpectacular()
+
+
+class RatingDimensionSummarySpectacular(serializers.Serializer):
+    average = serializers.FloatField()
+    histogram = serializers.DictField(child=serializers.IntegerField())
+
+
+class RatingSummarySpectacular(serializers.Serializer):
+    count = serializers.IntegerField()
+    quality_of_service = RatingDimensionSummarySpectacular()
+    commitment_to_deadline = RatingDimensionSummarySpectacular()
+    work_ethics = RatingDimensionSummarySpectacular()
+
+
+class RatingsPageSpectacular(serializers.Serializer):
+    next = serializers.CharField(allow_null=True)
+    results = RetrieveRatingsSpectacular(many=True)
+    summary = RatingSummarySpectacular()
+
+
+class RatingsPageSpectacularForUsername(serializers.Serializer):
+    next = serializers.CharField(allow_null=True)
+    results = RetrieveRatingsSpectacularForUsername(many=True)
+    summary = RatingSummarySpectacular()
@@ -1,11 +1,30 @@
+import logging
+from datetime import timedelta
+from django.utils import timezone
 from .models import OrderService
 
+logger = logging.getLogger(__name__)
+
+# how long the seller can still back out of an accepted order
+UNDER_REVIEW_PERIOD = timedelta(minutes=15)
+
+
+def promote_reviewed_orders():
+    """
+    Move every order accepted more than UNDER_REVIEW_PERIOD ago from
+    "Under Review" to "Underway" with a single UPDATE, runs every minute from
+    the django-q cluster and returns how many orders it promoted.
+    """
+    promoted = OrderService.objects.filter(
+        status="Under Review",
+        answer_time__lte=timezone.now() - UNDER_REVIEW_PERIOD,
+    ).update(status="Underway")
+    if promoted:
+        logger.info("Promoted %s orders to Underway", promoted)
+    return promoted
+
 
 def update_status_to_underway(order_id):
-    try:
-        order = OrderService.objects.get(pk=order_id)
-        if order.status == "Under Review":
-            order.status = "Underway"
-            order.save()
-    except OrderService.DoesNotExist:
-        pass
+    # the per-order task the sweeper replaced, kept for one release so tasks
+    # queued before the deploy still run
+    return promote_reviewed_orders()
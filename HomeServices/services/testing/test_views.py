@@ -3,9 +3,39 @@ from mixer.backend.django import mixer
 from hypothesis.extra.django import TestCase
 from rest_framework.test import APIClient
 from rest_framework.reverse import reverse, reverse_lazy
-from services.models import HomeService, Category
-from core.models import NormalUser, Balance
+from datetime import timedelta
+import base64
+import csv
+import json
+import re
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.db.models import Avg, Exists, OuterRef, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from services.models import (
+    HomeService,
+    Category,
+    Area,
+    OrderService,
+    InputField,
+    InputData,
+    Beneficiary,
+    GeneralServicesPrice,
+    Earnings,
+    EarningsRollup,
+)
+from core.models import NormalUser, Balance, User, SellerStats
 from knox.auth import AuthToken
+from services.rollups import record_earnings
+from services.tasks import promote_reviewed_orders, update_status_to_underway
+from django_q.models import Schedule
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor
+from django.test import TransactionTestCase
 
 pytest_mark = pytest.mark.django_db
 
@@ -70,3 +100,748 @@ class TestCoreAPIViews(TestCase):
 
         assert response.status_code == 204
         assert query.count() == 0
+
+    def add_orders(self, count, status="Underway"):
+        for _ in range(count):
+            service = mixer.blend(HomeService)
+            service.service_area.add(mixer.blend(Area))
+            field = mixer.blend(InputField, home_service=service, title="field")
+            order = mixer.blend(
+                OrderService,
+                client=self.global_user,
+                home_service=service,
+                status=status,
+                is_rateable=True,
+            )
+            mixer.blend(InputData, order=order, field=field, content="content")
+
+    def test_my_orders_feed(self):
+        self.add_orders(1)
+        response = self.client.get(reverse("my_orders"))
+        order = response.json()[0]
+
+        assert response.status_code == 200
+        assert order["client"]["username"] == self.global_user.user.username
+        assert order["form"] == [
+            {
+                "field": {"title": "field", "field_type": "TEXT", "note": ""},
+                "content": "content",
+            }
+        ]
+        assert len(order["home_service"]["service_area"]) == 1
+        assert order["is_rateable"] is True
+
+    def test_my_orders_query_count_is_flat(self):
+        url = reverse("my_orders")
+        self.add_orders(2)
+        self.client.get(url)  # caches the token
+        with CaptureQueriesContext(connection) as few_orders:
+            response = self.client.get(url)
+        assert len(response.json()) == 2
+
+        self.add_orders(20)
+        with CaptureQueriesContext(connection) as many_orders:
+            response = self.client.get(url)
+        assert len(response.json()) == 22
+
+        assert len(many_orders) == len(few_orders)
+
+    def add_received_orders(self, count, status="Underway"):
+        service = mixer.blend(HomeService, seller=self.global_user)
+        client = mixer.blend(NormalUser)
+        return [
+            mixer.blend(
+                OrderService, client=client, home_service=service, status=status
+            )
+            for _ in range(count)
+        ]
+
+    def test_received_orders_keyset_pages(self):
+        orders = self.add_received_orders(5)
+        url = reverse("received_orders")
+
+        response = self.client.get(url, {"page_size": 2})
+        first_page = response.json()
+        assert response.status_code == 200
+        assert [order["id"] for order in first_page["results"]] == [
+            orders[4].id,
+            orders[3].id,
+        ]
+
+        ids = [order["id"] for order in first_page["results"]]
+        cursor = first_page["next"]
+        while cursor:
+            page = self.client.get(url, {"page_size": 2, "cursor": cursor}).json()
+            ids += [order["id"] for order in page["results"]]
+            cursor = page["next"]
+        assert ids == [order.id for order in reversed(orders)]
+
+    def test_received_orders_filters(self):
+        self.add_received_orders(2, status="Pending")
+        self.add_received_orders(3, status="Underway")
+        self.add_received_orders(1, status="Rejected")
+        url = reverse("received_orders")
+
+        response = self.client.get(url, {"status": "Pending"})
+        assert len(response.json()["results"]) == 2
+        assert response.json()["results"][0]["form"] == []
+
+        response = self.client.get(url, {"status": "Rejected"})
+        assert response.json()["results"] == []
+
+        today = timezone.now().date()
+        response = self.client.get(
+            url, {"from_date": today, "to_date": today + timedelta(days=1)}
+        )
+        assert len(response.json()["results"]) == 5
+
+        response = self.client.get(url, {"to_date": today - timedelta(days=1)})
+        assert response.json()["results"] == []
+
+    def test_received_orders_bad_params(self):
+        url = reverse("received_orders")
+        assert self.client.get(url, {"status": "Done"}).status_code == 400
+        assert self.client.get(url, {"from_date": "yesterday"}).status_code == 400
+        assert self.client.get(url, {"cursor": "not-a-cursor"}).status_code == 400
+        for position in ([None, 1], [[1], 1], [{"a": 1}, 1], [1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            assert self.client.get(url, {"cursor": cursor}).status_code == 400
+
+    def search_services(self, title):
+        url = reverse("list_home_services")
+        response = APIClient().get(url, {"title": title})
+        assert response.status_code == 200
+        return [service["id"] for service in response.json()["results"]]
+
+    def add_service(self, title, description="", average_ratings=0):
+        service = mixer.blend(
+            HomeService,
+            title=title,
+            description=description,
+            average_ratings=average_ratings,
+        )
+        service.service_area.add(mixer.blend(Area))
+        return service
+
+    def test_search_home_services(self):
+        fix = self.add_service("Pipe fixing", average_ratings=2)
+        pipes = self.add_service("Pipes", "we fix leaking pipes", average_ratings=5)
+        self.add_service("Painting", "walls and doors")
+
+        assert self.search_services("pipe") == [pipes.id, fix.id]
+        assert self.search_services("leaking") == [pipes.id]
+        assert self.search_services("fix pipe") == [pipes.id, fix.id]
+        assert self.search_services("roof") == []
+        assert self.search_services('"*') == []
+
+        url = reverse("list_home_services")
+        response = APIClient().get(url, {"title": "pipe", "page_size": 1})
+        next_page = APIClient().get(
+            url, {"title": "pipe", "page_size": 1, "cursor": response.json()["next"]}
+        )
+        assert [service["id"] for service in next_page.json()["results"]] == [fix.id]
+        for position in (["x", 1], [{"a": 1}, 1], [[1], 1], [None, 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            response = APIClient().get(url, {"title": "pipe", "cursor": cursor})
+            assert response.status_code == 400
+
+    def test_search_index_follows_service_changes(self):
+        service = self.add_service("Carpentry")
+        assert self.search_services("carpentry") == [service.id]
+
+        service.title = "Tiling"
+        service.save()
+        assert self.search_services("carpentry") == []
+        assert self.search_services("tiling") == [service.id]
+
+        service.delete()
+        assert self.search_services("tiling") == []
+
+    def test_list_home_services_pages(self):
+        services = [
+            self.add_service(f"service {i}", average_ratings=i % 3) for i in range(7)
+        ]
+        expected = sorted(
+            services, key=lambda s: (s.average_ratings, s.id), reverse=True
+        )
+        url = reverse("list_home_services")
+        client = APIClient()
+
+        ids = []
+        cursor = None
+        while True:
+            params = {"page_size": 3}
+            if cursor:
+                params["cursor"] = cursor
+            with CaptureQueriesContext(connection) as queries:
+                page = client.get(url, params).json()
+            assert len(page["results"]) <= 3
+            assert len(queries) <= 2
+            ids += [service["id"] for service in page["results"]]
+            cursor = page["next"]
+            if not cursor:
+                break
+        assert ids == [service.id for service in expected]
+
+    def test_list_home_services_filtered_by_user_area(self):
+        in_area = self.add_service("in area")
+        in_area.service_area.add(self.global_user.user.area)
+        self.add_service("other area")
+
+        response = self.client.get(reverse("list_home_services"))
+        assert [service["id"] for service in response.json()["results"]] == [in_area.id]
+
+    def test_categories_are_cached_with_etag(self):
+        url = reverse("categories")
+        response = self.client.get(url)
+        etag = response.headers["ETag"]
+        assert response.status_code == 200
+        assert "max-age" in response.headers["Cache-Control"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(url)
+        assert response.status_code == 200
+        assert len(queries) == 0
+
+        response = APIClient().get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        category = Category.objects.first()
+        category.name = "renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            category.save()
+        response = APIClient().get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert "renamed" in [category["name"] for category in response.json()]
+
+    async def test_read_endpoints_under_async_client(self):
+        service = await HomeService.objects.select_related("seller__user").aget(
+            pk=(await sync_to_async(self.add_service)("async", average_ratings=3)).id
+        )
+        detail = await self.async_client.get(
+            f"/services/home_service/detail/{service.id}"
+        )
+        assert detail.status_code == 200
+        assert (
+            detail.json()["seller"]["user"]["username"] == service.seller.user.username
+        )
+        missing = await self.async_client.get("/services/home_service/detail/0")
+        assert missing.status_code == 404
+
+        listed = await self.async_client.get(reverse("list_home_services"))
+        assert service.id in [item["id"] for item in listed.json()["results"]]
+        for name in ("categories", "list_all_area"):
+            assert (await self.async_client.get(reverse(name))).status_code == 200
+
+        user = await self.async_client.get(
+            reverse("retrieve_user", kwargs={"username": service.seller.user.username})
+        )
+        assert user.json()["id"] == service.seller.user_id
+
+    def test_areas_cache_invalidated_on_delete(self):
+        area_id = mixer.blend(Area).id
+        url = reverse("list_all_area")
+        assert area_id in [area["id"] for area in APIClient().get(url).json()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Area.objects.get(pk=area_id).delete()
+        assert area_id not in [area["id"] for area in APIClient().get(url).json()]
+
+    def add_pending_order(self, seller, waited):
+        service = mixer.blend(HomeService, seller=seller)
+        order = mixer.blend(OrderService, home_service=service, status="Pending")
+        OrderService.objects.filter(pk=order.id).update(
+            create_date=timezone.now() - waited
+        )
+        return order
+
+    def test_average_fast_answer_is_per_seller(self):
+        other_seller = mixer.blend(NormalUser)
+        self.add_pending_order(other_seller, timedelta(days=10))
+        OrderService.objects.update(status="Rejected", answer_time=timezone.now())
+
+        for waited in (timedelta(hours=1), timedelta(hours=3)):
+            order = self.add_pending_order(self.global_user, waited)
+            url = reverse("reject_order", kwargs={"order_id": order.id})
+            assert self.client.put(url).status_code == 204
+
+        self.global_user.refresh_from_db()
+        average = self.global_user.average_fast_answer
+        assert abs(average - timedelta(hours=2)) < timedelta(minutes=1)
+
+        NormalUser.objects.filter(pk=self.global_user.pk).update(
+            average_fast_answer=None
+        )
+        call_command("backfill_answer_times", stdout=StringIO())
+        self.global_user.refresh_from_db()
+        assert abs(self.global_user.average_fast_answer - average) < timedelta(
+            seconds=1
+        )
+        other_seller.refresh_from_db()
+        assert other_seller.average_fast_answer >= timedelta(days=10)
+
+    def test_accept_order_takes_cached_fees(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, price in (("platform", 100), ("insurance", 50)):
+                GeneralServicesPrice.objects.create(
+                    beneficiary=Beneficiary.objects.create(beneficiary_name=name),
+                    price=price,
+                )
+        first, second, third = (
+            self.add_pending_order(self.global_user, timedelta(hours=1))
+            for _ in range(3)
+        )
+
+        url = reverse("accept_order", kwargs={"order_id": first.id})
+        assert self.client.put(url).status_code == 200
+        assert Earnings.objects.filter(order=first).count() == 2
+        self.global_user.balance.refresh_from_db()
+        assert self.global_user.balance.total_balance == 850
+
+        # the schedule is served from the cache until a price changes
+        with CaptureQueriesContext(connection) as queries:
+            self.client.put(reverse("accept_order", kwargs={"order_id": second.id}))
+        assert not any(
+            "services_generalservicesprice" in query["sql"]
+            for query in queries.captured_queries
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GeneralServicesPrice.objects.filter(price=50).get().delete()
+        self.client.put(reverse("accept_order", kwargs={"order_id": third.id}))
+        self.global_user.balance.refresh_from_db()
+        assert self.global_user.balance.total_balance == 850 - 150 - 100
+
+    def test_accept_order_without_enough_money_changes_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            GeneralServicesPrice.objects.create(
+                beneficiary=Beneficiary.objects.create(beneficiary_name="platform"),
+                price=1001,
+            )
+        order = self.add_pending_order(self.global_user, timedelta(hours=1))
+
+        url = reverse("accept_order", kwargs={"order_id": order.id})
+        response = self.client.put(url)
+        assert response.status_code == 400
+        order.refresh_from_db()
+        assert order.status == "Pending"
+        assert not Earnings.objects.exists()
+        assert not self.global_user.balance_entries.exists()
+        self.global_user.balance.refresh_from_db()
+        assert self.global_user.balance.total_balance == 1000
+
+    def test_accept_order_answer_time_commits_with_the_charge(self):
+        order = self.add_pending_order(self.global_user, timedelta(hours=1))
+        url = reverse("accept_order", kwargs={"order_id": order.id})
+        with mock.patch("services.views.record_answer", side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.client.put(url)
+        order.refresh_from_db()
+        assert order.status == "Pending"
+        assert order.answer_time is None
+        assert not self.global_user.balance_entries.exists()
+
+        assert self.client.put(url).status_code == 200
+        order.refresh_from_db()
+        assert order.status == "Under Review"
+        assert order.answer_time is not None
+        assert SellerStats.objects.get(user=self.global_user).answer_count == 1
+
+    def order_service(self, fields_count):
+        service = mixer.blend(HomeService)
+        fields = mixer.cycle(fields_count).blend(
+            InputField, home_service=service, is_newest=True
+        )
+        form_data = [{"field": field.id, "content": "answer"} for field in fields]
+        url = reverse("create_order_service", kwargs={"service_id": service.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                url,
+                {"form_data": form_data, "expected_time_by_day_to_finish": 3},
+                format="json",
+            )
+        assert response.status_code == 200
+        order = OrderService.objects.get(home_service=service)
+        assert sorted(order.input_data_set.values_list("field_id", flat=True)) == [
+            field.id for field in fields
+        ]
+        return len(queries)
+
+    def test_order_service_queries_do_not_grow_with_form(self):
+        self.order_service(1)  # caches the token
+        assert self.order_service(1) == self.order_service(10)
+
+    def test_order_service_requires_every_field(self):
+        service = mixer.blend(HomeService)
+        first, second = mixer.cycle(2).blend(
+            InputField, home_service=service, is_newest=True
+        )
+        url = reverse("create_order_service", kwargs={"service_id": service.id})
+        response = self.client.post(
+            url,
+            {
+                "form_data": [{"field": first.id, "content": "answer"}],
+                "expected_time_by_day_to_finish": 3,
+            },
+            format="json",
+        )
+        assert response.status_code == 400
+        assert str(second.id) in response.json()["detail"]
+        assert not OrderService.objects.filter(home_service=service).exists()
+
+    def test_reviewed_orders_are_promoted_in_one_sweep(self):
+        now = timezone.now()
+        due = [
+            self.add_pending_order(self.global_user, timedelta(hours=1))
+            for _ in range(3)
+        ]
+        recent = self.add_pending_order(self.global_user, timedelta(hours=1))
+        pending = self.add_pending_order(self.global_user, timedelta(hours=1))
+        OrderService.objects.filter(pk__in=[order.id for order in due]).update(
+            status="Under Review", answer_time=now - timedelta(minutes=16)
+        )
+        OrderService.objects.filter(pk=recent.id).update(
+            status="Under Review", answer_time=now - timedelta(minutes=5)
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            assert promote_reviewed_orders() == 3
+        assert len(queries) == 1
+        statuses = dict(OrderService.objects.values_list("id", "status"))
+        assert {statuses[order.id] for order in due} == {"Underway"}
+        assert statuses[recent.id] == "Under Review"
+        assert statuses[pending.id] == "Pending"
+        assert promote_reviewed_orders() == 0
+
+    def test_tasks_queued_before_the_sweeper_still_run(self):
+        order = self.add_pending_order(self.global_user, timedelta(hours=1))
+        OrderService.objects.filter(pk=order.id).update(
+            status="Under Review", answer_time=timezone.now() - timedelta(minutes=16)
+        )
+        assert update_status_to_underway(order.id) == 1
+        order.refresh_from_db()
+        assert order.status == "Underway"
+
+    def test_accept_order_does_not_schedule_a_task(self):
+        order = self.add_pending_order(self.global_user, timedelta(hours=1))
+        schedules = Schedule.objects.count()
+        url = reverse("accept_order", kwargs={"order_id": order.id})
+        assert self.client.put(url).status_code == 200
+        assert Schedule.objects.count() == schedules
+
+    def rate_service(self, service, values):
+        client = mixer.blend(NormalUser)
+        order = mixer.blend(
+            OrderService,
+            client=client,
+            home_service=service,
+            status="Underway",
+            is_rateable=True,
+        )
+        _, token = AuthToken.objects.create(client.user)
+        response = APIClient().post(
+            reverse("make_rating", kwargs={"order_id": order.id}),
+            dict(
+                zip(
+                    ["quality_of_service", "commitment_to_deadline", "work_ethics"],
+                    values,
+                ),
+                client_comment="comment",
+            ),
+            HTTP_AUTHORIZATION="token " + token,
+        )
+        assert response.status_code == 200
+
+    def test_ratings_pages_and_summary(self):
+        service = mixer.blend(HomeService, seller=self.global_user)
+        for values in ((5, 4, 3), (4.6, 4, 1), (1, 2, 3)):
+            self.rate_service(service, values)
+
+        url = reverse("ratings_by_service", kwargs={"service_id": service.id})
+        first = APIClient().get(url, {"page_size": 2}).json()
+        second = APIClient().get(url, {"page_size": 2, "cursor": first["next"]}).json()
+        assert len(first["results"]) == 2
+        assert second["next"] is None
+        assert [rate["quality_of_service"] for rate in first["results"]] == [1, 4.6]
+        assert second["results"][0]["quality_of_service"] == 5
+
+        summary = first["summary"]
+        assert summary["count"] == 3
+        assert summary["quality_of_service"]["histogram"] == {
+            "1": 1,
+            "2": 0,
+            "3": 0,
+            "4": 0,
+            "5": 2,
+        }
+        assert abs(summary["quality_of_service"]["average"] - 3.533) < 0.01
+        assert summary["work_ethics"]["average"] == 7 / 3
+
+        url = reverse(
+            "ratings_by_username", kwargs={"username": self.global_user.user.username}
+        )
+        response = APIClient().get(url).json()
+        assert response["summary"] == summary
+        assert response["results"][0]["home_service"]["service_id"] == service.id
+
+    def test_ratings_queries_do_not_grow_with_ratings(self):
+        service = mixer.blend(HomeService, seller=self.global_user)
+        url = reverse(
+            "ratings_by_username", kwargs={"username": self.global_user.user.username}
+        )
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                assert APIClient().get(url).status_code == 200
+            return len(queries)
+
+        self.rate_service(service, (3, 3, 3))
+        few = count_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(4):
+                self.rate_service(service, (4, 4, 4))
+        assert count_queries() == few
+        # served from the cache until the next rating
+        assert count_queries() == few - 1
+        assert APIClient().get(url).json()["summary"]["count"] == 5
+
+    def export_earnings(self, file_format, **params):
+        admin = mixer.blend(User, is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        url = reverse("export_earnings", kwargs={"file_format": file_format})
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, params)
+            content = b"".join(getattr(response, "streaming_content", [])).decode()
+        return response, content, len(queries)
+
+    def test_export_earnings(self):
+        platform = Beneficiary.objects.create(beneficiary_name="platform")
+        insurance = Beneficiary.objects.create(beneficiary_name="insurance")
+        order = self.add_pending_order(self.global_user, timedelta(hours=1))
+        for beneficiary in (platform, insurance, platform):
+            Earnings.objects.create(order=order, beneficiary=beneficiary, earnings=10)
+        old = Earnings.objects.create(order=None, beneficiary=platform, earnings=5)
+        Earnings.objects.filter(pk=old.id).update(
+            created_date=timezone.now() - timedelta(days=30)
+        )
+
+        response, content, queries = self.export_earnings("ndjson")
+        assert response["Content-Type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in content.splitlines()]
+        assert len(rows) == 4
+        assert rows[0]["seller"] == self.global_user.user.username
+        assert rows[0]["service_id"] == order.home_service_id
+        assert rows[3]["service_id"] is None
+
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        _, content, filtered_queries = self.export_earnings(
+            "csv", beneficiary=platform.id, from_date=since
+        )
+        rows = list(csv.DictReader(content.splitlines()))
+        assert [row["beneficiary_name"] for row in rows] == ["platform", "platform"]
+        # the joins are in the query, nothing runs per row
+        assert filtered_queries == queries
+
+        assert self.export_earnings("xml")[0].status_code == 404
+        assert self.export_earnings("csv", to_date="yesterday")[0].status_code == 400
+
+    def test_earnings_rollups_are_one_upsert(self):
+        order = self.add_pending_order(self.global_user, timedelta(hours=1))
+        platform, insurance = [
+            Beneficiary.objects.create(beneficiary_name=name)
+            for name in ("platform", "insurance")
+        ]
+        earnings = [
+            Earnings(order=order, beneficiary=platform, earnings=100),
+            Earnings(order=order, beneficiary=insurance, earnings=50),
+            Earnings(order=order, beneficiary=insurance, earnings=5),
+        ]
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                record_earnings(earnings, order.home_service.category_id)
+            assert len(queries) == 1
+        rollups = EarningsRollup.objects.values_list("beneficiary", "total", "count")
+        assert sorted(rollups) == sorted(
+            [(platform.id, 200, 2), (insurance.id, 110, 4)]
+        )
+
+    def test_daily_earnings_follow_accepted_orders(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, price in (("platform", 100), ("insurance", 50)):
+                GeneralServicesPrice.objects.create(
+                    beneficiary=Beneficiary.objects.create(beneficiary_name=name),
+                    price=price,
+                )
+        for _ in range(3):
+            order = self.add_pending_order(self.global_user, timedelta(hours=1))
+            url = reverse("accept_order", kwargs={"order_id": order.id})
+            assert self.client.put(url).status_code == 200
+        # an earning from last month that is already in the rollups
+        old = Earnings.objects.create(
+            order=order,
+            beneficiary=None,
+            category=order.home_service.category,
+            earnings=7,
+        )
+        Earnings.objects.filter(pk=old.id).update(
+            created_date=timezone.now() - timedelta(days=30)
+        )
+        EarningsRollup.objects.create(
+            day=timezone.localdate() - timedelta(days=30),
+            category=order.home_service.category,
+            total=7,
+            count=1,
+        )
+        call_command("check_earnings_rollups", stdout=StringIO())
+
+        admin = mixer.blend(User, is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        url = reverse("daily_earnings")
+        today = timezone.localdate().isoformat()
+        assert client.get(url, {"from_date": today}).json() == [
+            {"day": today, "earnings": 450, "count": 6}
+        ]
+        platform = Beneficiary.objects.get(beneficiary_name="platform")
+        by_beneficiary = client.get(
+            url, {"group_by": "beneficiary", "beneficiary": platform.id}
+        ).json()
+        assert by_beneficiary == [
+            {"day": today, "beneficiary": platform.id, "earnings": 300, "count": 3}
+        ]
+        assert len(client.get(url).json()) == 2
+        assert client.get(url, {"group_by": "seller"}).status_code == 400
+
+        EarningsRollup.objects.filter(beneficiary=platform).update(total=1)
+        with self.assertRaises(CommandError):
+            call_command("check_earnings_rollups", stdout=StringIO())
+        call_command("check_earnings_rollups", "--fix", stdout=StringIO())
+        call_command("check_earnings_rollups", stdout=StringIO())
+
+    def test_earnings_rollups_survive_a_deleted_service(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            GeneralServicesPrice.objects.create(
+                beneficiary=Beneficiary.objects.create(beneficiary_name="platform"),
+                price=100,
+            )
+        order = self.add_pending_order(self.global_user, timedelta(hours=1))
+        category = order.home_service.category
+        url = reverse("accept_order", kwargs={"order_id": order.id})
+        assert self.client.put(url).status_code == 200
+
+        url = reverse(
+            "delete_service", kwargs={"home_service_id": order.home_service_id}
+        )
+        assert self.client.delete(url).status_code == 204
+        assert not OrderService.objects.filter(pk=order.id).exists()
+        assert Earnings.objects.get().category == category
+        call_command("check_earnings_rollups", stdout=StringIO())
+
+
+class TestConcurrentOrders(TransactionTestCase):
+    def test_parallel_submissions_create_one_pending_order(self):
+        client = mixer.blend(NormalUser)
+        service = mixer.blend(HomeService)
+        field = mixer.blend(InputField, home_service=service, is_newest=True)
+        url = reverse("create_order_service", kwargs={"service_id": service.id})
+
+        def submit(_):
+            api_client = APIClient()
+            api_client.force_authenticate(client.user)
+            try:
+                return api_client.post(
+                    url,
+                    {
+                        "form_data": [{"field": field.id, "content": "answer"}],
+                        "expected_time_by_day_to_finish": 3,
+                    },
+                    format="json",
+                ).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(submit, range(8)))
+
+        assert statuses.count(200) == 1
+        assert OrderService.objects.filter(client=client, status="Pending").count() == 1
+
+
+@pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="reads SQLite's EXPLAIN QUERY PLAN"
+)
+class TestQueryPlans(TestCase):
+    def setUp(self):
+        self.seller = mixer.blend(NormalUser, user__mode="seller")
+        self.client_user = mixer.blend(NormalUser, user__mode="client")
+        self.area = mixer.blend(Area)
+        self.home_service = mixer.blend(HomeService, seller=self.seller)
+        self.home_service.service_area.add(self.area)
+
+    def assert_uses_index(self, queryset, index):
+        plan = queryset.explain()
+        # "SCAN table" reads the whole table, "SCAN table USING INDEX" the whole
+        # index, a hot query should only SEARCH
+        assert not re.search(r"\bSCAN\b", plan), plan
+        assert index in plan, plan
+
+    def test_order_queries_use_an_index(self):
+        self.assert_uses_index(
+            OrderService.objects.filter(client=self.client_user, is_rateable=True),
+            "order_rateable_idx",
+        )
+        self.assert_uses_index(
+            OrderService.objects.filter(
+                client=self.client_user,
+                home_service=self.home_service,
+                status="Pending",
+            ),
+            "order_client_service_idx",
+        )
+        received = (
+            OrderService.objects.filter(home_service__seller=self.seller)
+            .filter(~Q(status="Rejected"))
+            .order_by("-create_date", "-id")[:20]
+        )
+        self.assert_uses_index(received, "services_homeservice_seller_id")
+
+    def test_form_query_uses_an_index(self):
+        self.assert_uses_index(
+            self.home_service.field.filter(is_newest=True), "input_field_newest_idx"
+        )
+        self.assert_uses_index(
+            InputField.objects.filter(
+                home_service=self.home_service,
+                home_service__seller=self.seller,
+                is_newest=True,
+            ),
+            "input_field_newest_idx",
+        )
+
+    def test_services_by_category_use_an_index(self):
+        service_areas = HomeService.service_area.through.objects.filter(
+            homeservice_id=OuterRef("pk"), area_id=self.area.id
+        )
+        queryset = (
+            HomeService.objects.filter(Exists(service_areas))
+            .filter(category__name=self.home_service.category.name)
+            .select_related("category", "seller__user")
+            .order_by("-average_ratings", "-id")[:20]
+        )
+        self.assert_uses_index(queryset, "category_name_idx")
+        self.assert_uses_index(queryset, "home_service_category_idx")
+
+    def test_users_by_mode_use_an_index(self):
+        queryset = (
+            NormalUser.objects.filter(user__mode="seller")
+            .select_related("user")
+            .annotate(
+                average_rating=Coalesce(
+                    Avg("home_services_seller__average_ratings"), 0.0
+                )
+            )
+            .order_by("id")[:20]
+        )
+        self.assert_uses_index(queryset, "user_mode_idx")
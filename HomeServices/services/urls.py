@@ -5,22 +5,27 @@ urlpatterns = [
     path(
         "categories",
         views.ListCategories.as_view(),
+        name="categories",
     ),
     path(
         "list_all_area",
         views.ListArea.as_view(),
+        name="list_all_area",
     ),
     path(
         "my_orders",
         views.MyOrders.as_view(),
+        name="my_orders",
     ),
     path(
         "received_orders",
         views.ReceivedOrders.as_view(),
+        name="received_orders",
     ),
     path(
         "list_home_services",
         views.ListHomeServices.as_view(),
+        name="list_home_services",
     ),
     path(
         "home_service/detail/<int:pk>",
@@ -57,10 +62,12 @@ urlpatterns = [
     path(
         "reject_order/<int:order_id>",
         views.RejectOrder.as_view(),
+        name="reject_order",
     ),
     path(
         "accept_order/<int:order_id>",
         views.AcceptOrder.as_view(),
+        name="accept_order",
     ),
     path(
         "accept_after_review/<int:order_id>",
@@ -77,6 +84,7 @@ urlpatterns = [
     path(
         "make_rating/<int:order_id>",
         views.MakeRateAndComment.as_view(),
+        name="make_rating",
     ),
     path(
         "make_seller_comment/<int:rating_id>",
@@ -85,14 +93,26 @@ urlpatterns = [
     path(
         "ratings/service/<int:service_id>",
         views.ListRatingsByService.as_view(),
+        name="ratings_by_service",
     ),
     path(
         "ratings/username/<str:username>",
         views.ListRatingsByUsername.as_view(),
+        name="ratings_by_username",
     ),
     path(
         "earnings",
         views.GetEarnings.as_view(),
         name="earnings",
     ),
+    path(
+        "earnings/daily",
+        views.DailyEarnings.as_view(),
+        name="daily_earnings",
+    ),
+    path(
+        "earnings/export/<str:file_format>",
+        views.ExportEarnings.as_view(),
+        name="export_earnings",
+    ),
 ]
@@ -4,12 +4,23 @@ from .models import (
     Area,
     HomeService,
     Rating,
-    GeneralServicesPrice,
     Earnings,
+    EarningsRollup,
     InputData,
     InputField,
     OrderService,
+    status_choices,
 )
+from .pagination import (
+    ReceivedOrdersPagination,
+    HomeServicesPagination,
+    RatingsPagination,
+)
+from .search import get_search_backend
+from .cache import areference_data_response
+from .fees import get_fee_schedule
+from .ratings import get_rating_summary, record_rating_histogram
+from .rollups import record_earnings
 from .serializers import (
     AreaSerializer,
     CategorySerializer,
@@ -30,59 +41,132 @@ from rest_framework.response import Response
 from rest_framework.request import Request
 from rest_framework import status, generics
 from rest_framework import permissions
-from drf_spectacular.utils import extend_schema
+from rest_framework.exceptions import ValidationError
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from django.utils import timezone
-from django.db.models import Q, Avg, F, Sum
+from django.utils.dateparse import parse_date
+from django.db.models import Q, Sum, Prefetch, Exists, OuterRef
 from django.db import transaction
-from datetime import timedelta
+from django.http import StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from datetime import datetime, time, timedelta
 from .spectacular import (
-    RetrieveRatingsSpectacular,
-    RetrieveRatingsSpectacularForUsername,
+    RatingsPageSpectacular,
+    RatingsPageSpectacularForUsername,
 )
-from datetime import timedelta
-from django_q.tasks import schedule
-from django_q.models import Schedule
+import csv
+import json
 from core.models import NormalUser
-import arrow
+from core.async_api import AsyncAPIView
+from core.stats import record_answer, record_rating
+from core.balance import debit, InsufficientBalance
 
 
 @transaction.atomic
-def taking_money(
-    user: NormalUser,
-    required_balance: float,
-    order: OrderService,
-    general_services: list[GeneralServicesPrice],
-):
+def taking_money(user: NormalUser, order: OrderService, fee_schedule: dict):
+    # only one of two concurrent accepts of the same order gets to charge for it,
+    # the answer time goes in the same UPDATE so no accepted order is left without
+    answer_time = timezone.now()
+    if not OrderService.objects.filter(pk=order.id, status="Pending").update(
+        status="Under Review", answer_time=answer_time
+    ):
+        return False
     order.status = "Under Review"
-    order.save()
-    user.balance.total_balance -= required_balance
-    user.balance.save()
-    for beneficiary in general_services:
-        Earnings.objects.create(
-            order=order, earnings=beneficiary.price, beneficiary=beneficiary.beneficiary
-        )
+    order.answer_time = answer_time
+    debit(user.id, fee_schedule["total"], "fees", order=order)
+    earnings = Earnings.objects.bulk_create(
+        [
+            Earnings(
+                order=order,
+                earnings=price,
+                beneficiary_id=beneficiary_id,
+                category_id=order.home_service.category_id,
+            )
+            for beneficiary_id, price in fee_schedule["fees"]
+        ]
+    )
+    record_earnings(earnings, order.home_service.category_id)
+    record_answer(order)
     return True
 
 
+def get_date_range_filters(request, field: str):
+    """
+    Lookups for the `from_date` and `to_date` (inclusive) query parameters,
+    raises a 400 if one of them isn't a YYYY-MM-DD date.
+    """
+    filters = {}
+    for param, lookup, days in (
+        ("from_date", "gte", 0),
+        ("to_date", "lt", 1),
+    ):
+        if not request.GET.get(param):
+            continue
+        try:
+            date = parse_date(request.GET[param])
+        except ValueError:
+            date = None
+        if date is None:
+            raise ValidationError({param: ["Date has wrong format. Use YYYY-MM-DD."]})
+        # compare against datetimes instead of a __date lookup so an index on
+        # the field can be used
+        filters[f"{field}__{lookup}"] = timezone.make_aware(
+            datetime.combine(date + timedelta(days=days), time.min)
+        )
+    return filters
+
+
 def get_form_data(order: OrderService):
     serializer = RetrieveInputDataSerializer(data=order.input_data_set, many=True)
     serializer.is_valid(raise_exception=False)
     return serializer.data
 
 
+def orders_feed_queryset(queryset):
+    # load everything the orders feed touches up front so building the response
+    # costs the same number of queries for 1 order or 1000 orders
+    return queryset.select_related(
+        "client__user",
+        "home_service__seller__user",
+        "home_service__category",
+        "rating",
+    ).prefetch_related(
+        "home_service__service_area",
+        Prefetch(
+            "input_data_set",
+            queryset=InputData.objects.select_related("field"),
+        ),
+    )
+
+
+def build_orders_feed(orders, host: str, hide_pending_form: bool = False):
+    data = ListOrdersSerializer(orders, many=True).data
+    for i, order in enumerate(orders):
+        data[i]["client"] = order.client.user.to_dict(host)
+        data[i]["seller"] = order.home_service.seller.user.to_dict(host)
+        if hide_pending_form and order.status == "Pending":
+            data[i]["form"] = []
+        else:
+            data[i]["form"] = get_form_data(order=order)
+        data[i]["is_rateable"] = is_rateable(order=order)
+        data[i]["expected_time_by_day_to_finish"] = order.expected_time_by_day_to_finish
+    return data
+
+
 class IsOwner(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         return obj.seller == request.user.normal_user
 
 
-class ListCategories(APIView):
+class ListCategories(AsyncAPIView):
     @extend_schema(responses={200: CategorySerializer(many=True)})
-    def get(self, request):
-        queryset = Category.objects.all()
-        serializer = CategorySerializer(data=queryset, many=True)
-        serializer.is_valid()
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    async def get(self, request):
+        async def build_data():
+            categories = [category async for category in Category.objects.all()]
+            return CategorySerializer(categories, many=True).data
+
+        return await areference_data_response(request, "categories", build_data)
 
 
 def is_rateable(order: OrderService):
@@ -121,28 +205,22 @@ def is_rateable(order: OrderService):
 @extend_schema(exclude=True)
 class MyOrders(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    # the same queries for any number of orders (core.timing logs the requests
+    # over budget)
+    latency_budget_ms = 500
+    query_budget = 10
 
     def get(self, request: Request):
         queryset = OrderService.objects.filter(client=request.user.normal_user)
-        serializer = ListOrdersSerializer(data=queryset, many=True)
-        serializer.is_valid(raise_exception=False)
-        for i, order in enumerate(queryset):
-            serializer.data[i]["client"] = order.client.user.to_dict(request.get_host())
-            serializer.data[i]["seller"] = order.home_service.seller.user.to_dict(
-                request.get_host()
-            )
-
-            serializer.data[i]["form"] = get_form_data(order=order)
-            serializer.data[i]["is_rateable"] = is_rateable(order=order)
-            serializer.data[i][
-                "expected_time_by_day_to_finish"
-            ] = order.expected_time_by_day_to_finish
-        return Response(serializer.data)
+        orders = list(orders_feed_queryset(queryset))
+        return Response(build_orders_feed(orders, request.get_host()))
 
 
 @extend_schema(exclude=True)
 class ReceivedOrders(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    latency_budget_ms = 300
+    query_budget = 10
 
     def get(self, request):
         if request.user.mode == "client":
@@ -155,47 +233,59 @@ class ReceivedOrders(APIView):
         queryset = OrderService.objects.filter(
             home_service__seller=request.user.normal_user
         ).filter(~Q(status="Rejected"))
-        serializer = ListOrdersSerializer(data=queryset, many=True)
-        serializer.is_valid()
-        i = 0
-        for order in queryset:
-            serializer.data[i]["client"] = order.client.user.to_dict(request.get_host())
-            serializer.data[i]["seller"] = order.home_service.seller.user.to_dict(
-                request.get_host()
-            )
-
-            if order.status != "Pending":
-                serializer.data[i]["form"] = get_form_data(order=order)
-            else:
-                serializer.data[i]["form"] = []
-            serializer.data[i]["is_rateable"] = is_rateable(order=order)
-            serializer.data[i][
-                "expected_time_by_day_to_finish"
-            ] = order.expected_time_by_day_to_finish
-            i += 1
-        return Response(serializer.data)
+
+        order_status = request.GET.get("status")
+        if order_status:
+            if order_status not in dict(status_choices):
+                return Response(
+                    {"status": [f"{order_status} is not a valid status"]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            queryset = queryset.filter(status=order_status)
+
+        queryset = queryset.filter(**get_date_range_filters(request, "create_date"))
+
+        paginator = ReceivedOrdersPagination()
+        orders = paginator.paginate_queryset(
+            orders_feed_queryset(queryset), request, view=self
+        )
+        return paginator.get_paginated_response(
+            build_orders_feed(orders, request.get_host(), hide_pending_form=True)
+        )
 
 
 @extend_schema(
     description="NOTE : When you use this api use :<br> 1 - ( services/list_home_services?username=\{username\} ) to filter \
        the services for this user <br> 2 -  ( services/list_home_services?category=\{category name\} ) to filter the services by category\
-        3 - ( services/list_home_services?category=\{category name\}&title=\{string you want to contains in the title\} ) to filter the services by category and title<br>\
+        3 - ( services/list_home_services?category=\{category name\}&title=\{words to search for\} ) to search the services title and description, \
+         results are ordered by relevance and rating<br>\
             4 - else it will returns all services<br>\
-                NOTE 2 : If the user is logged in it will be filter by service area depending on his area "
+                NOTE 2 : If the user is logged in it will be filter by service area depending on his area<br>\
+                    NOTE 3 : Results are paginated, pass the returned ( next ) token as ( cursor ) to get the next page "
 )
-class ListHomeServices(generics.ListAPIView):
+class ListHomeServices(AsyncAPIView, generics.ListAPIView):
     queryset = HomeService.objects.all()
     permission_classes = [permissions.AllowAny]
     serializer_class = ListHomeServicesSerializer
 
+    pagination_class = HomeServicesPagination
+    latency_budget_ms = 200
+    query_budget = 5
+
     def get_queryset(self):
-        areas = []
-        if not self.request.user.is_authenticated:
-            areas = Area.objects.all()
-        else:
-            areas = [self.request.user.area]
+        # an EXISTS over the areas table instead of joining it keeps one row per
+        # service, so no DISTINCT is needed and the rating index can drive the page
+        service_areas = HomeService.service_area.through.objects.filter(
+            homeservice_id=OuterRef("pk")
+        )
+        if self.request.user.is_authenticated:
+            service_areas = service_areas.filter(area_id=self.request.user.area_id)
 
-        queryset = HomeService.objects.filter(service_area__in=areas)
+        queryset = (
+            HomeService.objects.filter(Exists(service_areas))
+            .select_related("category", "seller__user")
+            .prefetch_related("service_area")
+        )
 
         username = self.request.GET.get("username")
         category = self.request.GET.get("category")
@@ -204,23 +294,38 @@ class ListHomeServices(generics.ListAPIView):
         if username:
             queryset = queryset.filter(seller__user__username=username)
 
-        if category and title:
-            queryset = queryset.filter(category__name=category, title__contains=title)
-        elif title:
-            queryset = queryset.filter(title__contains=title)
-        elif category:
+        if category:
             queryset = queryset.filter(category__name=category)
 
-        queryset = queryset.order_by("-average_ratings").distinct()
+        if title:
+            queryset = get_search_backend().search(queryset, title)
+            self.keyset_ordering = ("-search_score", "-id")
 
         return queryset
 
+    async def get(self, request, *args, **kwargs):
+        # building the queryset is lazy, the page is the only query (two with
+        # the service areas prefetch)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
 
 @extend_schema(responses={200: RetrieveHomeServices})
-class HomeServiceDetail(generics.RetrieveAPIView):
+class HomeServiceDetail(AsyncAPIView, generics.RetrieveAPIView):
     permission_classes = [permissions.AllowAny]
+    latency_budget_ms = 100
+    query_budget = 4
     serializer_class = RetrieveHomeServices
-    queryset = HomeService.objects.all()
+    queryset = HomeService.objects.select_related(
+        "category", "seller__user"
+    ).prefetch_related("service_area")
+
+    async def get(self, request, *args, **kwargs):
+        instance = await aget_object_or_404(self.get_queryset(), pk=kwargs["pk"])
+        self.check_object_permissions(request, instance)
+        return Response(self.get_serializer(instance).data)
 
 
 @extend_schema(exclude=True)
@@ -237,11 +342,18 @@ class RetrieveUpdateHomeService(generics.RetrieveUpdateAPIView):
     queryset = HomeService.objects.all()
 
 
-class ListArea(generics.ListAPIView):
+class ListArea(AsyncAPIView, generics.ListAPIView):
     queryset = Area.objects.all()
     serializer_class = AreaSerializer
     permission_classes = [permissions.AllowAny]
 
+    async def get(self, request, *args, **kwargs):
+        async def build_data():
+            areas = [area async for area in self.get_queryset()]
+            return self.get_serializer(areas, many=True).data
+
+        return await areference_data_response(request, "areas", build_data)
+
 
 @extend_schema(exclude=True)
 class DeleteHomeService(generics.DestroyAPIView):
@@ -359,78 +471,82 @@ class MakeOrderService(APIView):
                 {"expected_time_by_day_to_finish": "This field is required"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        if home_service.seller == request.user.normal_user:
+        client = request.user.normal_user
+        if home_service.seller_id == client.id:
             return Response(
                 {"detail": "You can't order service from yourself"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        rateable_services = OrderService.objects.filter(
-            client=request.user.normal_user, is_rateable=True
-        )
-
-        if rateable_services.count() > 0:
-            return Response(
-                {"detail": "You have unrated services please rate it and order again"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        check_sended_orders = OrderService.objects.filter(
-            client=request.user.normal_user, home_service=home_service, status="Pending"
-        )
-        if check_sended_orders.count() > 0:
-            return Response(
-                {"detail": "you have already ordered this service"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        try:
-            expected_time_by_day_to_finish = int(
-                request.data["expected_time_by_day_to_finish"]
-            )
-        except ValueError:
-            return Response(
-                {"expected_time_by_day_to_finish": "This value must be integer"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        serializer = InputDataSerializer(data=request.data["form_data"], many=True)
-        serializer.is_valid(raise_exception=True)
-        if expected_time_by_day_to_finish is not None and (
-            expected_time_by_day_to_finish < 1 or expected_time_by_day_to_finish > 90
-        ):
-            return Response(
-                {
-                    "expected_time_by_day_to_finish": "expected_time_by_day_to_finish must be between 1 and 90"
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        # make sure that all fields belong to this service exist
-        validated_data = []
-        for input_field_1 in home_service.field.filter(is_newest=True):
-            is_exists = False
-            for input_field_2 in serializer.data:
-                if input_field_1.id == input_field_2["field"]:
-                    is_exists = True
-                    validated_data.append(input_field_2)
-                    break
-            if not is_exists:
+        # the checks and the insert in one transaction, or two submissions at
+        # once both pass the checks. On SQLite BEGIN IMMEDIATE serializes them,
+        # elsewhere the lock on the client's row does
+        with transaction.atomic():
+            NormalUser.objects.select_for_update().only("id").get(pk=client.pk)
+            if OrderService.objects.filter(client=client, is_rateable=True).exists():
                 return Response(
                     {
-                        "detail": f"Error fields are not compatible (you did'nt send field : {input_field_1.id})"
+                        "detail": "You have unrated services please rate it and order again"
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if OrderService.objects.filter(
+                client=client, home_service=home_service, status="Pending"
+            ).exists():
+                return Response(
+                    {"detail": "you have already ordered this service"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            try:
+                expected_time_by_day_to_finish = int(
+                    request.data["expected_time_by_day_to_finish"]
+                )
+            except ValueError:
+                return Response(
+                    {"expected_time_by_day_to_finish": "This value must be integer"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            serializer = InputDataSerializer(data=request.data["form_data"], many=True)
+            serializer.is_valid(raise_exception=True)
+            if expected_time_by_day_to_finish is not None and (
+                expected_time_by_day_to_finish < 1
+                or expected_time_by_day_to_finish > 90
+            ):
+                return Response(
+                    {
+                        "expected_time_by_day_to_finish": "expected_time_by_day_to_finish must be between 1 and 90"
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-        new_order = OrderService.objects.create(
-            client=request.user.normal_user,
-            home_service=home_service,
-            expected_time_by_day_to_finish=expected_time_by_day_to_finish,
-        )
-        new_order.save()
-        index = 0
-        all_fields = home_service.field.filter(is_newest=True)
-        for input_data in validated_data:
-            InputData.objects.create(
-                field=all_fields[index], content=input_data["content"], order=new_order
-            ).save()
-            index += 1
+
+            # make sure that all fields belong to this service exist
+            submitted = {
+                input_data["field"]: input_data["content"]
+                for input_data in serializer.validated_data
+            }
+            form = list(
+                home_service.field.filter(is_newest=True).values_list("id", flat=True)
+            )
+            for field_id in form:
+                if field_id not in submitted:
+                    return Response(
+                        {
+                            "detail": f"Error fields are not compatible (you did'nt send field : {field_id})"
+                        },
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+            new_order = OrderService.objects.create(
+                client=client,
+                home_service=home_service,
+                expected_time_by_day_to_finish=expected_time_by_day_to_finish,
+            )
+            InputData.objects.bulk_create(
+                [
+                    InputData(
+                        field_id=field_id, content=submitted[field_id], order=new_order
+                    )
+                    for field_id in form
+                ]
+            )
 
         return Response("Success", status=status.HTTP_200_OK)
 
@@ -479,14 +595,9 @@ class RejectOrder(APIView):
             )
         order.status = "Rejected"
         order.answer_time = timezone.now()
-        average_fast_answer = (
-            OrderService.objects.exclude(status="Pending")
-            .annotate(average=Avg(F("answer_time") - F("create_date")))
-            .values("average")[0]["average"]
-        )
-        order.home_service.seller.average_fast_answer = average_fast_answer
-        order.save()
-        order.home_service.seller.save()
+        with transaction.atomic():
+            order.save()
+            record_answer(order)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -510,46 +621,22 @@ class AcceptOrder(APIView):
                 {"detail": "Unexpected error"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        required_balance = GeneralServicesPrice.objects.all().aggregate(Sum("price"))[
-            "price__sum"
-        ]
-        if (
-            required_balance is not None
-            and request.user.normal_user.balance.total_balance < required_balance
-        ):
+        try:
+            taken = taking_money(
+                fee_schedule=get_fee_schedule(),
+                order=order,
+                user=request.user.normal_user,
+            )
+        except InsufficientBalance:
             return Response(
                 {"detail": "You don't have enough money"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-
-        general_services = GeneralServicesPrice.objects.all()
-
-        if not taking_money(
-            general_services=general_services,
-            order=order,
-            required_balance=required_balance,
-            user=request.user.normal_user,
-        ):
+        if not taken:
             return Response(
                 {"detail": "Unexpected error"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        order.answer_time = timezone.now()
-        average_fast_answer = (
-            OrderService.objects.filter(~Q(status="Pending"))
-            .annotate(time=F("answer_time") - F("create_date"))
-            .aggregate(Avg("time"))["time__avg"]
-        )
-        order.home_service.seller.average_fast_answer = average_fast_answer
-        order.save()
-        order.home_service.seller.save()
-        schedule(
-            "services.tasks.update_status_to_underway",
-            order.id,
-            schedule_type=Schedule.ONCE,
-            minutes=15,
-            next_run=arrow.utcnow().shift(minutes=15).datetime,
-        )
         return Response(get_form_data(order=order), status=status.HTTP_200_OK)
 
 
@@ -654,7 +741,7 @@ class MakeRateAndComment(APIView):
         if is_rateable(order=order):
             serializer = RatingSerializer(data=request.data)
             serializer.is_valid(raise_exception=True)
-            serializer.save(order_service=order)
+            previous_average_rating = order.home_service.average_ratings
             order.status = "Expire"
             order.is_rateable = False
             average_rate_for_this_order = (
@@ -673,8 +760,12 @@ class MakeRateAndComment(APIView):
                 + average_rate_for_this_order
             ) / (order.home_service.number_of_served_clients + 1)
             order.home_service.number_of_served_clients += 1
-            order.home_service.save()
-            order.save()
+            with transaction.atomic():
+                rating = serializer.save(order_service=order)
+                order.home_service.save()
+                order.save()
+                record_rating(order.home_service, previous_average_rating)
+                record_rating_histogram(rating, order.home_service)
             return Response(serializer.data, status=status.HTTP_200_OK)
         else:
             return Response(
@@ -709,21 +800,41 @@ class SellerComment(APIView):
         return Response("Success", status=status.HTTP_200_OK)
 
 
-@extend_schema(responses={200: RetrieveRatingsSpectacular(many=True)})
+def ratings_queryset(queryset):
+    return queryset.select_related(
+        "order_service__client__user", "order_service__home_service__seller__user"
+    )
+
+
+def build_ratings_page(request, view, queryset, summary, with_home_service=False):
+    paginator = RatingsPagination()
+    page = paginator.paginate_queryset(ratings_queryset(queryset), request, view)
+    data = RatingDetailSerializer(page, many=True).data
+    for rate, item in zip(page, data):
+        item["client"] = rate.order_service.client.user.to_dict(request.get_host())
+        if with_home_service:
+            item["home_service"] = rate.order_service.home_service.to_dict()
+    response = paginator.get_paginated_response(data)
+    response.data["summary"] = summary
+    return response
+
+
+@extend_schema(
+    responses={200: RatingsPageSpectacular},
+    parameters=[OpenApiParameter("cursor", str), OpenApiParameter("page_size", int)],
+)
 class ListRatingsByService(APIView):
     def get(self, request, service_id):
         ratings = Rating.objects.filter(order_service__home_service__id=service_id)
-        serializer = RatingDetailSerializer(data=ratings, many=True)
-        serializer.is_valid(raise_exception=False)
-
-        for i, rate in enumerate(ratings):
-            serializer.data[i]["client"] = rate.order_service.client.user.to_dict(
-                request.get_host()
-            )
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return build_ratings_page(
+            request, self, ratings, get_rating_summary(home_service_id=service_id)
+        )
 
 
-@extend_schema(responses={200: RetrieveRatingsSpectacularForUsername(many=True)})
+@extend_schema(
+    responses={200: RatingsPageSpectacularForUsername},
+    parameters=[OpenApiParameter("cursor", str), OpenApiParameter("page_size", int)],
+)
 class ListRatingsByUsername(APIView):
     def get(self, request, username):
         try:
@@ -734,18 +845,13 @@ class ListRatingsByUsername(APIView):
             )
 
         ratings = Rating.objects.filter(order_service__home_service__seller=user)
-        serializer = RatingDetailSerializer(data=ratings, many=True)
-        serializer.is_valid(raise_exception=False)
-
-        for i, rate in enumerate(ratings):
-            serializer.data[i]["client"] = rate.order_service.client.user.to_dict(
-                request.get_host()
-            )
-            serializer.data[i][
-                "home_service"
-            ] = rate.order_service.home_service.to_dict()
-
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return build_ratings_page(
+            request,
+            self,
+            ratings,
+            get_rating_summary(seller_id=user.id),
+            with_home_service=True,
+        )
 
 
 class GetEarnings(APIView):
@@ -766,3 +872,123 @@ class GetEarnings(APIView):
                 except OrderService.DoesNotExist:
                     pass
         return Response(serializer.data)
+
+
+EARNINGS_EXPORT_CHUNK_SIZE = 2000
+EARNINGS_EXPORT_FIELDS = {
+    "id": "id",
+    "created_date": "created_date",
+    "earnings": "earnings",
+    "beneficiary_id": "beneficiary_id",
+    "beneficiary_name": "beneficiary__beneficiary_name",
+    "order_id": "order_id",
+    "service_id": "order__home_service_id",
+    "service_title": "order__home_service__title",
+    "seller": "order__home_service__seller__user__username",
+    "seller_first_name": "order__home_service__seller__user__first_name",
+    "seller_last_name": "order__home_service__seller__user__last_name",
+}
+
+
+class Echo:
+    """A file-like object for csv.writer that hands every line back."""
+
+    def write(self, value):
+        return value
+
+
+def stream_earnings_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EARNINGS_EXPORT_FIELDS.keys())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_earnings_ndjson(rows):
+    for row in rows:
+        item = dict(zip(EARNINGS_EXPORT_FIELDS.keys(), row))
+        item["created_date"] = item["created_date"].isoformat()
+        yield json.dumps(item) + "\n"
+
+
+@extend_schema(exclude=True)
+class DailyEarnings(APIView):
+    """
+    Earnings per day from the rollups, optionally split by beneficiary or
+    category, so any range costs a row per day instead of a row per earning.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+    group_by_fields = ("beneficiary", "category")
+
+    def get(self, request):
+        group_by = request.GET.get("group_by")
+        if group_by and group_by not in self.group_by_fields:
+            return Response(
+                {"group_by": [f"{group_by} is not one of beneficiary, category"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        queryset = EarningsRollup.objects.filter(
+            **get_date_range_filters(request, "day")
+        )
+        for param in ("beneficiary", "category"):
+            value = request.GET.get(param)
+            if not value:
+                continue
+            if not value.isdigit():
+                return Response(
+                    {param: ["A valid integer is required."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            queryset = queryset.filter(**{f"{param}_id": value})
+
+        fields = ["day"] + ([group_by] if group_by else [])
+        series = (
+            queryset.values(*fields)
+            .annotate(earnings=Sum("total"), count=Sum("count"))
+            .order_by(*fields)
+        )
+        return Response(list(series))
+
+
+@extend_schema(exclude=True)
+class ExportEarnings(APIView):
+    """
+    All the earnings as CSV or NDJSON, streamed row by row from a single query
+    so the export takes constant memory however big the table is.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+    streams = {
+        "csv": (stream_earnings_csv, "text/csv"),
+        "ndjson": (stream_earnings_ndjson, "application/x-ndjson"),
+    }
+
+    def get(self, request, file_format):
+        if file_format not in self.streams:
+            return Response(
+                {"detail": "404 NOT FOUND"}, status=status.HTTP_404_NOT_FOUND
+            )
+        queryset = Earnings.objects.filter(
+            **get_date_range_filters(request, "created_date")
+        )
+        beneficiary = request.GET.get("beneficiary")
+        if beneficiary:
+            if not beneficiary.isdigit():
+                return Response(
+                    {"beneficiary": ["A valid integer is required."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            queryset = queryset.filter(beneficiary_id=beneficiary)
+
+        rows = (
+            queryset.order_by("id")
+            .values_list(*EARNINGS_EXPORT_FIELDS.values())
+            .iterator(chunk_size=EARNINGS_EXPORT_CHUNK_SIZE)
+        )
+        stream, content_type = self.streams[file_format]
+        response = StreamingHttpResponse(stream(rows), content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="earnings.{file_format}"'
+        )
+        return response